@@ -0,0 +1,149 @@
+"""
+此文件用于计算 夏普比率、Sortino比率、Calmar比率、最大回撤 的块自助法(block bootstrap)置信区间。
+对基金的周度收益率做循环块重抽样，得到 样本数 × T 的收益率矩阵，所有指标都以矩阵运算批量计算，公式与 Fund 中的指标完全一致。
+随机数生成器可以设定种子；样本按块划分，每块使用由种子派生的独立随机数流，因此结果与是否使用进程池、使用几个进程无关
+"""
+import math
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+import utils
+
+BOOTSTRAP_INDICATORS: list = ["夏普比率", "Sortino比率", "Calmar比率", "最大回撤"]
+DEFAULT_SAMPLES: int = 2000
+DEFAULT_CONFIDENCE: float = 0.90
+RISK_FREE_RATE: float = 0.015 # 与 Fund.sharpe_ratio、Fund.sortino_ratio 的默认值一致
+CHUNK_SIZE: int = 500 # 每块的样本数，单块内存约为 CHUNK_SIZE × T × 8 字节的若干倍
+
+def default_block_length(periods: int) -> int:
+    """ 默认块长度取 T 的立方根(向上取整)，周度数据几百个点时约为 6~8 周 """
+    return max(1, math.ceil(periods ** (1 / 3)))
+
+def block_indices(rng: np.random.Generator, samples: int, periods: int, block_length: int) -> np.ndarray:
+    """
+    生成循环块重抽样的下标矩阵
+
+    Args:
+        - rng (np.random.Generator): 随机数生成器
+        - samples (int): 样本数
+        - periods (int): 每个样本的长度 T
+        - block_length (int): 块长度
+
+    Returns:
+        np.ndarray: 样本数 × T 的下标矩阵
+    """
+    blocks_num = math.ceil(periods / block_length)
+    starts = rng.integers(0, periods, size = (samples, blocks_num))
+    indices = (starts[:, :, None] + np.arange(block_length)) % periods
+    return indices.reshape(samples, blocks_num * block_length)[:, :periods]
+
+def batched_indicators(returns: np.ndarray, days: int, risk_free_rate: float = RISK_FREE_RATE) -> dict:
+    """
+    对 样本数 × T 的收益率矩阵批量计算指标，每一行是一条收益率路径。公式与 Fund 一致：
+    年化收益率 = (1 + 累计收益) ^ (365 / 天数) - 1；年化波动率 = 标准差(ddof = 1) × √52；
+    下行标准差 = √(Σ 负收益² / (n - 1))；最大回撤以起始净值 1 为初始高点
+
+    Args:
+        - returns (np.ndarray): 样本数 × T 的周度收益率，不能包含空值
+        - days (int): 原始数据的首个净值日期到最新日期的天数，用于年化
+        - risk_free_rate (float, optional): 无风险利率. Defaults to 0.015.
+
+    Returns:
+        dict: {指标名称 : 长度为样本数的数组}
+    """
+    periods = returns.shape[1]
+    nav = np.cumprod(1 + returns, axis = 1)
+    annual_return = nav[:, -1] ** (365 / days) - 1
+    annual_volatility = returns.std(axis = 1, ddof = 1) * math.sqrt(52)
+    negative_returns = np.where(returns < 0, returns, 0.0)
+    decline_std_annualize = np.sqrt((negative_returns ** 2).sum(axis = 1) / (periods - 1)) * math.sqrt(52)
+    running_max = np.maximum(np.maximum.accumulate(nav, axis = 1), 1.0)
+    max_drawdown = np.minimum((nav / running_max - 1).min(axis = 1), 0.0)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        return {"夏普比率" : (annual_return - risk_free_rate) / annual_volatility,
+                "Sortino比率" : (annual_return - risk_free_rate) / decline_std_annualize,
+                "Calmar比率" : annual_return / -max_drawdown,
+                "最大回撤" : max_drawdown}
+
+def bootstrap_chunk(returns: np.ndarray, days: int, samples: int, block_length: int,
+                    seed_sequence: np.random.SeedSequence) -> dict:
+    """ 计算一块样本的指标。该函数会在子进程中运行，所以参数都必须可以被 pickle 序列化 """
+    rng = np.random.default_rng(seed_sequence)
+    resampled = returns[block_indices(rng, samples, len(returns), block_length)]
+    return batched_indicators(resampled, days)
+
+def bootstrap_indicators(returns: pd.Series, days: int, samples: int = DEFAULT_SAMPLES, block_length: int = None,
+                         seed: int = None, workers: int = 1) -> pd.DataFrame:
+    """
+    对收益率序列做块自助法重抽样，返回每个样本的指标
+
+    Args:
+        - returns (pd.Series): 周度收益率，空值会被去掉
+        - days (int): 首个净值日期到最新日期的天数，用于年化
+        - samples (int, optional): 重抽样次数. Defaults to 2000.
+        - block_length (int, optional): 块长度，None 表示 default_block_length. Defaults to None.
+        - seed (int, optional): 随机数种子，相同种子的结果完全相同. Defaults to None.
+        - workers (int, optional): 进程数，大于 1 时按块并行计算. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: 样本数 × 指标 的数据表，列为 BOOTSTRAP_INDICATORS
+    """
+    values = returns.dropna().to_numpy(dtype = np.float64)
+    if len(values) < 3:
+        raise ValueError(len(values), "有效收益率少于 3 个，无法进行自助法重抽样")
+    block_length = default_block_length(len(values)) if block_length is None else block_length
+    chunk_sizes = [min(CHUNK_SIZE, samples - start) for start in range(0, samples, CHUNK_SIZE)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    chunk_args = [(values, days, size, block_length, seed_sequence) for size, seed_sequence in zip(chunk_sizes, seed_sequences)]
+    if workers > 1 and len(chunk_args) > 1:
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            chunk_results = list(executor.map(bootstrap_chunk, *zip(*chunk_args)))
+    else:
+        chunk_results = [bootstrap_chunk(*args) for args in chunk_args]
+    return pd.DataFrame({name : np.concatenate([result[name] for result in chunk_results]) for name in BOOTSTRAP_INDICATORS})
+
+def confidence_intervals(this_fund, samples: int = DEFAULT_SAMPLES, confidence: float = DEFAULT_CONFIDENCE,
+                         block_length: int = None, seed: int = None, workers: int = 1) -> pd.DataFrame:
+    """
+    计算某只基金(或者指增基金的超额部分)各指标的点估计与置信区间
+
+    Args:
+        - this_fund (Fund): 基金对象，使用 basic_data.returns 重抽样
+        - samples (int, optional): 重抽样次数. Defaults to 2000.
+        - confidence (float, optional): 置信水平，0.90 表示取 5% 与 95% 分位数. Defaults to 0.90.
+        - block_length (int, optional): 块长度. Defaults to None.
+        - seed (int, optional): 随机数种子. Defaults to None.
+        - workers (int, optional): 进程数. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: index 是指标名称，列为 [点估计, 置信下限, 置信上限]
+    """
+    days = (this_fund.get_last_date() - this_fund.get_first_netval_date()).days
+    resampled = bootstrap_indicators(this_fund.basic_data.returns, days, samples, block_length, seed, workers)
+    point_estimates = {**this_fund.sharpe_ratio(), **this_fund.sortino_ratio(), **this_fund.calmar_ratio(),
+                       **this_fund.max_drawdown()}
+    tail = (1 - confidence) / 2
+    result = pd.DataFrame({"点估计" : [point_estimates[name] for name in BOOTSTRAP_INDICATORS],
+                           "置信下限" : resampled.quantile(tail).values,
+                           "置信上限" : resampled.quantile(1 - tail).values}, index = BOOTSTRAP_INDICATORS)
+    result.index.name = "指标"
+    result.attrs["confidence"] = confidence
+    return result
+
+def interval_table(intervals: pd.DataFrame) -> np.ndarray:
+    """
+    生成补充表格 “指标置信区间” 每个单元格需要填充的内容
+
+    Args:
+        intervals (pd.DataFrame): confidence_intervals 的返回结果
+
+    Returns:
+        np.ndarray: 第一行是表头 [指标, 点估计, 置信区间(90%)]
+    """
+    confidence = intervals.attrs.get("confidence", DEFAULT_CONFIDENCE)
+    table_contents = [["指标", "点估计", f"置信区间({confidence:.0%})"]]
+    for name, row in intervals.iterrows():
+        table_contents.append([name, utils.suitable_convert(row["点估计"], name),
+                               f"[{utils.suitable_convert(row['置信下限'], name)}, {utils.suitable_convert(row['置信上限'], name)}]"])
+    return np.array(table_contents)
@@ -0,0 +1,130 @@
+"""
+此文件用于批量绘制基金的净值与回撤走势图(draw_plot.GraphDrawer)。
+所有基金的图直接用 Figure 与 Agg 画布绘制(GraphDrawer 的 headless 模式，不经过 pyplot)，不会切换调用方进程的全局绘图后端，
+workers 大于 1 时在进程池中并行绘制；绘好的图片按 (绘图数据, 样式, 绘图代码) 的哈希值保存在 result_cache 中，
+净值数据与指数数据都没有变化的基金，下次生成报告时直接复用上次的图片，不再绘图
+"""
+import os
+import json
+import shutil
+import hashlib
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+import utils
+import draw_plot as dp
+import result_cache as rc
+
+# 这些文件的源代码会参与图片缓存键的计算，修改绘图代码后旧图片自动失效
+CHART_CODE_FILES: list = ["draw_plot.py", "chart_service.py"]
+# 报告中默认插入位图，WORD 对 png 的兼容性最好
+REPORT_STYLE: dict = {"format" : "png"}
+
+_chart_code_version: str = None
+
+def chart_code_version() -> str:
+    """ 对绘图代码求哈希，同一进程内只计算一次 """
+    global _chart_code_version
+    if _chart_code_version is None:
+        hasher = hashlib.sha256()
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        for file_name in CHART_CODE_FILES:
+            with open(os.path.join(base_dir, file_name), "rb") as f:
+                hasher.update(f.read())
+        _chart_code_version = hasher.hexdigest()
+    return _chart_code_version
+
+def split_chart_data(chart_data: pd.DataFrame) -> tuple:
+    """
+    把 Fund.get_chart_data / EnhancedFund.get_chart_data 的结果拆分为 GraphDrawer 需要的 (净值数据表, 回撤序列)
+
+    Args:
+        chart_data (pd.DataFrame): 绘图数据，回撤列的列名包含 “回撤”，其余列都是净值曲线
+    """
+    drawdown_columns = [column for column in chart_data.columns if "回撤" in str(column)]
+    if len(drawdown_columns) != 1:
+        raise ValueError(list(chart_data.columns), "绘图数据中必须有且只有一列回撤数据")
+    return chart_data.drop(columns = drawdown_columns), chart_data[drawdown_columns[0]]
+
+def chart_key(fund_name: str, chart_data: pd.DataFrame, style: dict) -> str:
+    """
+    计算图片的缓存键：绘图数据(包括日期与列名)、基金名称、样式、绘图代码任意一项变化，键都会变化
+
+    Args:
+        - fund_name (str): 基金名称
+        - chart_data (pd.DataFrame): 绘图数据
+        - style (dict): 完整的绘图样式
+    """
+    key_content = {"fund_name" : fund_name, "chart_data" : rc.hash_data(chart_data), "style" : style,
+                   "code_version" : chart_code_version()}
+    return hashlib.sha256(json.dumps(key_content, sort_keys = True, default = str).encode("utf-8")).hexdigest()
+
+def render_chart(fund_name: str, chart_data: pd.DataFrame, output_path: str, style: dict) -> str:
+    """ 绘制单只基金的图并保存到 output_path。该函数可能在子进程中运行，所以参数都必须可以被 pickle 序列化 """
+    netval_data, drawdown_data = split_chart_data(chart_data)
+    return dp.GraphDrawer(netval_data, drawdown_data, fund_name, style, headless = True).do_drawing(output_path)
+
+class ChartService:
+    def __init__(self, result_cache: rc.ResultCache = None, style: dict = None, workers: int = 1, output_dir: str = "image"):
+        """
+        批量绘图服务
+
+        Args:
+            - result_cache (rc.ResultCache, optional): 图片缓存，None 表示不缓存. Defaults to None.
+            - style (dict, optional): 绘图样式，只需要给出与 draw_plot.DEFAULT_STYLE 不同的项，默认保存为 png. Defaults to None.
+            - workers (int, optional): 绘图进程数，大于 1 时使用进程池. Defaults to 1.
+            - output_dir (str, optional): 图片输出文件夹，不存在时会自动创建. Defaults to "image".
+        """
+        self.result_cache: rc.ResultCache = result_cache
+        self.style: dict = {**dp.DEFAULT_STYLE, **REPORT_STYLE, **(style or {})}
+        self.workers: int = workers
+        self.output_dir: str = output_dir
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+
+    def output_path(self, fund_name: str) -> str:
+        """ 图片的输出路径，文件名带有时间戳 """
+        return os.path.abspath(os.path.join(self.output_dir,
+                                            utils.generate_filename(fund_name + "净值与回撤走势", "." + self.style["format"])))
+
+    def render_all(self, charts: list) -> list:
+        """
+        绘制一批基金的图。先查询缓存，没有命中的图在进程池中并行绘制，绘好后放入缓存
+
+        Args:
+            charts (list): [(基金名称, 绘图数据)]
+
+        Returns:
+            list: 图片的绝对路径，顺序与 charts 一致
+        """
+        suffix = "." + self.style["format"]
+        paths: list = [None] * len(charts)
+        pending: list = [] # (序号, 缓存键, 基金名称, 绘图数据, 输出路径)
+        for idx, (fund_name, chart_data) in enumerate(charts):
+            output_path = self.output_path(fund_name)
+            key = chart_key(fund_name, chart_data, self.style) if self.result_cache is not None else None
+            cached_image = self.result_cache.get_image(key, suffix) if key is not None else None
+            if cached_image is not None:
+                try:
+                    shutil.copyfile(cached_image, output_path)
+                    paths[idx] = output_path
+                except FileNotFoundError: # 其它进程刚刚把它淘汰了，当作没有命中，重新绘图
+                    cached_image = None
+            if cached_image is None:
+                pending.append((idx, key, fund_name, chart_data, output_path))
+        if self.workers > 1 and len(pending) > 1:
+            with ProcessPoolExecutor(max_workers = self.workers) as executor:
+                rendered = list(executor.map(render_chart, [elem[2] for elem in pending], [elem[3] for elem in pending],
+                                             [elem[4] for elem in pending], [self.style] * len(pending)))
+        else:
+            rendered = [render_chart(fund_name, chart_data, output_path, self.style)
+                        for _, _, fund_name, chart_data, output_path in pending]
+        for (idx, key, _, _, _), image_path in zip(pending, rendered):
+            paths[idx] = image_path
+            if key is not None:
+                self.result_cache.put_image(key, image_path)
+        return paths
+
+    def render(self, fund_name: str, chart_data: pd.DataFrame) -> str:
+        """ 绘制单只基金的图，缓存命中时直接复用，返回图片的绝对路径 """
+        return self.render_all([(fund_name, chart_data)])[0]
@@ -0,0 +1,306 @@
+"""
+此文件是命令行入口：读取批量配置文件(JSON 或 TOML)，按配置为每只基金生成报告，不再需要修改源代码中的路径与参数。
+
+用法示例：
+    python cli.py batch.json
+    python cli.py batch.toml --workers 4 --shard 2/3 --skip 大禾* --compute-only
+    python cli.py batch.json --export output/indicators.parquet --layout wide
+    python cli.py batch.json --html output/html
+
+配置文件示例(JSON)：
+    {
+        "cache_dir": "cache",
+        "batches": [
+            {
+                "netval_path": "data/非指增批量测试数据.xlsx",
+                "index_path": "data/指数数据.xlsx",
+                "enhanced_fund": false,
+                "add_indicators_tables": true,
+                "funds": {
+                    "沣京价值增强一期": {"corp_name": "沣京", "start_date": "2019-01-04"},
+                    "大禾投资-掘金1号": {"corp_name": "大禾"}
+                }
+            }
+        ]
+    }
+其中 batches 的每一项是一组共用指数数据的基金；funds 中没有列出的基金使用该组的默认选项。
+批次中还可以设置 "select_funds": ["基金A", "基金B"] 与 "date_window": ["2021-01-01", null]，
+此时只以流式方式读取净值数据表中的这些基金与日期区间(见 excel_reader.read_netval)，不解析整张表。
+净值数据是一个工作表一组基金的工作簿时，批次中设置 "manifest": {工作表名称 : 选项}(或者清单文件路径) 与/或 "sheets": [工作表名称]，
+各工作表在 "sheet_workers" 个进程中并行解析，清单中的选项(例如 corp_name, enhanced_fund, funds)覆盖批次的默认值，格式见 workbook_batch.py。
+每只基金可以单独设置的选项：corp_name, start_date, create_date, enhanced_fund, add_indicators_tables,
+analyze_text_start_year, history_table_start_year, bootstrap_samples, bootstrap_seed, drawdown_episodes
+"""
+import os
+import sys
+import json
+import argparse
+import fnmatch
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tqdm import tqdm
+import pandas as pd
+
+import date_handler as dh
+import excel_reader as xr
+import workbook_batch as wb
+import netval_cleaning as nc
+import trading_calendar as tc
+import utils
+
+# 每只基金都可以单独设置的选项，以及它们的默认值
+FUND_OPTIONS: dict = {
+    "corp_name" : utils.CORP_DEFAULT_NAME,
+    "start_date" : None,
+    "create_date" : None,
+    "enhanced_fund" : False,
+    "add_indicators_tables" : False,
+    "analyze_text_start_year" : None,
+    "history_table_start_year" : None,
+    "bootstrap_samples" : 0,
+    "bootstrap_seed" : None,
+    "drawdown_episodes" : 0
+}
+
+def load_config(config_path: str) -> dict:
+    """
+    读取批量配置文件，根据后缀名判断是 JSON 还是 TOML
+
+    Args:
+        config_path (str): 配置文件路径，后缀名必须是 .json 或者 .toml
+    """
+    suffix = os.path.splitext(config_path)[1].lower()
+    if suffix == ".json":
+        with open(config_path, "r", encoding = "utf-8") as f:
+            return json.load(f)
+    if suffix == ".toml":
+        import tomllib # Python 3.11 及以上版本自带
+        with open(config_path, "rb") as f:
+            return tomllib.load(f)
+    raise ValueError(config_path, "配置文件的后缀名只能是 .json 或者 .toml")
+
+def build_jobs(config: dict) -> list:
+    """
+    将配置文件展开为任务列表，每只基金是一个任务。任务的顺序完全由配置文件与净值数据表的列顺序决定，
+    因此同一份配置在任何机器上展开得到的任务列表都相同，这是 --shard 能够确定性划分的前提。
+
+    Args:
+        config (dict): load_config 的返回结果
+
+    Returns:
+        list[dict]: 任务列表，每个任务包括 fund_name, batch(所属批次序号), netval_data, 以及各项选项
+    """
+    jobs = []
+    for batch_idx, batch in enumerate(config.get("batches", [])):
+        batch_defaults = {key : batch.get(key, config.get(key, default)) for key, default in FUND_OPTIONS.items()}
+        for sheet_batch in load_sheets(batch):
+            netval_data = sheet_batch["netval_data"]
+            sheet_defaults = {**batch_defaults, **sheet_batch["options"]}
+            fund_settings: dict = sheet_batch["funds"]
+            for fund_name in netval_data.columns:
+                options = {**sheet_defaults, **fund_settings.get(fund_name, {})}
+                for date_key in ["start_date", "create_date"]:
+                    options[date_key] = dh.scalar_to_date(options[date_key]) if options[date_key] else None
+                options["corp_name"] = options["corp_name"] or utils.CORP_DEFAULT_NAME
+                jobs.append({"fund_name" : fund_name, "batch" : batch_idx, "netval_data" : netval_data[fund_name],
+                             "calendar" : sheet_batch["calendar"],
+                             "index_path" : sheet_batch["options"].get("index_path", batch["index_path"]), **options})
+    return jobs
+
+def load_sheets(batch: dict) -> list:
+    """
+    读取一个批次的净值数据。批次中有 sheets 或者 manifest 时，并行读取工作簿中的多个工作表(见 workbook_batch.read_workbook)，
+    否则只读取第一个工作表。批次的 funds 设置对所有工作表生效
+
+    Args:
+        batch (dict): 配置文件中 batches 的一项
+
+    Returns:
+        list[dict]: 格式与 workbook_batch.read_workbook 的返回结果一致，净值数据都是清洗后的
+    """
+    batch_funds: dict = batch.get("funds", {})
+    if "sheets" in batch or "manifest" in batch:
+        sheet_batches = wb.read_workbook(batch["netval_path"], batch.get("manifest", None), batch.get("sheets", None),
+                                         batch.get("sheet_workers", 1))
+        unknown_funds = set(batch_funds) - {name for elem in sheet_batches for name in elem["netval_data"].columns}
+        if unknown_funds:
+            raise ValueError(unknown_funds, "这些基金没有出现在工作簿中：", batch["netval_path"])
+        for sheet_batch in sheet_batches:
+            sheet_batch["funds"] = {**{key : value for key, value in batch_funds.items() if key in sheet_batch["netval_data"].columns},
+                                    **sheet_batch["funds"]}
+        return sheet_batches
+    date_window = batch.get("date_window", None)
+    netval_data = xr.load_netval(batch["netval_path"], batch.get("select_funds", None),
+                                 tuple(date_window) if date_window is not None else None)
+    # 整张净值表一次性清洗，任务中的净值数据都是清洗后的
+    netval_data, clean_report = nc.clean_panel(netval_data)
+    nc.print_clean_report(clean_report)
+    unknown_funds = set(batch_funds) - set(netval_data.columns)
+    if unknown_funds:
+        raise ValueError(unknown_funds, "这些基金没有出现在净值数据表中：", batch["netval_path"])
+    # 同一批次的基金共用交易日历
+    return [{"sheet" : None, "netval_data" : netval_data, "calendar" : tc.batch_calendar(netval_data.index),
+             "options" : {}, "funds" : batch_funds}]
+
+def parse_shard(shard: str) -> tuple:
+    """ 解析 --shard 参数，例如 "2/3" 表示共 3 个分片中的第 2 个(从 1 开始计数) """
+    try:
+        shard_idx, shard_num = [int(elem) for elem in shard.split("/")]
+    except ValueError:
+        raise ValueError(shard, "--shard 的格式必须是 i/n，例如 2/3")
+    if shard_num < 1 or not (1 <= shard_idx <= shard_num):
+        raise ValueError(shard, "--shard 必须满足 1 <= i <= n")
+    return shard_idx, shard_num
+
+def select_jobs(jobs: list, shard: str = None, only: list = None, skip: list = None) -> list:
+    """
+    对任务列表进行分片与过滤。先分片再过滤，保证 --only/--skip 不会改变基金被分配到哪台机器。
+    分片方式是按任务序号轮流分配，即第 k 个任务属于第 (k mod n) + 1 个分片。
+
+    Args:
+        - jobs (list): build_jobs 的返回结果
+        - shard (str, optional): 分片，例如 "2/3". Defaults to None，表示不分片.
+        - only (list, optional): 只处理这些基金，支持通配符，例如 "聚宽*". Defaults to None.
+        - skip (list, optional): 跳过这些基金，支持通配符. Defaults to None.
+    """
+    if shard:
+        shard_idx, shard_num = parse_shard(shard)
+        jobs = [job for idx, job in enumerate(jobs) if idx % shard_num == shard_idx - 1]
+    if only:
+        jobs = [job for job in jobs if any(fnmatch.fnmatchcase(job["fund_name"], pattern) for pattern in only)]
+    if skip:
+        jobs = [job for job in jobs if not any(fnmatch.fnmatchcase(job["fund_name"], pattern) for pattern in skip)]
+    return jobs
+
+def run_job(job: dict, index_data: pd.DataFrame, index_digest: str, compute_only: bool,
+            cache_dir: str = None, cache_document: bool = False, export: bool = False, html_dir: str = None):
+    """
+    执行单个任务。该函数会在子进程中运行，所以所有参数都必须可以被 pickle 序列化
+
+    Args:
+        - job (dict): 单个任务
+        - index_data (pd.DataFrame): 该任务所属批次的指数数据
+        - index_digest (str): 指数数据的哈希值，仅在使用缓存时有用
+        - compute_only (bool): 是否只计算，不生成 WORD。配置了缓存目录时计算结果会放入缓存，之后生成报告时不再重复计算
+        - cache_dir (str, optional): 缓存目录. Defaults to None.
+        - cache_document (bool, optional): 是否缓存 WORD 文档. Defaults to False.
+        - export (bool, optional): 是否只计算并返回全部指标的数值(长表)，不生成 WORD. Defaults to False.
+        - html_dir (str, optional): 不生成 WORD，把该基金的 HTML 页面写入这个文件夹. Defaults to None.
+
+    Returns:
+        str | pd.DataFrame | dict: 基金名称；export 为 True 时返回 export_results.context_records 的结果；
+                                   html_dir 不是 None 时返回索引页中该基金的一行(html_report.index_row)
+    """
+    import report_generate as rg
+    import result_cache as rc
+    utils.create_output_folder()
+    result_cache = rc.ResultCache(cache_dir) if cache_dir else None
+    index_name = index_data.columns[0]
+    report_kwargs = {key : job[key] for key in ["analyze_text_start_year", "history_table_start_year",
+                                                "bootstrap_samples", "bootstrap_seed", "drawdown_episodes"]}
+    report_kwargs["calendar"] = job.get("calendar", None)
+    if export:
+        import export_results as er
+        context = rg.build_report_context(job["netval_data"], index_data, job["enhanced_fund"], job["corp_name"],
+                                          job["start_date"], job["create_date"], True, fund_name = job["fund_name"],
+                                          index_name = index_name, chart_data = False, cleaned = True, **report_kwargs)
+        return er.context_records(context)
+    if html_dir:
+        import html_report as hr
+        context, _, _ = rg.prepare_report(job["netval_data"], index_data, job["enhanced_fund"], job["corp_name"], job["start_date"],
+                                          job["create_date"], job["add_indicators_tables"], fund_name = job["fund_name"],
+                                          index_name = index_name, result_cache = result_cache, index_digest = index_digest,
+                                          cleaned = True, **report_kwargs)
+        rg.print_warning_messages(context.fund_name, context.first_netval_date, context.last_date)
+        return hr.write_fund_page(context, html_dir, job["add_indicators_tables"])
+    if compute_only:
+        # 与生成报告时的缓存键一致，配置了 cache_dir 时计算结果放入缓存，之后生成报告直接复用
+        context, _, _ = rg.prepare_report(job["netval_data"], index_data, job["enhanced_fund"], job["corp_name"], job["start_date"],
+                                          job["create_date"], job["add_indicators_tables"], fund_name = job["fund_name"],
+                                          index_name = index_name, result_cache = result_cache, index_digest = index_digest,
+                                          cleaned = True, **report_kwargs)
+        rg.print_warning_messages(context.fund_name, context.first_netval_date, context.last_date)
+        return job["fund_name"]
+    rg.generate_report(job["netval_data"], index_data, job["enhanced_fund"], job["corp_name"], job["start_date"],
+                       job["create_date"], job["add_indicators_tables"], fund_name = job["fund_name"],
+                       index_name = index_name, result_cache = result_cache, index_digest = index_digest,
+                       cache_document = cache_document, cleaned = True, **report_kwargs)
+    return job["fund_name"]
+
+def run_jobs(jobs: list, config: dict, workers: int = 1, compute_only: bool = False, export: bool = False,
+             html_dir: str = None) -> list:
+    """
+    执行任务列表。workers 为 1 时在当前进程内依次执行，否则使用进程池并行执行
+
+    Args:
+        - jobs (list): select_jobs 的返回结果
+        - config (dict): 批量配置
+        - workers (int, optional): 并行进程数. Defaults to 1.
+        - compute_only (bool, optional): 是否只计算，不生成 WORD(配置了 cache_dir 时预先填充缓存). Defaults to False.
+        - export (bool, optional): 是否导出全部指标的数值，不生成 WORD. Defaults to False.
+        - html_dir (str, optional): 不生成 WORD，把每只基金的 HTML 页面写入这个文件夹. Defaults to None.
+
+    Returns:
+        list: 每个任务的返回结果，顺序与 jobs 一致
+    """
+    import result_cache as rc
+    cache_dir: str = config.get("cache_dir", None)
+    cache_document: bool = config.get("cache_document", False)
+    # 每个指数数据文件只读取一次(工作表清单可以为某个工作表单独指定 index_path)
+    index_tables: dict = {}
+    for job in jobs:
+        if job["index_path"] not in index_tables:
+            index_data = pd.read_excel(job["index_path"], index_col = 0)
+            index_tables[job["index_path"]] = (index_data, rc.hash_data(index_data) if cache_dir else None)
+    if workers <= 1:
+        results = []
+        for job in tqdm(jobs):
+            # NOTE 与 multi_fund_report 一致，同一批次的基金共用同一份指数数据
+            index_data, index_digest = index_tables[job["index_path"]]
+            results.append(run_job(job, index_data, index_digest, compute_only, cache_dir, cache_document, export, html_dir))
+        return results
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        futures = [executor.submit(run_job, job, *index_tables[job["index_path"]], compute_only, cache_dir, cache_document,
+                                   export, html_dir) for job in jobs]
+        for future in tqdm(as_completed(futures), total = len(futures)):
+            future.result() # 子进程中的异常会在这里抛出
+        return [future.result() for future in futures]
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    """ 解析命令行参数 """
+    parser = argparse.ArgumentParser(description = "根据批量配置文件生成基金报告")
+    parser.add_argument("config", help = "批量配置文件路径，支持 .json 与 .toml")
+    parser.add_argument("--workers", type = int, default = 1, help = "并行进程数，默认是 1")
+    parser.add_argument("--shard", default = None, help = "分片，格式 i/n，表示只处理 n 个分片中的第 i 个(从 1 开始)")
+    parser.add_argument("--only", nargs = "+", default = None, help = "只处理这些基金，支持通配符")
+    parser.add_argument("--skip", nargs = "+", default = None, help = "跳过这些基金，支持通配符")
+    parser.add_argument("--compute-only", action = "store_true", help = "只计算指标，不生成 WORD；配置了 cache_dir 时结果放入缓存，供之后生成报告复用")
+    parser.add_argument("--list", action = "store_true", help = "只列出本次需要处理的基金，不做任何计算")
+    parser.add_argument("--export", default = None, help = "不生成 WORD，把全部指标的数值导出到该文件，后缀名可以是 .parquet/.csv/.jsonl")
+    parser.add_argument("--html", default = None, help = "不生成 WORD，在该文件夹中为每只基金生成 HTML 页面，并生成索引页 index.html")
+    parser.add_argument("--layout", choices = ["long", "wide"], default = "long", help = "导出文件的布局，默认是长表")
+    return parser.parse_args(argv)
+
+def main(argv: list = None):
+    args = parse_args(argv)
+    config = load_config(args.config)
+    jobs = select_jobs(build_jobs(config), args.shard, args.only, args.skip)
+    print(f"本次需要处理{len(jobs)}只基金")
+    if args.list:
+        for job in jobs:
+            print(job["fund_name"])
+        return
+    if args.export:
+        import export_results as er
+        records = run_jobs(jobs, config, args.workers, export = True)
+        er.write_records(pd.concat(records, ignore_index = True), args.export, args.layout)
+        print(f"已导出到 {args.export}")
+        return
+    if args.html:
+        import html_report as hr
+        rows = run_jobs(jobs, config, args.workers, html_dir = args.html)
+        print(f"索引页已生成：{hr.write_index_page(rows, args.html)}")
+        return
+    run_jobs(jobs, config, args.workers, args.compute_only)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -6,6 +6,7 @@
 from datetime import date
 from datetime import datetime
 import calendar
+import numpy as np
 
 def scalar_to_date(input_date) -> date:
     """
@@ -87,4 +88,35 @@ def find_closest_date(target_date: date, date_list: list) -> date:
     if not date_in_range(target_date, date_list):
         return None
     date_diff = [abs((target_date - elem).days) for elem in date_list]
-    return date_list[date_diff.index(min(date_diff))]
\ No newline at end of file
+    return date_list[date_diff.index(min(date_diff))]
+
+def to_day_numbers(dates) -> np.ndarray:
+    """
+    将日期(标量或者可迭代对象，元素可以是 str, datetime.datetime, datetime.date)转为整数天数数组，便于向量化比较与二分查找
+
+    Args:
+        dates (_type_): 单个日期或者日期序列
+
+    Returns:
+        np.ndarray: 一维 int64 数组，数值是距离 1970-01-01 的天数
+    """
+    if isinstance(dates, (str, date)) or not hasattr(dates, "__iter__"):
+        dates = [dates]
+    return np.array(list_to_date(dates), dtype = "datetime64[D]").astype(np.int64)
+
+def closest_date_positions(target_days: np.ndarray, date_days: np.ndarray) -> np.ndarray:
+    """
+    向量化的 find_closest_date：二分查找每个目标日期在升序日期序列中最近日期的位置，距离相同时取较早的日期，与 find_closest_date 一致
+
+    Args:
+        - target_days (np.ndarray): 目标日期，to_day_numbers 的结果
+        - date_days (np.ndarray): 升序排列的日期序列，to_day_numbers 的结果
+
+    Returns:
+        np.ndarray: 最近日期在 date_days 中的位置，目标日期不在序列范围内时是 -1 (对应 find_closest_date 返回 None)
+    """
+    right = np.clip(np.searchsorted(date_days, target_days, side = "left"), 0, len(date_days) - 1)
+    left = np.clip(right - 1, 0, len(date_days) - 1)
+    positions = np.where(target_days - date_days[left] <= date_days[right] - target_days, left, right)
+    in_range = (target_days >= date_days[0]) & (target_days <= date_days[-1])
+    return np.where(in_range, positions, -1)
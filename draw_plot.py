@@ -2,9 +2,21 @@
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import datetime
 
+def load_pyplot(backend: str = None):
+    """
+    首次绘图时才导入 matplotlib，仅导入本模块(例如使用下面的工具函数)不需要付出 matplotlib 的导入开销
+
+    Args:
+        backend (str, optional): 绘图后端，例如在子进程或者没有图形界面的服务器上使用 "Agg". Defaults to None.
+    """
+    if backend is not None:
+        import matplotlib
+        matplotlib.use(backend)
+    import matplotlib.pyplot as plt
+    return plt
+
 def get_closest_val(val: float):
     """ 净值数据中，获取最接近某个 0.2 的下界/上界 """
     if val == 1:
@@ -68,37 +80,66 @@ the_color_map = {
     "deep_red" : np.array([192, 0, 0]) / 255,
     "orange" : np.array([255, 192, 0]) / 255,
     "deep_grey" : np.array([127]*3) / 255,
+    "deep_blue" : np.array([68, 114, 196]) / 255,
     "shallow_grey" : np.array([217] * 3) / 255
 }
 
+# 默认的绘图样式，GraphDrawer 的 style 参数只需要给出想要修改的项
+DEFAULT_STYLE: dict = {
+    "figsize" : (10, 4),
+    "xtick_nums" : 12, # 横轴显示多少个日期
+    "axis_font" : "Arial", # 坐标轴字体
+    "axis_font_size" : 10, # 坐标轴字体大小
+    "legend_font" : "Kaiti", # 图例字体(楷体)
+    "color_map" : ["deep_red", "orange", "deep_grey", "deep_blue"], # 各条净值曲线的颜色，曲线多于颜色时循环使用
+    "dpi" : 200, # 保存为位图时的分辨率
+    "format" : "svg" # 保存的文件格式
+}
+
 class GraphDrawer:
-    def __init__(self, netval_data: pd.DataFrame, drawdown_data: pd.Series, fund_name: str):
+    def __init__(self, netval_data: pd.DataFrame, drawdown_data: pd.Series, fund_name: str, style: dict = None,
+                 headless: bool = False):
         """
         此类之作用在于绘制出私募报告的标准图像[多条曲线是净值数据，阴影图表示回撤数据]
 
         Args:
             - netval_data (pd.DataFrame): 净值数据，包括基金净值和相关指数的净值数据，将会以左轴为纵轴
             - drawdown_data (pd.Series): 回撤数据，将会以右轴为纵轴
+            - fund_name (str): 基金名称，用于生成文件名
+            - style (dict, optional): 绘图样式，只需要给出与 DEFAULT_STYLE 不同的项. Defaults to None.
+            - headless (bool, optional): 是否不经过 pyplot，直接用 Figure 与 Agg 画布绘图。这样既不切换全局的绘图后端，
+                                         也不修改全局的 rcParams(字体设置只在绘图期间生效)，适合在交互环境中批量出图. Defaults to False.
         """
         # 如果日期有任意一天不相等，就报错
         if not netval_data.index.equals(drawdown_data.index):
             raise ValueError("净值数据对应的日期序列须与回撤数据对应的日期序列完全一致")
         if type(netval_data) != pd.DataFrame or type(drawdown_data) != pd.Series:
             raise ValueError("输入数据类型错误，请看本函数注释")
-        plt.rcParams['font.sans-serif']=['Kaiti'] # 用来正常显示楷体图例
-        plt.rcParams['axes.unicode_minus']=False
+        self.style: dict = {**DEFAULT_STYLE, **(style or {})}
+        self.headless: bool = headless
+        self.rc_params: dict = {"font.sans-serif" : [self.style["legend_font"]], # 用来正常显示楷体图例
+                                "axes.unicode_minus" : False}
         
         # 需要截断日期，以有基金净值的第一天开始画图
         self.netval_data = netval_data[netval_data.index >= netval_data.first_valid_index()]
         self.drawdown_data = drawdown_data[netval_data.index >= netval_data.first_valid_index()]
         self.fund_name = fund_name # 设置基金名称
-        plt.figure(figsize = (10, 4))
-        self.ax = plt.gca() # 获得绘图区域(左轴)
+        if headless:
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            self.figure = Figure(figsize = self.style["figsize"])
+            FigureCanvasAgg(self.figure)
+            self.ax = self.figure.add_subplot() # 获得绘图区域(左轴)
+        else:
+            plt = load_pyplot()
+            plt.rcParams.update(self.rc_params)
+            self.figure = plt.figure(figsize = self.style["figsize"])
+            self.ax = plt.gca() # 获得绘图区域(左轴)
         self.ax2 = self.ax.twinx() # 获得绘图区域(右轴)
-        self.xtick_nums = 12 # 横轴你想设置显示多少个日期？
-        self.axis_font = "Arial" # 设置坐标轴字体
-        self.axis_font_size = 10 # 设置坐标轴字体大小
-        self.color_map = ["deep_red", "orange", "deep_grey"]
+        self.xtick_nums = self.style["xtick_nums"] # 横轴你想设置显示多少个日期？
+        self.axis_font = self.style["axis_font"] # 设置坐标轴字体
+        self.axis_font_size = self.style["axis_font_size"] # 设置坐标轴字体大小
+        self.color_map = self.style["color_map"]
         self.x_values = np.arange(0, len(self.netval_data.index)) # 初始化横轴的所有坐标值
     
     def basic_set(self):
@@ -168,7 +209,7 @@ class GraphDrawer:
         for idx in range(len(self.netval_data.columns)):
             column_name = self.netval_data.columns[idx]
             self.ax.plot(self.x_values, self.netval_data[column_name].values, 
-                         color = the_color_map[self.color_map[idx]], label = drop_suffix(column_name))    
+                         color = the_color_map[self.color_map[idx % len(self.color_map)]], label = drop_suffix(column_name))    
         self.ax2.plot(self.x_values, self.drawdown_data.values, linewidth = 0.5, color = the_color_map["shallow_grey"]) 
         self.ax2.plot(self.x_values, [0] * len(self.drawdown_data.values), color = the_color_map["shallow_grey"], linewidth = 0.5) 
         self.ax2.fill_between(self.x_values, self.drawdown_data.values, [0] * len(self.drawdown_data), 
@@ -180,8 +221,23 @@ class GraphDrawer:
         self.ax.legend(loc = (0.3, 1.025),frameon=False,fontsize = 10, ncol = 3) 
         self.ax2.legend(loc = (0.05,1.025),frameon=False,fontsize = 10)
 
-    def do_drawing(self):
-        """ 调用上面的成员函数进行绘图 """
+    def do_drawing(self, output_path: str = None) -> str:
+        """
+        调用上面的成员函数进行绘图，保存后关闭图像(批量绘图时不会累积占用内存)，返回保存的文件路径
+
+        Args:
+            output_path (str, optional): 保存路径，默认保存到 image 文件夹，文件名带有时间戳. Defaults to None.
+        """
+        if self.headless:
+            import matplotlib
+            with matplotlib.rc_context(self.rc_params):
+                return self.draw_and_save(output_path)
+        output_path = self.draw_and_save(output_path)
+        load_pyplot().close(self.figure)
+        return output_path
+
+    def draw_and_save(self, output_path: str = None) -> str:
+        """ 依次完成绘图的各个步骤并保存图片，返回保存的文件路径 """
         self.basic_set()
         x_ticks = self.set_xaxis_ticks()
         self.set_left_ax()
@@ -192,5 +248,7 @@ class GraphDrawer:
         self.ax.tick_params('x', direction = "in") # 横轴刻度线向内
         self.ax2.grid(axis='y', linestyle = "--",which = "major") # 设置横向虚线
         self.set_legend()
-        output_path = "image/" + self.fund_name + "净值与回撤走势" + datetime.now().strftime("%y%m%d%H%M%S") + ".svg"
-        plt.savefig(output_path, bbox_inches = 'tight') # 保存文件为矢量图
\ No newline at end of file
+        if output_path is None:
+            output_path = "image/" + self.fund_name + "净值与回撤走势" + datetime.now().strftime("%y%m%d%H%M%S") + "." + self.style["format"]
+        self.figure.savefig(output_path, bbox_inches = 'tight', dpi = self.style["dpi"]) # 默认保存为矢量图
+        return output_path
\ No newline at end of file
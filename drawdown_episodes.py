@@ -0,0 +1,133 @@
+"""
+此文件用于提取净值序列中的每一段回撤：高点日期、低点日期、修复日期、回撤幅度、下跌天数、修复天数。
+对净值数组只遍历一次(O(n))，可以用于单只基金、指增基金的超额净值(this_fund.excess)，也可以对整张净值数据表批量提取用于同类比较。
+口径与 Fund 一致：净值大于等于此前最高净值即视为创新高(与 is_new_high 一致)，最深一段回撤的幅度等于 max_drawdown
+"""
+import numpy as np
+import pandas as pd
+
+EPISODE_COLUMNS: list = ["高点日期", "低点日期", "修复日期", "回撤幅度", "下跌天数", "修复天数", "持续天数"]
+SUMMARY_COLUMNS: list = ["回撤次数", "最大回撤", "最长持续天数", "平均修复天数", "当前回撤幅度", "当前回撤持续天数"]
+DEFAULT_TOP_N: int = 5
+
+def extract_episodes(nav: np.ndarray) -> list:
+    """
+    单次遍历提取所有回撤区间，空值会被跳过
+
+    Args:
+        nav (np.ndarray): 按日期排列的净值
+
+    Returns:
+        list: [(高点位置, 低点位置, 修复位置, 回撤幅度)]，按高点位置排列；尚未修复的回撤修复位置是 -1
+    """
+    episodes = []
+    peak_pos, trough_pos = -1, -1
+    peak_value, trough_value = np.nan, np.nan
+    for pos, value in enumerate(nav):
+        if value != value: # 空值
+            continue
+        if peak_pos < 0 or value >= peak_value:
+            if trough_pos >= 0:
+                episodes.append((peak_pos, trough_pos, pos, trough_value / peak_value - 1))
+                trough_pos = -1
+            peak_pos, peak_value = pos, value
+        elif trough_pos < 0 or value < trough_value:
+            trough_pos, trough_value = pos, value
+    if trough_pos >= 0:
+        episodes.append((peak_pos, trough_pos, -1, trough_value / peak_value - 1))
+    return episodes
+
+def episodes_frame(nav: pd.Series, top_n: int = None, min_depth: float = 0.0) -> pd.DataFrame:
+    """
+    把净值序列中的回撤区间整理为数据表
+
+    Args:
+        - nav (pd.Series): 净值，index 是日期
+        - top_n (int, optional): 只保留最深的 top_n 段回撤，None 表示全部保留. Defaults to None.
+        - min_depth (float, optional): 只保留幅度不小于 min_depth 的回撤，例如 0.05 表示 5%. Defaults to 0.0.
+
+    Returns:
+        pd.DataFrame: 列为 EPISODE_COLUMNS，按回撤幅度从深到浅排列。
+                      尚未修复的回撤 修复日期 是 None、修复天数 是 np.nan，持续天数 计算到最新日期
+    """
+    dates = nav.index
+    last_date = dates[-1]
+    rows = []
+    for peak_pos, trough_pos, recovery_pos, depth in extract_episodes(nav.to_numpy(dtype = np.float64)):
+        if -depth < min_depth:
+            continue
+        peak_date, trough_date = dates[peak_pos], dates[trough_pos]
+        recovery_date = dates[recovery_pos] if recovery_pos >= 0 else None
+        end_date = recovery_date if recovery_date is not None else last_date
+        rows.append((peak_date, trough_date, recovery_date, depth, (trough_date - peak_date).days,
+                     (recovery_date - trough_date).days if recovery_date is not None else np.nan, (end_date - peak_date).days))
+    result = pd.DataFrame(rows, columns = EPISODE_COLUMNS)
+    result = result.sort_values("回撤幅度", kind = "stable").reset_index(drop = True)
+    return result if top_n is None else result.head(top_n)
+
+def drawdown_episodes(this_fund, top_n: int = None, min_depth: float = 0.0) -> pd.DataFrame:
+    """
+    提取某只基金(或者指增基金的超额部分 this_fund.excess)的回撤区间，参数与返回值见 episodes_frame
+
+    Args:
+        - this_fund (Fund): 基金对象
+        - top_n (int, optional): 只保留最深的 top_n 段回撤. Defaults to None.
+        - min_depth (float, optional): 只保留幅度不小于 min_depth 的回撤. Defaults to 0.0.
+    """
+    return episodes_frame(this_fund.basic_data.nav, top_n, min_depth)
+
+def panel_episodes(netval_data: pd.DataFrame, top_n: int = DEFAULT_TOP_N, min_depth: float = 0.0) -> pd.DataFrame:
+    """
+    对整张净值数据表(日期 × 基金)逐列提取回撤区间，用于同类比较
+
+    Args:
+        - netval_data (pd.DataFrame): 清洗后的净值数据表，例如 netval_cleaning.clean_panel 的结果
+        - top_n (int, optional): 每只基金保留最深的 top_n 段回撤，None 表示全部保留. Defaults to 5.
+        - min_depth (float, optional): 只保留幅度不小于 min_depth 的回撤. Defaults to 0.0.
+
+    Returns:
+        pd.DataFrame: 第一列是 基金名称，后面是 EPISODE_COLUMNS
+    """
+    frames = []
+    for fund_name in netval_data.columns:
+        frame = episodes_frame(netval_data[fund_name], top_n, min_depth)
+        frame.insert(0, "基金名称", fund_name)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index = True)
+
+def episode_summary(netval_data: pd.DataFrame) -> pd.DataFrame:
+    """
+    汇总整张净值数据表中每只基金的回撤特征，用于同类比较
+
+    Args:
+        netval_data (pd.DataFrame): 清洗后的净值数据表
+
+    Returns:
+        pd.DataFrame: index 是基金名称，列为 SUMMARY_COLUMNS。当前没有处于回撤中的基金，当前回撤幅度 是 0
+    """
+    rows = []
+    for fund_name in netval_data.columns:
+        episodes = episodes_frame(netval_data[fund_name])
+        ongoing = episodes[episodes["修复日期"].isna()]
+        rows.append((len(episodes), episodes["回撤幅度"].min() if len(episodes) else 0.0,
+                     episodes["持续天数"].max() if len(episodes) else 0, episodes["修复天数"].mean(),
+                     ongoing["回撤幅度"].iloc[0] if len(ongoing) else 0.0,
+                     ongoing["持续天数"].iloc[0] if len(ongoing) else 0))
+    return pd.DataFrame(rows, columns = SUMMARY_COLUMNS, index = pd.Index(netval_data.columns, name = "基金名称"))
+
+def episode_table(episodes: pd.DataFrame) -> np.ndarray:
+    """
+    生成补充表格 “回撤区间” 每个单元格需要填充的内容
+
+    Args:
+        episodes (pd.DataFrame): episodes_frame 或者 drawdown_episodes 的返回结果
+
+    Returns:
+        np.ndarray: 第一行是表头 [序号, 高点日期, 低点日期, 修复日期, 回撤幅度, 下跌天数, 修复天数]
+    """
+    table_contents = [["序号", "高点日期", "低点日期", "修复日期", "回撤幅度", "下跌天数", "修复天数"]]
+    for num, row in enumerate(episodes.itertuples(index = False), start = 1):
+        recovered = row.修复日期 is not None and not pd.isna(row.修复日期)
+        table_contents.append([str(num), str(row.高点日期), str(row.低点日期), str(row.修复日期) if recovered else "未修复",
+                               f"{row.回撤幅度 * 100:.1f}%", str(row.下跌天数), str(int(row.修复天数)) if recovered else "-"])
+    return np.array(table_contents)
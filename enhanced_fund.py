@@ -1,4 +1,5 @@
 """ 此文件的作用在于，处理指增基金，它继承了 Fund 类，还包含一个 Fund 类 """
+import copy
 import numpy as np
 import pandas as pd
 from datetime import date
@@ -6,10 +7,11 @@ from datetime import date
 import utils
 from fund import Fund
 import index_handler as ih
+import trading_calendar as tc
 
 class EnhancedFund(Fund):
     def __init__(self, fund_name: str, net_val: pd.Series, index_data: pd.DataFrame, index_name: str, 
-                 start_date: date = None, create_time: date = None):
+                 start_date: date = None, create_time: date = None, cleaned: bool = False, calendar: tc.TradingCalendar = None):
         """
         此类用于处理指增数据。既继承了 fund 模块，内部又包含一个 fund 模块(用于计算超额部分的相关指标)
 
@@ -18,74 +20,147 @@ class EnhancedFund(Fund):
             - net_val (pd.Series): 基金净值数据，注意必须只包括净值数据，绝对不可以把成立日期那一行也包括进来
                                  索引index是时间序列，datetime 或者 date 格式
             - index_data (pd.DataFrame): 指数数据，最左侧列需要是日期，传入原始的收盘价即可，读取数据时注意必须加：index_col = 0。
-                                      注意：只允许传入一个指数的数据，表示的是该指增基金对标的指数，且列名是该指数的名称。
+                                      可以包含多个指数(每列列名是指数名称)，构造一次即可得到相对每个指数的超额部分，见 for_benchmark。
                                       NOTE 尽一切可能保证 index_data 的首个有净值的日期出现在 net_val 的首个有净值的日期之前，或者二者相当
-            - index_name (str): 指数的名称
+            - index_name (str): 主要对标指数的名称。指数数据只有一列时它就是该列的名称；包含多列时必须是其中一列的列名
             - start_date (date, optional): 希望从哪个日期开始计算，是人为指定的开始日期，其数值必须在传入数据的日期序列当中。
                                          默认值为 None，表示将从传入数据的首个有净值的日期开始计算. Defaults to None.
             - create_time (date, optional): 基金成立日期，必须是 datetime.date 格式，可以不填. Defaults to None.
+            - cleaned (bool, optional): 净值数据是否已经由 netval_cleaning.clean_panel 清洗过. Defaults to False.
+            - calendar (TradingCalendar, optional): 整批基金共用的交易日历，超额部分也会复用它. Defaults to None.
         """
-        if len(index_data.columns) >= 2:
-            raise ValueError(index_data, "指数增强基金传入的指数数据只能包含一列，当前指数数据的列数：", len(index_data.columns))
-        super().__init__(fund_name, net_val, start_date, create_time) # 调用父类构造函数
-        self.index_data: pd.DataFrame = ih.IndexHandler(index_data, self.get_first_netval_date(), False).index_data # 指数收盘价预处理，但不标准化
-        self.correct_index_dates() # 日期校准，修改 self.index_data，使得指数数据与基金数据的日期序列一致
-        self.index_name = index_name # 指数的名称
-        self.excess_return: pd.Series = self.get_excess_return() # 计算超额收益
+        self.benchmark_names: list = [index_name] if len(index_data.columns) == 1 else list(index_data.columns)
+        if index_name not in self.benchmark_names:
+            raise ValueError(index_name, "指数数据包含多列时，index_name 必须是其中一列的列名，当前指数数据的列名：", list(index_data.columns))
+        super().__init__(fund_name, net_val, start_date, create_time, cleaned, calendar) # 调用父类构造函数
+        self.benchmark_data: pd.DataFrame = ih.IndexHandler(index_data, self.get_first_netval_date(), False).index_data # 指数收盘价预处理，但不标准化
+        self.correct_index_dates() # 日期校准，修改 self.benchmark_data，使得指数数据与基金数据的日期序列一致
+        self.benchmark_data.columns = self.benchmark_names
+        self.index_name = index_name # 主要对标指数的名称
+        self.index_data: pd.DataFrame = self.benchmark_data[[index_name]].copy() # 主要对标指数的数据，只有一列(副本，IndexHandler 会修改它)
+        self.excess_returns: pd.DataFrame = self.get_excess_returns() # 一次性计算相对所有指数的超额收益
+        self.excess_return: pd.Series = self.get_excess_return() # 相对主要对标指数的超额收益
         # NOTE 无论前面有没有指定 start_date，这里都不需要指定开始日期，因为 correct_index_dates() 已经将指数日期与基金日期对齐了
         # 也就是说，超额部分的数据不会早于基金最早的净值日期
-        self.excess: Fund = Fund(self.fund_name + "-超额", self.excess_return) # 用于计算超额收益的各项数据
+        self.excesses: dict = {name : Fund(self.fund_name + "-超额", self.excess_returns[name], calendar = self.calendar) for name in self.benchmark_names}
+        self.excess: Fund = self.excesses[index_name] # 用于计算超额收益的各项数据
     
     def correct_index_dates(self):
         """ 如果传入的指数数据的日期序列和基金净值的日期序列不一致，则校准指数数据日期序列，使得其与基金数据完全一致 """
-        self.index_data = self.basic_data.merge(self.index_data, how = "left", 
-                                                left_index = True, right_index = True)[[self.index_data.columns[0]]]
+        self.benchmark_data = self.basic_data.nav.to_frame().merge(self.benchmark_data, how = "left", 
+                                                left_index = True, right_index = True)[list(self.benchmark_data.columns)]
     
-    def get_excess_return(self) -> pd.Series:
-        """ 计算超额收益，第一个数值是1 """
+    def get_excess_returns(self) -> pd.DataFrame:
+        """ 对所有指数一次性计算超额收益(列与 self.benchmark_data 一致)，每列首个有效数值的前一个数值是1 """
         # 首先设置初始因子，即每个超额收益都要算的 (新基金净值/旧基金净值) / (新指数数据/旧指数数据)
-        initial_factor = (self.net_val.pct_change() + 1) / (self.index_data.iloc[:, 0].pct_change() + 1) 
+        initial_factor = (self.benchmark_data.pct_change() + 1).rdiv(self.net_val.pct_change() + 1, axis = 0)
         # NOTE 根据周报显示，首个超额收益数据是1，需要手动添加，做法是：超额收益数据计算出来后首个有效数据的前面一个数据改为1
-        initial_factor.iloc[list(initial_factor.index).index(initial_factor.first_valid_index()) - 1] = 1
+        factor_values = initial_factor.to_numpy(copy = True)
+        valid = ~np.isnan(factor_values)
+        if not valid.any(axis = 0).all():
+            raise ValueError(list(initial_factor.columns[~valid.any(axis = 0)]), "这些指数与基金净值没有重合的日期，无法计算超额收益")
+        factor_values[valid.argmax(axis = 0) - 1, np.arange(factor_values.shape[1])] = 1
+        initial_factor = pd.DataFrame(factor_values, index = initial_factor.index, columns = initial_factor.columns)
         return initial_factor.cumprod() # 直接用累乘返回超额收益
 
+    def get_excess_return(self) -> pd.Series:
+        """ 计算相对主要对标指数的超额收益，第一个数值是1 """
+        return self.excess_returns[self.index_name]
+
+    def for_benchmark(self, index_name: str) -> "EnhancedFund":
+        """
+        获取以另一个指数为对标指数的视图。视图与原对象共用净值数据与已经算好的超额收益，不会重新构造基金，
+        视图的 excess、index_data、index_name 都对应新的指数，因此它的指标、表格、绘图数据都是相对该指数的
+
+        Args:
+            index_name (str): 指数名称，必须在 self.benchmark_names 中
+        """
+        if index_name not in self.excesses:
+            raise ValueError(index_name, "该指数不在指数数据中，可选的指数：", self.benchmark_names)
+        if index_name == self.index_name:
+            return self
+        view = copy.copy(self)
+        view.index_name = index_name
+        view.index_data = self.benchmark_data[[index_name]].copy()
+        view.excess_return = self.excess_returns[index_name]
+        view.excess = self.excesses[index_name]
+        return view
+
+    def benchmark_indicators(self) -> pd.DataFrame:
+        """ 相对每个指数的超额部分的六个指标(见 Fund.risk_indicators)，index 是指数名称 """
+        return pd.DataFrame([self.excesses[name].risk_indicators() for name in self.benchmark_names], index = self.benchmark_names)
+
+    def benchmark_table(self, indicators: pd.DataFrame = None) -> np.ndarray:
+        """
+        生成补充表格 “多基准对比” 每个单元格需要填充的内容，每行是相对一个指数的超额部分
+
+        Args:
+            indicators (pd.DataFrame, optional): 预先计算好的 benchmark_indicators 结果. Defaults to None.
+        """
+        indicators = self.benchmark_indicators() if indicators is None else indicators
+        table_contents = [["对标指数"] + self.get_risk_table_headers()[1:]]
+        for name in self.benchmark_names:
+            table_contents.append([name] + self.excesses[name].get_risk_table_header_indicators(indicators.loc[name].to_dict())[1:])
+        return np.array(table_contents)
+
     def get_chart_data(self) -> pd.Series:
         """ 重载方法，用于获取指增类基金的绘图数据，注意：这里以超额收益为基准，对数据进行截断。参数列表没有用 """
         start_date: date = self.excess.get_first_netval_date()
         # 对净值数据进行截断后标准化
         truncated_netval: pd.Series = ih.IndexHandler(pd.DataFrame(self.net_val), start_date).index_data.iloc[:, 0]
         merged_data = pd.DataFrame()
-        merged_data["超额收益最大回撤(右轴)"] = self.excess.basic_data[self.excess.get_column_name("回撤")]
+        merged_data["超额收益最大回撤(右轴)"] = self.excess.basic_data.drawdown
         merged_data[self.fund_name] = truncated_netval
-        merged_data["超额收益"] = self.excess.basic_data[self.excess.get_column_name("标准化")]
+        merged_data["超额收益"] = self.excess.basic_data.normalized
         merged_data[self.index_name] = ih.IndexHandler(self.index_data, start_date).index_data.iloc[:, 0]
         return merged_data[start_date:]
     
-    def return_risk_table(self, start_year: int = None) -> np.ndarray:
+    def index_fund(self) -> Fund:
+        """ 主要对标指数本身，起始日期与基金的首个净值日期一致，用于 “收益风险指标” 中的指数一行 """
+        return Fund(self.index_name, self.index_data.iloc[:, 0], self.get_first_netval_date(), calendar = self.calendar)
+
+    def return_risk_indicators(self, indicators: dict = None) -> dict:
+        """
+        重载方法，“收益风险指标” 表头部分每一行的原始数值(未格式化)：基金净值、主要对标指数、超额收益
+
+        Args:
+            indicators (dict, optional): 预先计算好的超额部分指标字典，至少包含 risk_indicators 的六个指标. Defaults to None.
+
+        Returns:
+            dict: {统计口径 : {指标名称 : 数值}}，统计口径依次是 “净值”, “指数”, “超额”
+        """
+        return {"净值" : self.risk_indicators(), "指数" : self.index_fund().risk_indicators(),
+                "超额" : self.excess.return_risk_indicators(indicators)["净值"]}
+
+    def return_risk_table(self, start_year: int = None, indicators: dict = None, year_returns: dict = None,
+                          row_indicators: dict = None) -> np.ndarray:
         """
         生成表格：“收益风险指标”每个单元格需要填充的内容。
         注意：年度收益会包括基金净值数据第一年和最新一年的数据，即便这两个年份的收益率或许并不是全年的收益率。
         NOTE 时间线对齐：start_date 以基金本身的 start_date 为基准：即 self.get_first_netval_date()
 
         Args:
-            start_year (int, optional): 选择起始年份，如果没有选择，则从第一个净值日期所在年份开始计算. Defaults to None.
+            - start_year (int, optional): 选择起始年份，如果没有选择，则从第一个净值日期所在年份开始计算. Defaults to None.
+            - indicators (dict, optional): 预先计算好的超额部分指标字典，至少包含 risk_indicators 的六个指标. Defaults to None.
+            - year_returns (dict, optional): 预先计算好的超额部分年度收益 {年份 : 收益率}. Defaults to None.
+            - row_indicators (dict, optional): 预先计算好的 return_risk_indicators 结果，给出时不再重新计算. Defaults to None.
         Returns:
             np.ndarray: 返回 table 对应的矩阵，矩阵的行数和列数与 table 的行数和列数一致
         """     
         table_contents = []
         table_headers = self.get_risk_table_headers()
         table_contents.append(table_headers)
-        table_contents.append(self.get_risk_table_header_indicators()) # 开始时间： self.get_first_netval_date()
-        table_contents.append(Fund(self.index_name, self.index_data.iloc[:, 0], 
-                                   self.get_first_netval_date()).get_risk_table_header_indicators()) # 开始时间： self.get_first_netval_date()
+        row_indicators = {} if row_indicators is None else row_indicators
+        table_contents.append(self.get_risk_table_header_indicators(row_indicators.get("净值", None))) # 开始时间： self.get_first_netval_date()
+        table_contents.append(self.index_fund().get_risk_table_header_indicators(row_indicators.get("指数", None))) # 开始时间： self.get_first_netval_date()
         # 为了生成表格便利，这里暂时改变的超额部分的名称
         store_name = self.excess.fund_name
         self.excess.fund_name = "超额收益"
-        table_contents.append(self.excess.get_risk_table_header_indicators()) # 开始时间：self.excess.get_first_netval_date() 
+        table_contents.append(self.excess.get_risk_table_header_indicators(row_indicators.get("超额", indicators))) # 开始时间：self.excess.get_first_netval_date() 
         self.excess.fund_name = store_name
         # 范围是 [start_year, end_year] 两侧都是闭区间
         start_year = self.excess.get_first_netval_date().year if start_year is None else start_year
         end_year = self.excess.get_last_date().year   
-        table_contents += self.excess.get_year_return_lines(start_year, end_year, len(table_headers) - 1)
+        table_contents += self.excess.get_year_return_lines(start_year, end_year, len(table_headers) - 1, year_returns)
         return np.array(table_contents)
     
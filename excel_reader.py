@@ -0,0 +1,168 @@
+"""
+此文件用于从很宽的净值数据表(几百只基金 × 十几年)中只读取需要的基金与日期区间。
+以 openpyxl 的只读模式逐行流式读取，只有被选中的列、落在日期区间内的行才会生成 Python 对象，
+结果与 pd.read_excel(netval_path, index_col = 0) 再选取列与行完全一致，可以直接交给 netval_cleaning.clean_panel。
+
+用法示例(对比完整读取与选择性读取的耗时与峰值内存)：
+    python excel_reader.py data/非指增批量测试数据.xlsx --funds 沣京价值增强一期 大禾投资-掘金1号 --start 2021-01-01
+"""
+import sys
+import time
+import argparse
+import tracemalloc
+from datetime import date
+import pandas as pd
+
+import date_handler as dh
+
+COMPARE_COLUMNS: list = ["耗时(秒)", "峰值内存(MB)", "行数", "列数"]
+
+def column_names(header: tuple) -> list:
+    """ 表头行 --> 列名，空白表头的命名规则与 pandas 一致，即 "Unnamed: 列序号" """
+    return [value if value is not None else f"Unnamed: {idx}" for idx, value in enumerate(header)]
+
+def try_date(value) -> date:
+    """ 把日期列的单元格转为 datetime.date，不是日期的单元格(例如 “成立日期” 之类的说明行)返回 None """
+    try:
+        return dh.scalar_to_date(value)
+    except ValueError:
+        return None
+
+def read_netval(netval_path: str, fund_names: list = None, start_date = None, end_date = None,
+                sheet_name: str = None) -> pd.DataFrame:
+    """
+    选择性读取净值数据表：第一列是日期，第一行是基金名称，只读取 fund_names 中的基金以及 [start_date, end_date] 内的行
+
+    Args:
+        - netval_path (str): 净值数据表路径(.xlsx)
+        - fund_names (list, optional): 需要读取的基金名称，结果的列顺序与之一致，None 表示全部基金. Defaults to None.
+        - start_date (_type_, optional): 起始日期(含)，可以是 str, datetime.datetime, datetime.date，None 表示不限制. Defaults to None.
+        - end_date (_type_, optional): 结束日期(含)，None 表示不限制. Defaults to None.
+        - sheet_name (str, optional): 工作表名称，None 表示第一个工作表. Defaults to None.
+
+    Returns:
+        pd.DataFrame: 与 pd.read_excel(netval_path, index_col = 0)[fund_names] 在日期区间内的部分一致。
+                      指定了日期区间时，日期列中不是日期的行会被丢弃
+    """
+    import openpyxl
+    start_date = dh.scalar_to_date(start_date) if start_date is not None else None
+    end_date = dh.scalar_to_date(end_date) if end_date is not None else None
+    if start_date is not None and end_date is not None and start_date > end_date:
+        raise ValueError(start_date, end_date, "起始日期不能晚于结束日期")
+    workbook = openpyxl.load_workbook(netval_path, read_only = True, data_only = True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name is not None else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only = True)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError(netval_path, "净值数据表是空的")
+        names = column_names(header)
+        if fund_names is None:
+            fund_names = names[1:]
+        fund_names = list(fund_names)
+        positions = {name : idx for idx, name in reversed(list(enumerate(names))) if idx > 0}
+        unknown_funds = [name for name in fund_names if name not in positions]
+        if unknown_funds:
+            raise ValueError(unknown_funds, "这些基金没有出现在净值数据表中：", netval_path)
+        selected = [positions[name] for name in fund_names]
+        filter_dates = start_date is not None or end_date is not None
+        # 后面的行只需要读到最右边一只被选中的基金为止
+        rows = sheet.iter_rows(min_row = 2, max_col = max(selected, default = 0) + 1, values_only = True)
+        index, values = [], []
+        last_date: date = None
+        ascending = True # 日期一直升序时，超过结束日期就可以停止读取后面的行
+        for row in rows:
+            if not row or all(value is None for value in row):
+                continue # 空行，pandas 也会跳过
+            if filter_dates:
+                row_date = try_date(row[0])
+                if row_date is None:
+                    continue # 不是日期的行不属于任何日期区间
+                ascending = ascending and (last_date is None or row_date > last_date)
+                last_date = row_date
+                if end_date is not None and row_date > end_date:
+                    if ascending:
+                        break
+                    continue
+                if start_date is not None and row_date < start_date:
+                    continue
+            index.append(row[0])
+            values.append([row[idx] if idx < len(row) else None for idx in selected])
+    finally:
+        workbook.close()
+    result = pd.DataFrame(values, columns = fund_names, index = pd.Index(index, name = header[0]))
+    # 与 pandas 一致：整列都是数值的列转为数值类型
+    return result.infer_objects()
+
+def load_netval(netval_path: str, select_funds: list = None, date_window: tuple = None) -> pd.DataFrame:
+    """
+    批量入口读取净值数据表：没有指定基金与日期区间时与原来一样用 pd.read_excel 完整读取，否则用 read_netval 选择性读取
+
+    Args:
+        - netval_path (str): 净值数据表路径
+        - select_funds (list, optional): 只读取这些基金，结果的列顺序与之一致. Defaults to None.
+        - date_window (tuple, optional): (起始日期, 结束日期)，任意一端可以是 None. Defaults to None.
+    """
+    if select_funds is None and date_window is None:
+        return pd.read_excel(netval_path, index_col = 0)
+    start_date, end_date = date_window if date_window is not None else (None, None)
+    return read_netval(netval_path, select_funds, start_date, end_date)
+
+def measure(read_function, *args, **kwargs) -> tuple:
+    """ 运行一次读取函数，返回 (结果, 耗时(秒), tracemalloc 记录的峰值内存(MB)) """
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    try:
+        result = read_function(*args, **kwargs)
+        elapsed = time.perf_counter() - start_time
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak / 1024 ** 2
+
+def compare_read(netval_path: str, fund_names: list = None, start_date = None, end_date = None,
+                 sheet_name: str = None) -> pd.DataFrame:
+    """
+    对比完整读取(pd.read_excel 后再选取)与选择性读取的耗时与峰值内存，并检查两者结果一致
+
+    Args:
+        参数与 read_netval 一致
+
+    Returns:
+        pd.DataFrame: index 是 ["完整读取", "选择性读取"]，列为 COMPARE_COLUMNS
+    """
+    def full_read():
+        netval_data = pd.read_excel(netval_path, index_col = 0, sheet_name = sheet_name if sheet_name is not None else 0)
+        if fund_names is not None:
+            netval_data = netval_data[list(fund_names)]
+        if start_date is not None or end_date is not None:
+            start, end = dh.scalar_to_date(start_date or date.min), dh.scalar_to_date(end_date or date.max)
+            dates = [try_date(elem) for elem in netval_data.index]
+            netval_data = netval_data[[elem is not None and start <= elem <= end for elem in dates]]
+        return netval_data
+
+    # 先做一次不计时的选择性读取：基金名称不存在时直接抛出 read_netval 的错误；同时完成 openpyxl 的导入并预热文件缓存，
+    # 否则导入的耗时与内存会全部算在先测量的一方
+    read_netval(netval_path, fund_names, start_date, end_date, sheet_name)
+    selected_data, selected_time, selected_peak = measure(read_netval, netval_path, fund_names, start_date, end_date, sheet_name)
+    full_data, full_time, full_peak = measure(full_read)
+    # 完整读取时表中混有说明行(例如成立日期)，日期与净值都是 object 类型，因此只比较数值，不比较类型
+    if [try_date(elem) for elem in selected_data.index] != [try_date(elem) for elem in full_data.index]:
+        raise ValueError(netval_path, "选择性读取的日期与完整读取不一致")
+    pd.testing.assert_frame_equal(selected_data.reset_index(drop = True), full_data.reset_index(drop = True), check_dtype = False)
+    return pd.DataFrame([[full_time, full_peak, len(full_data), len(full_data.columns)],
+                         [selected_time, selected_peak, len(selected_data), len(selected_data.columns)]],
+                        index = ["完整读取", "选择性读取"], columns = COMPARE_COLUMNS)
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description = "对比完整读取与选择性读取净值数据表的耗时与峰值内存")
+    parser.add_argument("netval_path", help = "净值数据表路径(.xlsx)")
+    parser.add_argument("--funds", nargs = "*", default = None, help = "需要读取的基金名称，不填表示全部基金")
+    parser.add_argument("--start", default = None, help = "起始日期，例如 2021-01-01")
+    parser.add_argument("--end", default = None, help = "结束日期，例如 2023-12-31")
+    parser.add_argument("--sheet", default = None, help = "工作表名称，不填表示第一个工作表")
+    args = parser.parse_args(argv)
+    print(compare_read(args.netval_path, args.funds, args.start, args.end, args.sheet).round(4))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,159 @@
+"""
+此文件用于在不生成 WORD 的情况下导出一批基金的全部指标：关键指标、近期收益、年度收益、月度收益、滚动收益率分位数、收益概率，
+收益风险指标(指增基金包括基金净值、主要对标指数、超额收益三行)，
+以及可选的自助法置信区间、回撤区间、多基准超额指标。导出的是数值本身(float)，而不是格式化之后的百分比字符串，支持 Parquet、CSV、JSON Lines 三种格式以及长表、宽表两种布局
+"""
+import os
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+import utils
+import netval_cleaning as nc
+import trading_calendar as tc
+import excel_reader as xr
+import report_context as rctx
+
+# 长表的列
+LONG_COLUMNS: list = ["基金名称", "统计口径", "分类", "项目", "期间", "数值"]
+# 文本型指标转换为数值的规则
+TEXT_VALUES: dict = {"是" : 1.0, "否" : 0.0}
+
+def context_records(context: rctx.ReportContext) -> pd.DataFrame:
+    """
+    把报告上下文中的数值展开为长表，每个数值一行
+
+    Args:
+        context (rctx.ReportContext): 报告上下文，需要包含报告主体与补充表格(main_report = True, indicators_tables = True)
+
+    Returns:
+        pd.DataFrame: 列为 LONG_COLUMNS。指增基金的 统计口径 是 “超额”，其余是 “净值”；
+                      “收益风险指标” 逐行导出表头部分的每一行，统计口径分别是 “净值”, “指数”(主要对标指数), “超额”；
+                      “是否创新高” 转换为 1.0/0.0；期间 在年度收益中是 “2023”，在月度收益中是 “2023-01”
+    """
+    if context.month_returns is None or context.rolling_quantile_data is None:
+        raise ValueError(context.fund_name, "导出数值需要同时计算报告主体与补充表格：main_report = True, indicators_tables = True")
+    rows = []
+    for name, value in context.indicators.items():
+        rows.append(("关键指标", name, "", value))
+    for name, value in (context.recent_returns or {}).items():
+        rows.append(("近期收益", name, "", value))
+    for year, value in context.year_returns.items():
+        rows.append(("年度收益", "年度收益", str(year), value))
+    for (year, month), value in context.month_returns.items():
+        rows.append(("月度收益", "月度收益", f"{year}-{month:02d}", value))
+    for category, frame in [("滚动收益率分位数", context.rolling_quantile_data), ("收益概率", context.earning_probability_data)]:
+        for row_name, row in frame.iterrows():
+            for period_name, value in row.items():
+                rows.append((category, str(row_name), str(period_name), value))
+    if context.bootstrap_intervals is not None:
+        for name, row in context.bootstrap_intervals.iterrows():
+            rows.append(("置信区间", name, "置信下限", row["置信下限"]))
+            rows.append(("置信区间", name, "置信上限", row["置信上限"]))
+    if context.drawdown_episodes is not None:
+        for num, row in enumerate(context.drawdown_episodes.itertuples(index = False), start = 1):
+            for name in ["回撤幅度", "下跌天数", "修复天数"]:
+                rows.append(("回撤区间", name, f"第{num}段", getattr(row, name)))
+    if context.benchmark_indicators is not None:
+        for index_name, row in context.benchmark_indicators.iterrows():
+            for name, value in row.items():
+                rows.append(("多基准超额", name, str(index_name), value))
+    target_scope = "超额" if context.enhanced_fund else "净值"
+    scopes = [target_scope] * len(rows)
+    for scope, indicators in (context.return_risk_indicators or {}).items():
+        for name, value in indicators.items():
+            rows.append(("收益风险指标", name, "", value))
+            scopes.append(scope)
+    records = pd.DataFrame(rows, columns = LONG_COLUMNS[2:])
+    records["数值"] = pd.to_numeric(records["数值"].replace(TEXT_VALUES), errors = "coerce").astype(np.float64)
+    records.insert(0, "统计口径", scopes)
+    records.insert(0, "基金名称", context.fund_name)
+    return records
+
+def to_wide(records: pd.DataFrame) -> pd.DataFrame:
+    """
+    长表转为宽表：每只基金一行，每个 统计口径|分类|项目|期间 组合一列，列的顺序与长表中首次出现的顺序一致
+
+    Args:
+        records (pd.DataFrame): context_records 的返回结果(或者多个结果拼接)
+    """
+    field_parts = records[["统计口径", "分类", "项目", "期间"]].astype(str)
+    fields = field_parts["统计口径"] + "|" + field_parts["分类"] + "|" + field_parts["项目"] + \
+             np.where(field_parts["期间"] != "", "|" + field_parts["期间"], "")
+    wide = pd.DataFrame({"基金名称" : records["基金名称"].values, "字段" : fields.values, "数值" : records["数值"].values})
+    wide = wide.pivot(index = "基金名称", columns = "字段", values = "数值")
+    wide = wide.reindex(index = pd.unique(records["基金名称"]), columns = pd.unique(fields))
+    wide.columns.name = None
+    return wide.reset_index()
+
+def write_records(records: pd.DataFrame, output_path: str, layout: str = "long") -> str:
+    """
+    将导出结果写入文件，格式由后缀名决定：.parquet / .csv / .jsonl
+
+    Args:
+        - records (pd.DataFrame): 长表格式的导出结果
+        - output_path (str): 输出文件路径
+        - layout (str, optional): "long" 长表或者 "wide" 宽表. Defaults to "long".
+
+    Returns:
+        str: 输出文件路径
+    """
+    if layout not in ["long", "wide"]:
+        raise ValueError(layout, "layout 只能是 long 或者 wide")
+    table = records if layout == "long" else to_wide(records)
+    suffix = os.path.splitext(output_path)[1].lower()
+    output_dir = os.path.dirname(output_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    if suffix == ".parquet":
+        try:
+            table.to_parquet(output_path, index = False)
+        except ImportError as e:
+            raise ImportError("导出 Parquet 需要安装 pyarrow：pip install pyarrow；也可以改为导出 .csv 或 .jsonl") from e
+    elif suffix == ".csv":
+        table.to_csv(output_path, index = False, encoding = "utf-8-sig") # utf-8-sig 使得 Excel 打开时中文不乱码
+    elif suffix == ".jsonl":
+        table.to_json(output_path, orient = "records", lines = True, force_ascii = False)
+    else:
+        raise ValueError(output_path, "导出文件的后缀名只能是 .parquet, .csv 或者 .jsonl")
+    return output_path
+
+def export_batch(netval_path: str, index_path: str, enhanced_fund: bool, output_path: str,
+                 layout: str = "long", **kwargs) -> str:
+    """
+    导出一个净值数据表中所有基金的全部指标，不生成 WORD。参数与 multi_fund_report 一致
+
+    Args:
+        - netval_path (str): 净值数据表路径，可以包含多个基金
+        - index_path (str): 指数数据表路径
+        - enhanced_fund (bool): 是否是指增基金
+        - output_path (str): 输出文件路径，后缀名决定格式
+        - layout (str, optional): "long" 或者 "wide". Defaults to "long".
+        - kwargs: start_dates, analyze_text_start_year, history_table_start_year, bootstrap_samples, bootstrap_seed, drawdown_episodes，
+                  select_funds, date_window，含义与 multi_fund_report 一致
+
+    Returns:
+        str: 输出文件路径
+    """
+    import report_generate as rg
+    netval_data = xr.load_netval(netval_path, kwargs.get("select_funds", None), kwargs.get("date_window", None))
+    index_data = pd.read_excel(index_path, index_col = 0)
+    netval_data, clean_report = nc.clean_panel(netval_data)
+    nc.print_clean_report(clean_report)
+    calendar: tc.TradingCalendar = tc.batch_calendar(netval_data.index)
+    fund_names: list = netval_data.columns
+    start_dates: list = kwargs.get("start_dates", [])
+    start_dates = start_dates + (len(fund_names) - len(start_dates)) * [None]
+    all_records = []
+    for idx in tqdm(range(len(fund_names))):
+        context = rg.build_report_context(netval_data.iloc[:, idx], index_data, enhanced_fund, utils.CORP_DEFAULT_NAME,
+                                          start_dates[idx], None, True, fund_name = fund_names[idx],
+                                          index_name = index_data.columns[0], chart_data = False, cleaned = True,
+                                          calendar = calendar,
+                                          analyze_text_start_year = kwargs.get("analyze_text_start_year", None),
+                                          history_table_start_year = kwargs.get("history_table_start_year", None),
+                                          bootstrap_samples = kwargs.get("bootstrap_samples", 0),
+                                          bootstrap_seed = kwargs.get("bootstrap_seed", None),
+                                          drawdown_episodes = kwargs.get("drawdown_episodes", 0))
+        all_records.append(context_records(context))
+    return write_records(pd.concat(all_records, ignore_index = True), output_path, layout)
@@ -6,14 +6,54 @@ import numpy as np
 import pandas as pd
 from datetime import date
 from datetime import datetime
+from functools import cached_property
 from dateutil.relativedelta import relativedelta
 
 import date_handler as dh
 import index_handler as ih
 import utils
+import netval_cleaning as nc
+import period_query as pq
+import trading_calendar as tc
+
+class BasicData:
+    # 导出时各字段对应的列名后缀，净值列的列名就是基金名称
+    EXPORT_SUFFIXES: dict = {"nav" : "", "returns" : "-收益率", "drawdown" : "-回撤", "normalized" : "-标准化"}
+
+    def __init__(self, nav: pd.Series, drawdown: pd.Series, contain_standard: bool = True):
+        """
+        周报计算中的四列基础数据，每一列都是一个直接访问的字段，日期索引相同
+
+        Args:
+            - nav (pd.Series): 净值数据
+            - drawdown (pd.Series): 回撤数据
+            - contain_standard (bool, optional): 是否计算标准化净值. Defaults to True.
+
+        Attributes:
+            - nav (pd.Series): 净值
+            - returns (pd.Series): 周度收益率
+            - drawdown (pd.Series): 回撤
+            - normalized (pd.Series): 以首个有效净值为 1 的标准化净值，contain_standard 为 False 时是 None
+            - index (pd.Index): 日期索引
+        """
+        self.nav: pd.Series = nav
+        self.returns: pd.Series = nav.pct_change() # 计算周度收益率
+        self.drawdown: pd.Series = drawdown
+        self.normalized: pd.Series = nav / nav[nav.first_valid_index()] if contain_standard else None
+        self.index: pd.Index = nav.index
+
+    def to_frame(self, fund_name: str) -> pd.DataFrame:
+        """
+        生成带中文列名的数据表，仅用于导出。
+        例如：沣京价值增强一期 沣京价值增强一期-收益率 沣京价值增强一期-回撤  沣京价值增强一期-标准化
+        """
+        columns = {fund_name + suffix : getattr(self, field) for field, suffix in self.EXPORT_SUFFIXES.items()
+                   if getattr(self, field) is not None}
+        return pd.DataFrame(columns, index = self.index)
 
 class Fund:
-    def __init__(self, fund_name: str, net_val: pd.Series, start_date: date = None, create_time: date = None):
+    def __init__(self, fund_name: str, net_val: pd.Series, start_date: date = None, create_time: date = None,
+                 cleaned: bool = False, calendar: tc.TradingCalendar = None):
         """
         构造一个基金类，它存储了基金的净值数据，成立日期，基金名称
 
@@ -24,29 +64,36 @@ class Fund:
                                    index 是时间序列，datetime 或者 date 格式
             - start_date(date): 希望从哪个日期开始计算，是人为指定的开始日期，其数值必须在传入数据的日期序列当中
                                 默认值为 None，表示将从传入数据的首个有净值的日期开始计算
-            - basic_data (pd.DataFrame): 表示周报计算中的四列 "净值数据" "周度收益" "回撤" "标准化"。
-              例如：沣京价值增强一期 沣京价值增强一期-收益率 沣京价值增强一期-回撤  沣京价值增强一期-标准化
-              它是导出指标，可以自动计算。
+            - basic_data (BasicData): 表示周报计算中的四列 "净值数据" "周度收益" "回撤" "标准化"，
+              通过字段 nav, returns, drawdown, normalized 直接访问。它是导出指标，可以自动计算。
+              需要带中文列名的数据表时使用 get_basic_data()
+            - cleaned (bool): 净值数据是否已经由 netval_cleaning.clean_panel 清洗过(转为数值并插值)，是的话不再重复清洗
+            - calendar (TradingCalendar): 整批基金共用的交易日历，月末、年末、近期收益的日期匹配直接复用日历中预先算好的结果。
+                                          基金的日期序列不是日历中连续的一段时不使用日历
         """
         if len(net_val) == 0:
             raise ValueError("你传入的参数没有任何数据，禁止构建此对象")
-        # 日期统一为 datetime.date 格式，也就是有三个属性 year month day
-        net_val.index = dh.list_to_date(net_val.index)
+        # 日期统一为 datetime.date 格式，也就是有三个属性 year month day；已经是 datetime.date 时不再逐个转换
+        if isinstance(net_val.index, pd.DatetimeIndex):
+            net_val.index = pd.Index(net_val.index.date)
+        elif pd.api.types.infer_dtype(net_val.index, skipna = False) != "date":
+            net_val.index = dh.list_to_date(net_val.index)
         create_time = dh.scalar_to_date(create_time) if create_time is not None else create_time
-        self.net_val = self.interpolation(net_val)
+        self.net_val = net_val if cleaned else self.interpolation(net_val)
         self.create_time = create_time # NOTE 该变量似乎没有在后面的代码中使用
         self.fund_name = fund_name
         if start_date is not None:
             if start_date not in self.net_val.index:
                 raise ValueError(start_date, "开始日期必须在传入数据的日期序列里")
             self.net_val = self.net_val[self.net_val.index >= start_date] # 手动设置起始日期后会截取净值数据
-        self.basic_data = self.get_basic_data()
+        self.basic_data: BasicData = BasicData(self.net_val, self.calculate_drawdown())
         self.date_list = self.basic_data.index # 获得日期列表
+        self.calendar: tc.TradingCalendar = calendar if calendar is not None and calendar.covers(self.date_list) else None
         self.rolling_return_data = self.get_rolling_return_data()  # 滚动收益数据表
 
     def get_column_name(self, search_name: str = None) -> str:
         """
-        获取合适的列名。例如，当 self.basic_data 列名是
+        获取 get_basic_data() 导出的数据表中合适的列名。例如，当导出的数据表列名是
         [沣京价值增强一期 沣京价值增强一期-收益率 沣京价值增强一期-回撤  沣京价值增强一期-标准化]
         这四列，输入 "收益" 或者 "收益率" 得到 列名 "沣京价值增强一期-收益率";
         输入 "回撤" 得到 列名 "沣京价值增强一期-回撤"; 输入标准化，得到"沣京价值增强一期-标准化"
@@ -54,14 +101,15 @@ class Fund:
 
         Args:
             search_name (str): 输入 "收益""收益率"(这二者得到结果一致)  "回撤" "标准化" 以得到该对象的数据表中对应的列名
-                               也可以输入 None，默认获取数据表 basic_data 第一列的列名
+                               也可以输入 None，默认获取导出数据表第一列的列名
 
         Returns:
-            str: 匹配到的数据表 basic_data 中的列名。如果匹配不到，代码自然会报错。
+            str: 匹配到的导出数据表中的列名。如果匹配不到，代码自然会报错。
         """
         if not search_name:
-            return self.basic_data.columns[0]
-        return [column for column in self.basic_data.columns if (search_name in column.lstrip(self.fund_name))][0]
+            return self.fund_name
+        # NOTE 只去掉基金名称这个前缀，而不是像 lstrip 那样去掉开头所有属于基金名称的字符
+        return [self.fund_name + suffix for suffix in BasicData.EXPORT_SUFFIXES.values() if search_name in suffix][0]
     
     def get_first_netval_date(self) -> date:
         """
@@ -115,23 +163,21 @@ class Fund:
         Args:
             net_val (pd.Series): 基金净值数据，index 是时间序列，datetime.date 格式
         """
-        net_val = net_val.apply(pd.to_numeric, errors = 'coerce')  # 能转数值就转数值，不能的话就转 Nan
-        return net_val.interpolate(method='linear') # 线性插值：首部缺失不填充，中部缺失取线性，尾部缺失取尾数
+        # 能转数值就转数值，不能的话就转 Nan；然后线性插值：首部缺失不填充，中部缺失取线性，尾部缺失取尾数
+        return nc.clean_series(net_val)
     
     def get_basic_data(self, contain_standard: bool = True) -> pd.DataFrame:
         """
+        生成带中文列名的基础数据表，仅用于导出，计算指标时请直接使用 self.basic_data 的字段
+
         Args:
             contain_standard (bool, optional): 可选参数，表示是否包含标准化那一列
 
         Returns:
             pd.DataFrame: 导出的4列(如果 contain_standard是 False，那就是 3 列)基础数据
         """
-        basic_data = pd.DataFrame(self.net_val, columns = [self.fund_name])
-        basic_data[self.fund_name + "-收益率"] = basic_data[self.fund_name].pct_change() # 计算周度收益率
-        basic_data[self.fund_name + "-回撤"] = self.calculate_drawdown() # 计算回撤
-        if contain_standard: # 计算标准化
-            basic_data[self.fund_name + "-标准化"] = self.net_val / self.net_val[self.net_val.first_valid_index()] 
-        return basic_data
+        basic_data = self.basic_data.to_frame(self.fund_name)
+        return basic_data if contain_standard else basic_data.drop(columns = self.fund_name + "-标准化")
     
     def get_rolling_return_data(self) -> pd.DataFrame:
         """ 获得半年、一年、二年、三年、五年的滚动收益，列名恰好是 半年、一年、二年、三年、五年 """
@@ -165,6 +211,12 @@ class Fund:
         calculate_result[self.net_val.first_valid_index()] = np.nan
         return calculate_result
     
+    def closest_date(self, target_date: date) -> date:
+        """ 在日期序列中查找与 target_date 最接近的日期，不在范围内时返回 None。有交易日历时复用日历，否则调用 find_closest_date """
+        if self.calendar is None:
+            return dh.find_closest_date(target_date, self.date_list)
+        return self.calendar.closest_date(target_date, self.date_list[0], self.date_list[-1])
+
     def get_proper_end_date(self, raw_end_date: date) -> date:
         """
         由于某月或者某年没有过完，2024/1/31 这种日期有可能超出数据表的范围，从而无法匹配与之最接近的日期，
@@ -172,8 +224,8 @@ class Fund:
         而对于最近一个月或者最新年份，最后一天设置为净值数据表的最后一个日期，例如，数据表最后一个日期是 2023-11-23
         那么在计算2023年11月的月度收益率时，我们会把该月结束日期改为 2023-11-23
         """
-        return self.get_last_date() if not dh.date_in_range(raw_end_date, self.date_list) \
-                                        else dh.find_closest_date(raw_end_date, self.date_list)
+        closest_date: date = self.closest_date(raw_end_date)
+        return self.get_last_date() if closest_date is None else closest_date
     
     def get_proper_start_date(self, raw_start_date: date, year: int, month: int = None) -> date:
         """
@@ -187,7 +239,7 @@ class Fund:
         check_year: bool = (year == self.get_first_netval_date().year)
         check_month: bool = (month == self.get_first_netval_date().month) if month is not None else True
         return  self.get_first_netval_date() if check_year and check_month  \
-                else dh.find_closest_date(raw_start_date, self.date_list) 
+                else self.closest_date(raw_start_date)
 
 
     def one_year_return(self, year: int) -> float:
@@ -231,6 +283,18 @@ class Fund:
         except:
             return np.nan
     
+    def get_year_return(self, year: int, year_returns: dict = None) -> float:
+        """
+        获取某一年的收益率。如果传入了预先计算好的年度收益字典，就直接查字典，否则调用 one_year_return 现场计算
+
+        Args:
+            - year (int): 年份
+            - year_returns (dict, optional): {年份(int) : 收益率}，一般由 ReportContext 预先计算. Defaults to None.
+        """
+        if year_returns is not None and year in year_returns:
+            return year_returns[year]
+        return self.one_year_return(year) if year is not None else np.nan
+
     def all_year_return(self, start_year: int = None) -> dict:
         """
         获取所有年份的收益率，如果前面的年份收益数据无法计算，那么该年度得到 np.nan
@@ -318,13 +382,18 @@ class Fund:
         """
         try:
             final_date: date = self.get_last_date()
-            begin_date: date = dh.find_closest_date(final_date - relativedelta(months = month), self.date_list)
+            begin_date: date = self.closest_date(final_date - relativedelta(months = month))
             return self.net_val[final_date] / self.net_val[begin_date] - 1
         except:
             np.nan
     
     def all_recent_return(self) -> dict:
-        """ 获取 近一月、近三月、近六月、近一年、近两年、近三年 的收益率 """
+        """ 获取 近一月、近三月、近六月、近一年、近两年、近三年 的收益率。只计算一次，返回的是副本，修改它不影响缓存 """
+        return dict(self.recent_return_values)
+
+    @cached_property
+    def recent_return_values(self) -> dict:
+        """ all_recent_return 的缓存，首次使用时计算(同类排名与报告上下文共用同一个基金对象时不会重复计算) """
         recent_months: list = [1, 3, 6, 12, 24, 36]
         indicator_list: list = ["近一月", "近三月", "近六月", "近一年", "近两年", "近三年"]
         result_dict: dict = {}
@@ -345,37 +414,30 @@ class Fund:
     
     def max_drawdown(self) -> dict:
         """ 获取历史最大回撤 """
-        # 首先需要获取回撤那一列的列名，找不到就报错
-        column_name = self.get_column_name("回撤")
-        return {"最大回撤" : self.basic_data[column_name].min()}
+        return {"最大回撤" : self.basic_data.drawdown.min()}
     
     def max_drawdown_of_recent_year(self) -> dict:
         """ 获取最近一年最大回撤，不足一年的情况下，该函数相当于获取历史最大回撤
             计算方式：比如最新日期 2023-10-20，函数会寻找最接近 2022-10-20 的日期，并计算 [2022-10-20, 2023-10-20] 闭区间内的最大回撤 """
-        one_year_ago: date = dh.find_closest_date(self.get_last_date() - relativedelta(years = 1), self.date_list)
-        column_name = self.get_column_name("回撤")
+        one_year_ago: date = self.closest_date(self.get_last_date() - relativedelta(years = 1))
         indicator_name = "过去一年最大回撤"
         if not one_year_ago:
             return {indicator_name : self.max_drawdown()["最大回撤"]}
-        return {indicator_name : self.basic_data[column_name][one_year_ago:].min()}
+        return {indicator_name : self.basic_data.drawdown[one_year_ago:].min()}
     
     def max_weekly_drawdown(self) -> dict:
         """ 计算最大周度回撤 """
         indicator_name = "最大周度回撤"
-        column_name = self.get_column_name("收益率")
-        return {indicator_name : self.basic_data[column_name].min()}
+        return {indicator_name : self.basic_data.returns.min()}
     
     def this_week_return(self) -> dict:
         """ 获取最新一周的收益率 """
         indicator_name = "本周收益率"
-        column_name = self.get_column_name("收益率")
-        return {indicator_name : self.basic_data[column_name][self.get_last_date()]}
+        return {indicator_name : self.basic_data.returns[self.get_last_date()]}
     
     def annual_volatility(self) -> dict:
         """ 获取年化波动率：NOTE BUG 注意：这里是直接计算的标准差，故可能与周报中的数据有出入 """
-        # 首先需要获取收益率那一列的列名，找不到就报错
-        column_name = self.get_column_name("收益")
-        return {"年化波动率" : self.basic_data[column_name].std() * math.sqrt(52)}
+        return {"年化波动率" : self.basic_data.returns.std() * math.sqrt(52)}
     
     def sharpe_ratio(self, risk_free_rate: float = 0.015) -> dict:
         """ 获取夏普比率，无风险利率默认是 1.5% """
@@ -384,14 +446,12 @@ class Fund:
     
     def weekly_win_rate(self) -> dict:
         """ 获取周胜率 = 大于0的周度收益 / 所有有效的收益率数值个数 """
-        # 首先需要获取收益率那一列的列名，找不到就报错
-        column_name = self.get_column_name("收益")
-        weekly_return = self.basic_data[column_name]
+        weekly_return = self.basic_data.returns
         return {"周胜率" : len(weekly_return[weekly_return > 0]) / (~weekly_return.isna()).sum()}
     
     def decline_std(self) -> dict:
         """ 计算下行标准差，公式与周报计算一致。求解时只求平方和而不减去均值 """
-        return_data = self.basic_data[self.get_column_name("收益率")]
+        return_data = self.basic_data.returns
         return {"下行标准差" : math.sqrt((return_data[return_data < 0] ** 2).sum() / (return_data.count() - 1))}
     
     def decline_std_annualize(self) -> dict:
@@ -417,13 +477,44 @@ class Fund:
         return {indicator_name : (self.get_last_date() - self.net_val.idxmax()).days}
     
     def summary_indicators(self) -> dict: 
-        """ 汇总除了 年度收益、月度收益及近期收益 之外的所有指标 """
+        """ 汇总除了 年度收益、月度收益及近期收益 之外的所有指标。只计算一次，返回的是副本，修改它不影响缓存 """
+        return dict(self.summary_indicator_values)
+
+    @cached_property
+    def summary_indicator_values(self) -> dict:
+        """ summary_indicators 的缓存，首次使用时计算(同类排名与报告上下文共用同一个基金对象时不会重复计算) """
         return {**self.cumulative_return(), **self.annual_return(), **self.max_drawdown(),
                 **self.annual_volatility(), **self.sharpe_ratio(), **self.weekly_win_rate(),
                 **self.this_week_return(), **self.max_drawdown_of_recent_year(), **self.max_weekly_drawdown(),
                 **self.decline_std(), **self.decline_std_annualize(), **self.sortino_ratio(),
                 **self.calmar_ratio(), **self.is_new_high(), **self.days_until_new_high()}
     
+    @cached_property
+    def period_query(self) -> pq.PeriodQuery:
+        """ 任意日期区间的查询器，首次使用时构造(对收益率求一次前缀和)，之后的查询都复用它 """
+        return pq.PeriodQuery(self.basic_data.nav, self.basic_data.returns)
+
+    def query_period(self, start, end = None) -> dict:
+        """
+        查询任意日期区间的 区间收益率、年化收益率、年化波动率、夏普比率，不需要以新的 start_date 重新构造基金对象。
+        端点匹配最近的净值日期，规则与 find_closest_date 一致
+
+        Args:
+            - start (_type_): 起始日期，可以是 str, datetime.datetime, datetime.date
+            - end (_type_, optional): 结束日期，None 表示最新日期. Defaults to None.
+        """
+        return self.period_query.query_one(start, self.get_last_date() if end is None else end)
+
+    def query_periods(self, starts, ends) -> pd.DataFrame:
+        """
+        一次向量化地查询多个日期区间，返回值的列见 period_query.QUERY_COLUMNS，端点不在日期范围内的查询是 np.nan
+
+        Args:
+            - starts (_type_): 起始日期序列
+            - ends (_type_): 结束日期序列，长度与 starts 一致
+        """
+        return self.period_query.query(starts, ends)
+
     def get_single_quantile(self, quantile: float, period_name: str) -> float:
         """
         获取指定滚动期限的收益率
@@ -462,12 +553,14 @@ class Fund:
         result.index.name = "盈利概率"
         return result
     
-    def history_return_table(self, start_year: int = None) -> np.ndarray:
+    def history_return_table(self, start_year: int = None, month_returns: dict = None, year_returns: dict = None) -> np.ndarray:
         """
         生成历史月度收益率表格每个单元格需要填充的内容
 
         Args:
-            start_year (int, optional): 选择起始年份，如果没有选择，则从第一个净值日期所在年份开始计算. Defaults to None.
+            - start_year (int, optional): 选择起始年份，如果没有选择，则从第一个净值日期所在年份开始计算. Defaults to None.
+            - month_returns (dict, optional): 预先计算好的月度收益 {(年份, 月份) : 收益率}. Defaults to None.
+            - year_returns (dict, optional): 预先计算好的年度收益 {年份 : 收益率}. Defaults to None.
         
         Returns:
             np.ndarry: 返回 table 对应的矩阵，矩阵的行数和列数与 table 的行数和列数一致
@@ -480,16 +573,20 @@ class Fund:
         table_headers =  ["年份"] + [str(idx) + "月" for idx in range(1, 13)] + ["全年"]
         return_matrix.append(table_headers)
         for year in range(end_year, start_year - 1, -1):
-            return_matrix.append(self.get_month_return_line(year))
+            return_matrix.append(self.get_month_return_line(year, month_returns, year_returns))
         return np.array(return_matrix)
     
-    def return_risk_table(self, start_year: int = None) -> np.ndarray:
+    def return_risk_table(self, start_year: int = None, indicators: dict = None, year_returns: dict = None,
+                          row_indicators: dict = None) -> np.ndarray:
         """
         生成表格：“收益风险指标”每个单元格需要填充的内容。
         注意：年度收益会包括基金净值数据第一年和最新一年的数据，即便这两个年份的收益率或许并不是全年的收益率。
 
         Args:
-            start_year (int, optional): 选择起始年份，如果没有选择，则从第一个净值日期所在年份开始计算. Defaults to None.
+            - start_year (int, optional): 选择起始年份，如果没有选择，则从第一个净值日期所在年份开始计算. Defaults to None.
+            - indicators (dict, optional): 预先计算好的指标字典，至少包含 risk_indicators 的六个指标. Defaults to None.
+            - year_returns (dict, optional): 预先计算好的年度收益 {年份 : 收益率}. Defaults to None.
+            - row_indicators (dict, optional): 预先计算好的 return_risk_indicators 结果，给出时优先使用. Defaults to None.
         Returns:
             np.ndarray: 返回 table 对应的矩阵，矩阵的行数和列数与 table 的行数和列数一致
         """     
@@ -497,29 +594,47 @@ class Fund:
 
         table_contents = []
         table_headers = self.get_risk_table_headers()
-        indicators_line = self.get_risk_table_header_indicators()
+        indicators_line = self.get_risk_table_header_indicators(row_indicators["净值"] if row_indicators is not None else indicators)
         table_contents.append(table_headers)
         table_contents.append(indicators_line)
 
         # 范围是 [start_year, end_year] 两侧都是闭区间
         start_year = self.get_first_netval_date().year if start_year is None else start_year
         end_year = self.get_last_date().year   
-        table_contents += self.get_year_return_lines(start_year, end_year, len(table_headers) - 1)
+        table_contents += self.get_year_return_lines(start_year, end_year, len(table_headers) - 1, year_returns)
         return np.array(table_contents)
     
     def get_risk_table_headers(self) -> list:
         """ 生成表格：“收益风险指标” 的表头 """
         return ["指标", "累计收益率", "年化收益率", "最大回撤", "年化波动率", "夏普比率", "周胜率"]
     
-    def get_risk_table_header_indicators(self) -> list:
-        """ 生成表格： “收益风险指标” 表头对应的数值"""
-        indicators = {**self.cumulative_return(), **self.annual_return(), **self.max_drawdown(),
+    def return_risk_indicators(self, indicators: dict = None) -> dict:
+        """
+        “收益风险指标” 表头部分每一行的原始数值(未格式化)，便于导出。普通基金只有基金净值一行
+
+        Args:
+            indicators (dict, optional): 预先计算好的指标字典，至少包含 risk_indicators 的六个指标. Defaults to None.
+
+        Returns:
+            dict: {统计口径 : {指标名称 : 数值}}，统计口径是 “净值”
+        """
+        indicators = self.risk_indicators() if indicators is None else indicators
+        return {"净值" : {key : indicators[key] for key in self.get_risk_table_headers()[1:]}}
+
+    def risk_indicators(self) -> dict:
+        """ 表格 “收益风险指标” 以及分析文本用到的六个指标：累计收益率、年化收益率、最大回撤、年化波动率、夏普比率、周胜率 """
+        return {**self.cumulative_return(), **self.annual_return(), **self.max_drawdown(),
                 **self.annual_volatility(), **self.sharpe_ratio(), **self.weekly_win_rate()}
+
+    def get_risk_table_header_indicators(self, indicators: dict = None) -> list:
+        """ 生成表格： “收益风险指标” 表头对应的数值。indicators 是预先计算好的指标字典，不传则现场计算 """
+        indicators = self.risk_indicators() if indicators is None else indicators
+        keys = self.get_risk_table_headers()[1:]
         return [self.fund_name] +  [utils.round_decimal(indicators[key]) if "夏普" in key else 
-                                               utils.decimal_to_pct(indicators[key]) for key in indicators.keys()]
+                                               utils.decimal_to_pct(indicators[key]) for key in keys]
 
     
-    def get_year_return_lines(self, start_year: int, end_year: int, one_row_nums: int = 6) -> list:
+    def get_year_return_lines(self, start_year: int, end_year: int, one_row_nums: int = 6, year_returns: dict = None) -> list:
         """
         获取 “收益风险指标” 表格中 年度/收益 年度/收益这些行，范围是从 [start_year, end_year] 
 
@@ -527,6 +642,7 @@ class Fund:
             - start_year (int): 开始年份
             - end_year (int): 结束年份
             - one_row_nums (int, optional): 一行包含几年的收益率指标？ Defaults to 6.
+            - year_returns (dict, optional): 预先计算好的年度收益 {年份 : 收益率}. Defaults to None.
 
         Returns:
             list:  “收益风险指标” 表格中 年度/收益 这些行需要填充的内容。注意：某些行没有填满，必须以空字符串""代替
@@ -539,25 +655,27 @@ class Fund:
             year_list = total_year_list[iterator * one_row_nums : (iterator + 1) * one_row_nums]
             year_list += [None] * (one_row_nums - len(year_list))
             header_line = ["年度"] + ["" if elem is None else str(elem) + "年" for elem in year_list]
-            value_line = [self.one_year_return(year) for year in year_list]
+            value_line = [self.get_year_return(year, year_returns) for year in year_list]
             value_header = "超额收益" if "超额" in self.fund_name else "收益"
             value_line = [value_header] + [utils.decimal_to_pct(elem) if not pd.isna(elem) else "" for elem in value_line]
             result.append(header_line)
             result.append(value_line)
         return result
 
-    def get_month_return_line(self, year: int) -> list:
+    def get_month_return_line(self, year: int, month_returns: dict = None, year_returns: dict = None) -> list:
         """ 
         生成私募报告中“历史收益分析”某一行的数据
         获取某一年的月度收益率数据 + 全年数据(最后一年和净值日期开始的年份的“全年”列默认是空值) \n
         NOTE 基金净值首个月收益率和最新一个月的收益率可能并不是整个月的收益率，但是会被包括在下表中。
         比如：如果数据只到2023/10/21，那么2023年10月的收益率表示的是从10月初到2023/10/21日的收益率
+        month_returns 与 year_returns 是预先计算好的月度/年度收益，不传则现场计算
         """
-        monthly_return = [self.one_month_return(year, month) for month in range(1, 13)]
+        monthly_return = [month_returns[(year, month)] if month_returns is not None and (year, month) in month_returns
+                          else self.one_month_return(year, month) for month in range(1, 13)]
         monthly_return = ["-" if pd.isna(elem) else utils.decimal_to_pct(elem) for elem in monthly_return]
         # NOTE 这里简化处理：基金净值日期第一年和基金净值日期最后一年的“全年”列都是空值
         check_year: bool = (year == self.get_first_netval_date().year) or (year == self.get_last_date().year)
-        yearly_return =  ["-"] if check_year else [utils.decimal_to_pct(self.one_year_return(year))]
+        yearly_return =  ["-"] if check_year else [utils.decimal_to_pct(self.get_year_return(year, year_returns))]
         return [str(year)] + monthly_return + yearly_return
     
     def get_chart_data(self, index_data: pd.DataFrame) -> str:
@@ -571,39 +689,36 @@ class Fund:
             返回导出作图文件的名称
         """
         index_handler = ih.IndexHandler(index_data, self.get_first_netval_date())
-        drawdown_col_name = self.get_column_name("回撤")
-        standalized_col_name = self.get_column_name("标准化")
-        the_fund_data = self.basic_data[[drawdown_col_name, 
-                                         standalized_col_name]][self.basic_data.index >= self.get_first_netval_date()]
-        the_fund_data.rename(columns = {standalized_col_name : utils.drop_suffix(standalized_col_name),
-                                        drawdown_col_name : "最大回撤(右轴)"}, inplace = True)
+        the_fund_data = pd.DataFrame({"最大回撤(右轴)" : self.basic_data.drawdown, self.fund_name : self.basic_data.normalized})
+        the_fund_data = the_fund_data[self.basic_data.index >= self.get_first_netval_date()]
         return the_fund_data.merge(index_handler.index_data, how = "left", left_index = True, right_index = True)
     
     def export_chart_data(self, merged_data: pd.Series) -> str:
         """ 将 get_chart_data 的返回结果进行导出，返回导出的作图文件的名称 """
-        file_name = utils.generate_filename("__" + self.fund_name + "作图数据") 
-        merged_data.to_excel("output/" + file_name)
-        return file_name
+        return utils.export_chart_data(self.fund_name, merged_data)
 
-    def get_analyze_text(self, start_year: int = None):
+    def get_analyze_text(self, start_year: int = None, indicators: dict = None, year_returns: dict = None):
         """ 获取私募报告中要填写的分析文本
 
         模板：中金量化-贝叶斯稳健 1 号 2020 年 12 月以来累计收益 53.1%，年化收益 15.6%，产品正常运作以来最大回撤-6.7%，夏普 1.5，胜率 55.0%。
               分年度看，2021 年收益 37.2%、2022 年收益 4.5%、2023 年截至 12 月 1 日收益 6.8%。 
         
         Args:
-            start_year(int): 可以指定在分析年度收益时，从哪年开始分析，可选参数。
+            - start_year(int): 可以指定在分析年度收益时，从哪年开始分析，可选参数。
+            - indicators (dict, optional): 预先计算好的指标字典，至少包含 risk_indicators 的六个指标. Defaults to None.
+            - year_returns (dict, optional): 预先计算好的年度收益 {年份 : 收益率}. Defaults to None.
         """
         self.err_check_start_year_ge_first_netval(start_year)
 
         blank_fill = "超额" if "超额" in self.fund_name else ""
         fund_name = self.fund_name.rstrip("-超额")
         start_time = self.get_first_netval_date().strftime("%Y年%m月")
-        cumulative_return = utils.decimal_to_pct(list(self.cumulative_return().values())[0])
-        annual_return = utils.decimal_to_pct(list(self.annual_return().values())[0])
-        max_drawdown = utils.decimal_to_pct(list(self.max_drawdown().values())[0])
-        sharpe_ratio = utils.round_decimal(list(self.sharpe_ratio().values())[0])
-        weekly_win_rate = utils.decimal_to_pct(list(self.weekly_win_rate().values())[0])
+        indicators = self.risk_indicators() if indicators is None else indicators
+        cumulative_return = utils.decimal_to_pct(indicators["累计收益率"])
+        annual_return = utils.decimal_to_pct(indicators["年化收益率"])
+        max_drawdown = utils.decimal_to_pct(indicators["最大回撤"])
+        sharpe_ratio = utils.round_decimal(indicators["夏普比率"])
+        weekly_win_rate = utils.decimal_to_pct(indicators["周胜率"])
         template_str = f"{fund_name}{start_time}以来累计{blank_fill}收益{cumulative_return}，" + \
                        f"年化{blank_fill}收益{annual_return}，产品正常运作以来{blank_fill}最大回撤{max_drawdown}，" + \
                        f"{blank_fill}夏普比率{sharpe_ratio}，{blank_fill}周胜率{weekly_win_rate}。"
@@ -611,7 +726,7 @@ class Fund:
         start_year = self.get_first_netval_date().year if start_year is None else start_year
         end_year = self.get_last_date().year
         start_day = self.get_first_netval_date().strftime("%m月%d日")
-        start_year_return = utils.decimal_to_pct(self.one_year_return(start_year))
+        start_year_return = utils.decimal_to_pct(self.get_year_return(start_year, year_returns))
 
         if start_year == end_year: # NOTE 特殊情况，比如只有2023年需要分析的情况
             end_day = self.get_last_date().strftime("%m月%d日")
@@ -620,10 +735,10 @@ class Fund:
         yearly_return_str = f"分年度看，{start_year}年从{start_day}到年底{blank_fill}收益{start_year_return}、" \
                             if start_year == self.get_first_netval_date().year else f"分年度看，{start_year}年{blank_fill}收益{start_year_return}、"
         for year in range(start_year + 1, end_year):
-            year_return = utils.decimal_to_pct(self.one_year_return(year))
+            year_return = utils.decimal_to_pct(self.get_year_return(year, year_returns))
             yearly_return_str += f"{year}年{blank_fill}收益{year_return}、"
         end_day = self.get_last_date().strftime("%m月%d日")
-        end_year_return = utils.decimal_to_pct(self.one_year_return(end_year))
+        end_year_return = utils.decimal_to_pct(self.get_year_return(end_year, year_returns))
         yearly_return_str += f"{end_year}年截至{end_day}{blank_fill}收益{end_year_return}。"
         return template_str + yearly_return_str
     
@@ -0,0 +1,248 @@
+"""
+此文件用于把报告上下文(report_context.ReportContext)输出为 HTML，供内部日常监控使用，不依赖 WORD/EXCEL。
+每只基金一个页面，内容与 WORD 报告一致(净值走势图、分析文本、收益风险指标、历史收益以及补充表格)，
+净值走势图以内联 SVG 绘制，样式与图片都写在页面内，单个文件即可打开；整批基金另外生成一个索引页。
+配色使用 utils.color_dict，表头规则与 WORD 表格一致(utils.is_table_header)。
+
+用法示例：
+    import report_generate as rg
+    rg.multi_fund_report("data/非指增批量测试数据.xlsx", "data/指数数据.xlsx", False, html_dir = "output/html")
+"""
+import os
+import html
+import numpy as np
+import pandas as pd
+
+import utils
+import draw_plot as dp
+import chart_service as cs
+
+DEFAULT_OUTPUT_DIR: str = "output/html"
+INDEX_FILE_NAME: str = "index.html"
+# 索引页展示的关键指标，指增基金是超额收益的指标
+INDEX_INDICATORS: list = ["累计收益率", "年化收益率", "最大回撤", "年化波动率", "夏普比率", "周胜率"]
+# 净值走势图的尺寸(像素)与边距(上, 右, 下, 左)
+CHART_WIDTH: int = 960
+CHART_HEIGHT: int = 400
+CHART_MARGIN: tuple = (40, 60, 70, 50)
+# 文件名中不能出现的字符
+INVALID_FILE_CHARS: str = '\\/:*?"<>|'
+
+PAGE_STYLE: str = f"""
+body {{ font-family: "KaiTi", "楷体", "STKaiti", serif; margin: 24px auto; max-width: 1000px; color: #222; }}
+h1 {{ font-size: 22px; }}
+h2 {{ font-size: 18px; margin-top: 28px; }}
+h3 {{ font-size: 16px; margin-top: 20px; }}
+p.footnote {{ font-size: 12px; color: rgb{utils.color_dict["deep_grey"]}; margin: 4px 0 12px 0; }}
+table {{ border-collapse: collapse; font-family: "Times New Roman", "KaiTi", "楷体", serif; font-size: 13px; }}
+td {{ border: 1px solid rgb{utils.color_dict["shallow_grey"]}; padding: 3px 8px; text-align: center; white-space: nowrap; }}
+td.header {{ background: rgb{utils.color_dict["deep_red"]}; color: white; font-weight: bold; }}
+a {{ color: rgb{utils.color_dict["middle_blue"]}; text-decoration: none; }}
+"""
+
+def color(color_name: str) -> str:
+    """ utils.color_dict 中的颜色 --> CSS/SVG 颜色字符串，例如 rgb(192, 0, 0) """
+    return "rgb" + str(utils.color_dict[color_name])
+
+def html_table(matrix: np.ndarray, title_mode: str) -> str:
+    """
+    把报告中的表格矩阵转为 HTML 表格，表头单元格以 deep_red 填充
+
+    Args:
+        - matrix (np.ndarray): 表格矩阵，例如 ReportContext.return_risk_table
+        - title_mode (str): 表头模式，与 WORD 表格一致，例如 "sep", "first_row"
+    """
+    rows = []
+    for row_idx, row in enumerate(matrix):
+        cells = "".join(f'<td class="header">{html.escape(str(value))}</td>' if utils.is_table_header(title_mode, row_idx, col_idx)
+                        else f"<td>{html.escape(str(value))}</td>" for col_idx, value in enumerate(row))
+        rows.append(f"<tr>{cells}</tr>")
+    return "<table>" + "".join(rows) + "</table>"
+
+def nice_ticks(lower: float, upper: float, max_ticks: int = 7) -> list:
+    """ 左轴刻度：在 [lower, upper] 内取间隔为 0.1/0.2/0.5 × 10^k 的刻度，刻度数量不超过 max_ticks """
+    span = max(upper - lower, 1e-6)
+    for step in [base * 10 ** power for power in range(-2, 4) for base in [1, 2, 5]]:
+        if span / step <= max_ticks - 1:
+            break
+    first = np.ceil(lower / step - 1e-9) * step
+    return [round(value, 6) for value in np.arange(first, upper + step * 1e-6, step)]
+
+def svg_path(x_values: np.ndarray, y_values: np.ndarray) -> str:
+    """ 折线的 SVG path，y 值是 NaN 的地方断开 """
+    parts, pen_down = [], False
+    for x_value, y_value in zip(x_values.tolist(), y_values.tolist()): # 转为 Python 浮点数，格式化更快
+        if np.isnan(y_value):
+            pen_down = False
+            continue
+        parts.append(f"{'L' if pen_down else 'M'}{x_value:.1f},{y_value:.1f}")
+        pen_down = True
+    return "".join(parts)
+
+def svg_chart(chart_data: pd.DataFrame, width: int = CHART_WIDTH, height: int = CHART_HEIGHT,
+              xtick_nums: int = dp.DEFAULT_STYLE["xtick_nums"]) -> str:
+    """
+    以内联 SVG 绘制净值与回撤走势图，布局与 draw_plot.GraphDrawer 一致：净值曲线在左轴，回撤阴影在右轴(0 在顶部)
+
+    Args:
+        - chart_data (pd.DataFrame): ReportContext.chart_data，回撤列的列名包含 “回撤”
+        - width (int, optional): 图像宽度(像素). Defaults to CHART_WIDTH.
+        - height (int, optional): 图像高度(像素). Defaults to CHART_HEIGHT.
+        - xtick_nums (int, optional): 横轴显示多少个日期. Defaults to 12.
+    """
+    netval_data, drawdown_data = cs.split_chart_data(chart_data)
+    # 与 GraphDrawer 一致，从有净值数据的第一天开始画图
+    first_date = netval_data.first_valid_index()
+    netval_data, drawdown_data = netval_data[netval_data.index >= first_date], drawdown_data[netval_data.index >= first_date]
+    top, right, bottom, left = CHART_MARGIN
+    plot_width, plot_height = width - left - right, height - top - bottom
+    points_num = len(netval_data.index)
+    x_values = left + np.arange(points_num) * (plot_width / max(points_num - 1, 1))
+
+    values = netval_data.to_numpy(dtype = float)
+    left_lower, left_upper = dp.get_closest_val(np.nanmin(values)), dp.get_closest_val(np.nanmax(values))
+    if left_upper <= left_lower:
+        left_upper = left_lower + 0.2
+    left_y = lambda value : top + (left_upper - value) / (left_upper - left_lower) * plot_height
+    drawdown = np.nan_to_num(drawdown_data.to_numpy(dtype = float))
+    right_lower = min(dp.get_closest_percent(drawdown.min()), -0.01)
+    right_y = lambda value : top + value / right_lower * plot_height
+    left_ticks = nice_ticks(left_lower, left_upper)
+    step = dp.get_best_interval(right_lower, len(left_ticks))
+    right_ticks = [value for value in np.arange(0, step * len(left_ticks), step) if value >= right_lower - 1e-9]
+
+    elements = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+                f'font-family="Arial, KaiTi, sans-serif" font-size="11">']
+    # 右轴：横向虚线、刻度与回撤阴影
+    for value in right_ticks:
+        y_value = right_y(value)
+        elements.append(f'<line x1="{left}" y1="{y_value:.1f}" x2="{left + plot_width}" y2="{y_value:.1f}" '
+                        f'stroke="{color("shallow_grey")}" stroke-dasharray="4,3" stroke-width="0.6"/>')
+        elements.append(f'<text x="{left + plot_width + 6}" y="{y_value + 4:.1f}">{value:.0%}</text>')
+    area = " ".join(f"{x_value:.1f},{right_y(value):.1f}" for x_value, value in zip(x_values.tolist(), drawdown.tolist()))
+    elements.append(f'<polygon points="{x_values[0]:.1f},{top} {area} {x_values[-1]:.1f},{top}" fill="{color("shallow_grey")}"/>')
+    # 左轴：刻度与净值曲线
+    for value in left_ticks:
+        elements.append(f'<text x="{left - 6}" y="{left_y(value) + 4:.1f}" text-anchor="end">{value:g}</text>')
+    color_map = dp.DEFAULT_STYLE["color_map"]
+    for idx, column_name in enumerate(netval_data.columns):
+        elements.append(f'<path d="{svg_path(x_values, left_y(values[:, idx]))}" fill="none" '
+                        f'stroke="{color(color_map[idx % len(color_map)])}" stroke-width="1.5"/>')
+    # 横轴：底边与日期刻度
+    bottom_y = top + plot_height
+    elements.append(f'<line x1="{left}" y1="{bottom_y}" x2="{left + plot_width}" y2="{bottom_y}" stroke="black" stroke-width="0.8"/>')
+    for tick in dict.fromkeys(int(elem) for elem in np.linspace(0, points_num - 1, xtick_nums)):
+        x_value = x_values[tick]
+        elements.append(f'<line x1="{x_value:.1f}" y1="{bottom_y}" x2="{x_value:.1f}" y2="{bottom_y - 4}" stroke="black" stroke-width="0.8"/>')
+        elements.append(f'<text x="{x_value:.1f}" y="{bottom_y + 14}" text-anchor="end" '
+                        f'transform="rotate(-45 {x_value:.1f} {bottom_y + 14})">{html.escape(str(netval_data.index[tick]))}</text>')
+    # 图例：回撤在最左边，其后依次是各条净值曲线
+    legend_x = left
+    elements.append(f'<rect x="{legend_x}" y="10" width="18" height="10" fill="{color("shallow_grey")}"/>')
+    elements.append(f'<text x="{legend_x + 22}" y="19" font-size="12">{html.escape(str(drawdown_data.name))}</text>')
+    legend_x += 40 + 13 * len(str(drawdown_data.name))
+    for idx, column_name in enumerate(netval_data.columns):
+        label = dp.drop_suffix(str(column_name))
+        elements.append(f'<line x1="{legend_x}" y1="15" x2="{legend_x + 18}" y2="15" '
+                        f'stroke="{color(color_map[idx % len(color_map)])}" stroke-width="2"/>')
+        elements.append(f'<text x="{legend_x + 22}" y="19" font-size="12">{html.escape(label)}</text>')
+        legend_x += 40 + 13 * len(label)
+    elements.append("</svg>")
+    return "".join(elements)
+
+def table_section(title: str, matrix: np.ndarray, title_mode: str, footer_text: str) -> str:
+    """ 一张表格及其标题、脚注 """
+    return (f"<h3>{html.escape(title)}</h3>{html_table(matrix, title_mode)}"
+            f'<p class="footnote">{html.escape(footer_text)}</p>')
+
+def fund_page(context, add_indicators_tables: bool = False) -> str:
+    """
+    单只基金的 HTML 页面，结构与 report_generate.render_report 生成的 WORD 一致
+
+    Args:
+        - context (rctx.ReportContext): 报告上下文，必须包含报告主体(main_report = True)与绘图数据
+        - add_indicators_tables (bool, optional): 是否包含补充表格. Defaults to False.
+    """
+    fund_name, footer_text = context.fund_name, context.footer_text
+    blank_fill = "超额" if context.enhanced_fund else ""
+    sections = [f"<h1>1. {html.escape(fund_name)}</h1>",
+                svg_chart(context.chart_data) if context.chart_data is not None else "",
+                f'<p class="footnote">数据来源：{html.escape(context.corp_name)}，Wind</p>',
+                "<h2>1) 业绩分析</h2>",
+                "<h3>1.1) 收益走势</h3>",
+                f"<p>{html.escape(context.analyze_text)}</p>",
+                table_section("1.2) 收益风险指标", context.return_risk_table, "weak_sep" if context.enhanced_fund else "sep", footer_text),
+                table_section(f"1.3) 历史{blank_fill}收益分析", context.history_return_table, "first_row", footer_text)]
+    if add_indicators_tables:
+        # 与 write_indicator_tables 一致，可选表格存在哪张就写哪张，序号依次递增
+        tables = [("关键指标汇总", context.summary_indicator_table, "row_sep"),
+                  ("滚动收益率分布", context.rolling_quantile_table, "first_row"),
+                  ("收益概率统计", context.earning_probability_table, "first_row"),
+                  ("同类排名", context.peer_rank_table, "first_row"), ("指标置信区间", context.bootstrap_table, "first_row"),
+                  ("回撤区间", context.drawdown_episode_table, "first_row"), ("多基准对比", context.benchmark_table, "first_row")]
+        tables = [elem for elem in tables if elem[1] is not None]
+        for series, (title, table, title_mode) in enumerate(tables, start = 4):
+            sections.append(table_section(f"1.{series}) {fund_name}{blank_fill}{title}", table, title_mode, footer_text))
+    return page(fund_name, "".join(sections))
+
+def page(title: str, body: str) -> str:
+    """ 完整的 HTML 文档，样式内联在页面中 """
+    return (f'<!DOCTYPE html><html lang="zh-CN"><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+            f"<style>{PAGE_STYLE}</style></head><body>{body}</body></html>")
+
+def page_file_name(fund_name: str) -> str:
+    """ 基金页面的文件名，不带时间戳，每天生成时覆盖上一次的页面，索引页中的链接保持不变 """
+    return "".join("_" if char in INVALID_FILE_CHARS else char for char in fund_name) + ".html"
+
+def write_fund_page(context, output_dir: str = DEFAULT_OUTPUT_DIR, add_indicators_tables: bool = False) -> dict:
+    """
+    生成单只基金的页面并写入 output_dir
+
+    Args:
+        - context (rctx.ReportContext): 报告上下文
+        - output_dir (str, optional): 输出文件夹，不存在时自动创建. Defaults to DEFAULT_OUTPUT_DIR.
+        - add_indicators_tables (bool, optional): 是否包含补充表格. Defaults to False.
+
+    Returns:
+        dict: 索引页中该基金的一行，见 index_row
+    """
+    os.makedirs(output_dir, exist_ok = True)
+    file_name = page_file_name(context.fund_name)
+    with open(os.path.join(output_dir, file_name), "w", encoding = "utf-8") as f:
+        f.write(fund_page(context, add_indicators_tables))
+    return index_row(context, file_name)
+
+def index_row(context, file_name: str) -> dict:
+    """ 索引页中一只基金的信息：名称、页面文件名、管理人、是否指增、起止日期与 INDEX_INDICATORS 中的指标(已格式化) """
+    return {"fund_name" : context.fund_name, "file_name" : file_name, "corp_name" : context.corp_name,
+            "enhanced_fund" : context.enhanced_fund, "first_date" : str(context.first_netval_date), "last_date" : str(context.last_date),
+            **{name : utils.suitable_convert(context.indicators[name], name) if name in context.indicators else "-"
+               for name in INDEX_INDICATORS}}
+
+def index_page(rows: list, title: str = "基金监控") -> str:
+    """
+    整批基金的索引页，每只基金一行，基金名称链接到该基金的页面
+
+    Args:
+        - rows (list[dict]): write_fund_page 的返回结果
+        - title (str, optional): 页面标题. Defaults to "基金监控".
+    """
+    matrix = [["序号", "基金名称", "管理人", "类型", "起始日期", "最新日期", *INDEX_INDICATORS]]
+    body_rows = []
+    for idx, row in enumerate(rows, start = 1):
+        link = f'<a href="{html.escape(row["file_name"])}">{html.escape(row["fund_name"])}</a>'
+        cells = [str(idx), link, html.escape(row["corp_name"]), "指增" if row["enhanced_fund"] else "非指增",
+                 row["first_date"], row["last_date"], *[row[name] for name in INDEX_INDICATORS]]
+        body_rows.append("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+    header = "<tr>" + "".join(f'<td class="header">{cell}</td>' for cell in matrix[0]) + "</tr>"
+    body = (f"<h1>{html.escape(title)}</h1><p class=\"footnote\">共{len(rows)}只基金，指增基金的指标是超额收益的指标</p>"
+            f"<table>{header}{''.join(body_rows)}</table>")
+    return page(title, body)
+
+def write_index_page(rows: list, output_dir: str = DEFAULT_OUTPUT_DIR, title: str = "基金监控") -> str:
+    """ 生成索引页并写入 output_dir/index.html，返回文件路径 """
+    os.makedirs(output_dir, exist_ok = True)
+    output_path = os.path.join(output_dir, INDEX_FILE_NAME)
+    with open(output_path, "w", encoding = "utf-8") as f:
+        f.write(index_page(rows, title))
+    return output_path
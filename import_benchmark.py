@@ -0,0 +1,99 @@
+"""
+此文件用于测量计算路径上各模块的导入耗时，并检查它们有没有提前导入 WORD/绘图后端。
+每个模块都在全新的子进程中用 python -X importtime 导入，重复多次取最小值，超过预算时以非零状态码退出。
+
+用法示例：
+    python import_benchmark.py
+    python import_benchmark.py --repeat 5 --total-budget 2000
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+# 计算路径上的模块 --> 本仓库代码自身的导入耗时预算(毫秒)，不包括 numpy/pandas 等第三方库
+OWN_BUDGET_MS: dict = {
+    "date_handler" : 10,
+    "utils" : 15,
+    "index_handler" : 15,
+    "fund" : 20,
+    "enhanced_fund" : 25,
+    "report_context" : 30,
+    "report_generate" : 40,
+}
+# 包括第三方库在内的总导入耗时预算(毫秒)，主要由 pandas 决定
+DEFAULT_TOTAL_BUDGET_MS: int = 1500
+# 计算路径不应该导入的后端模块
+BACKEND_MODULES: list = ["win32com", "matplotlib", "word_handler", "word_table_handler", "excel_chart_handler"]
+
+def repo_modules() -> set:
+    """ 本仓库中所有顶层模块的名称 """
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    return {os.path.splitext(name)[0] for name in os.listdir(base_dir) if name.endswith(".py")}
+
+def measure_import(module_name: str) -> dict:
+    """
+    在全新的子进程中导入一个模块，解析 -X importtime 的输出
+
+    Args:
+        module_name (str): 模块名称
+
+    Returns:
+        dict: {"total" : 总耗时(毫秒), "own" : 本仓库代码自身的耗时(毫秒), "backends" : 被导入的后端模块列表}
+    """
+    code = (f"import sys, {module_name}\n"
+            f"print(','.join(sorted({{name.split('.')[0] for name in sys.modules}} & set({BACKEND_MODULES!r}))))")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output = True, text = True,
+                               cwd = os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise RuntimeError(module_name, "导入失败：", completed.stderr[-2000:])
+    own_modules = repo_modules()
+    total_us, own_us = 0, 0
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, imported = line[len("import time:"):].split("|")
+        imported = imported.strip()
+        if imported.split(".")[0] in own_modules:
+            own_us += int(self_us)
+        if imported == module_name:
+            total_us = int(cumulative_us)
+    backends = [name for name in completed.stdout.strip().split(",") if name]
+    return {"total" : total_us / 1000, "own" : own_us / 1000, "backends" : backends}
+
+def run_benchmark(repeat: int = 3, total_budget_ms: float = DEFAULT_TOTAL_BUDGET_MS) -> bool:
+    """
+    测量所有计算路径模块的导入耗时并与预算比较，打印结果
+
+    Args:
+        - repeat (int, optional): 每个模块重复测量几次，取最小值. Defaults to 3.
+        - total_budget_ms (float, optional): 总导入耗时预算(毫秒). Defaults to 1500.
+
+    Returns:
+        bool: 是否全部满足预算，并且没有导入任何后端模块
+    """
+    all_passed = True
+    print(f"{'模块':<16}{'总耗时(ms)':>12}{'自身耗时(ms)':>14}{'预算(ms)':>10}  结果")
+    for module_name, own_budget in OWN_BUDGET_MS.items():
+        results = [measure_import(module_name) for _ in range(repeat)]
+        total = min(result["total"] for result in results)
+        own = min(result["own"] for result in results)
+        backends = results[0]["backends"]
+        passed = own <= own_budget and total <= total_budget_ms and not backends
+        all_passed = all_passed and passed
+        message = "通过" if passed else "超出预算"
+        if backends:
+            message += "，提前导入了后端：" + ",".join(backends)
+        print(f"{module_name:<16}{total:>12.1f}{own:>14.1f}{own_budget:>10}  {message}")
+    return all_passed
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description = "测量计算路径上各模块的导入耗时")
+    parser.add_argument("--repeat", type = int, default = 3, help = "每个模块重复测量几次，取最小值")
+    parser.add_argument("--total-budget", type = float, default = DEFAULT_TOTAL_BUDGET_MS, help = "总导入耗时预算(毫秒)")
+    args = parser.parse_args(argv)
+    if not run_benchmark(args.repeat, args.total_budget):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
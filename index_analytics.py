@@ -0,0 +1,162 @@
+"""
+此文件用于计算基金收益与指数收益之间的 相关系数、贝塔、阿尔法、R方。
+支持大量基金 × 大量指数，并按块(chunk)计算，使得 5,000 只基金 × 200 个指数的任务也可以在有限内存中完成
+"""
+import numpy as np
+import pandas as pd
+
+import index_handler as ih
+
+# 默认的计算窗口：窗口名称 --> 最近多少期收益率，None 表示全部数据
+DEFAULT_WINDOWS: dict = {"成立以来" : None, "近一年" : 52, "近三年" : 156}
+STATISTIC_COLUMNS: list = ["样本数", "相关系数", "贝塔", "年化阿尔法", "R方"]
+
+def fund_return_panel(funds: list) -> pd.DataFrame:
+    """
+    把多只基金 basic_data 中的收益率拼成一张 日期 × 基金 的收益率表，日期取所有基金日期的并集
+
+    Args:
+        funds (list[Fund]): 基金对象列表
+
+    Returns:
+        pd.DataFrame: 收益率表，列名是基金名称
+    """
+    returns = {this_fund.fund_name : this_fund.basic_data.returns for this_fund in funds}
+    return pd.DataFrame(returns).sort_index()
+
+def index_return_panel(index_data: pd.DataFrame, date_index: pd.Index) -> pd.DataFrame:
+    """
+    将指数数据(收盘价或净值)对齐到基金的日期序列上，然后计算每一期的收益率。
+    对齐方式与 EnhancedFund.correct_index_dates 一致：只保留基金日期序列中的日期
+
+    Args:
+        - index_data (pd.DataFrame): 指数数据，可以包含任意多列
+        - date_index (pd.Index): 基金收益率表的日期序列
+
+    Returns:
+        pd.DataFrame: 日期 × 指数 的收益率表
+    """
+    index_data = ih.IndexHandler(index_data.copy(), standalized = False).index_data
+    index_data = index_data.apply(pd.to_numeric, errors = "coerce")
+    return index_data.reindex(date_index).pct_change(fill_method = None)
+
+def pairwise_statistics(fund_values: np.ndarray, index_values: np.ndarray, min_periods: int = 10,
+                        periods_per_year: int = 52) -> dict:
+    """
+    对一块基金收益率(T × F)与一块指数收益率(T × I)计算所有 基金-指数 组合的统计量。
+    每个组合只使用二者都有数据的日期，通过掩码矩阵与矩阵乘法一次性得到所有组合的样本数与各阶矩
+
+    Args:
+        - fund_values (np.ndarray): T × F 的基金收益率，空值是 np.nan
+        - index_values (np.ndarray): T × I 的指数收益率，空值是 np.nan
+        - min_periods (int, optional): 共同样本数少于该值时结果为 np.nan. Defaults to 10.
+        - periods_per_year (int, optional): 每年多少期，用于年化阿尔法，周度数据是 52. Defaults to 52.
+
+    Returns:
+        dict: 键是 STATISTIC_COLUMNS，值是 F × I 的矩阵
+    """
+    fund_mask = ~np.isnan(fund_values)
+    index_mask = ~np.isnan(index_values)
+    fund_filled = np.where(fund_mask, fund_values, 0.0)
+    index_filled = np.where(index_mask, index_values, 0.0)
+    fund_mask = fund_mask.astype(np.float64)
+    index_mask = index_mask.astype(np.float64)
+
+    count = fund_mask.T @ index_mask
+    sum_fund = fund_filled.T @ index_mask
+    sum_index = fund_mask.T @ index_filled
+    sum_fund_sq = (fund_filled ** 2).T @ index_mask
+    sum_index_sq = fund_mask.T @ (index_filled ** 2)
+    sum_cross = fund_filled.T @ index_filled
+
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        valid = count >= max(min_periods, 2)
+        count_valid = np.where(valid, count, np.nan)
+        covariance = (sum_cross - sum_fund * sum_index / count_valid) / (count_valid - 1)
+        fund_variance = (sum_fund_sq - sum_fund ** 2 / count_valid) / (count_valid - 1)
+        index_variance = (sum_index_sq - sum_index ** 2 / count_valid) / (count_valid - 1)
+        correlation = covariance / np.sqrt(fund_variance * index_variance)
+        beta = covariance / index_variance
+        alpha = (sum_fund - beta * sum_index) / count_valid * periods_per_year
+    return {"样本数" : count, "相关系数" : correlation, "贝塔" : beta, "年化阿尔法" : alpha, "R方" : correlation ** 2}
+
+def fund_index_statistics(fund_returns: pd.DataFrame, index_returns: pd.DataFrame, windows: dict = None,
+                          fund_chunk: int = 500, index_chunk: int = 50, min_periods: int = 10,
+                          periods_per_year: int = 52) -> pd.DataFrame:
+    """
+    计算每个 基金-指数 组合在每个窗口内的 相关系数、贝塔、年化阿尔法、R方，返回长表(tidy)格式的结果。
+    基金与指数都按块计算，单块的内存占用约为 T × (fund_chunk + index_chunk) + fund_chunk × index_chunk 个浮点数
+
+    Args:
+        - fund_returns (pd.DataFrame): 日期 × 基金 的收益率表，例如 fund_return_panel 的返回结果
+        - index_returns (pd.DataFrame): 日期 × 指数 的收益率表，日期序列必须与 fund_returns 一致
+        - windows (dict, optional): {窗口名称 : 最近多少期}，None 表示全部数据. Defaults to DEFAULT_WINDOWS.
+        - fund_chunk (int, optional): 每块包含多少只基金. Defaults to 500.
+        - index_chunk (int, optional): 每块包含多少个指数. Defaults to 50.
+        - min_periods (int, optional): 共同样本数少于该值时结果为空. Defaults to 10.
+        - periods_per_year (int, optional): 每年多少期. Defaults to 52.
+
+    Returns:
+        pd.DataFrame: 列为 [基金名称, 指数名称, 窗口, 样本数, 相关系数, 贝塔, 年化阿尔法, R方]
+    """
+    if not fund_returns.index.equals(index_returns.index):
+        raise ValueError("基金收益率表与指数收益率表的日期序列必须完全一致，请先使用 index_return_panel 对齐")
+    windows = DEFAULT_WINDOWS if windows is None else windows
+    fund_names = np.asarray(fund_returns.columns)
+    index_names = np.asarray(index_returns.columns)
+    all_fund_values = fund_returns.to_numpy(dtype = np.float64)
+    all_index_values = index_returns.to_numpy(dtype = np.float64)
+    result_blocks = []
+    for window_name, periods in windows.items():
+        start_row = 0 if periods is None else max(len(fund_returns) - periods, 0)
+        for fund_start in range(0, len(fund_names), fund_chunk):
+            fund_values = all_fund_values[start_row:, fund_start : fund_start + fund_chunk]
+            for index_start in range(0, len(index_names), index_chunk):
+                index_values = all_index_values[start_row:, index_start : index_start + index_chunk]
+                statistics = pairwise_statistics(fund_values, index_values, min_periods, periods_per_year)
+                block_funds = fund_names[fund_start : fund_start + fund_chunk]
+                block_indexes = index_names[index_start : index_start + index_chunk]
+                block = pd.DataFrame({"基金名称" : np.repeat(block_funds, len(block_indexes)),
+                                      "指数名称" : np.tile(block_indexes, len(block_funds)),
+                                      "窗口" : window_name})
+                for column in STATISTIC_COLUMNS:
+                    block[column] = statistics[column].ravel()
+                result_blocks.append(block)
+    result = pd.concat(result_blocks, ignore_index = True)
+    result["样本数"] = result["样本数"].astype(np.int64)
+    return result
+
+def fund_index_analysis(funds: list, index_data: pd.DataFrame, windows: dict = None, **kwargs) -> pd.DataFrame:
+    """
+    便捷函数：直接由基金对象列表与原始指数数据得到 fund_index_statistics 的结果
+
+    Args:
+        - funds (list[Fund]): 基金对象列表
+        - index_data (pd.DataFrame): 原始指数数据(收盘价即可)，可以包含任意多列
+        - windows (dict, optional): 计算窗口，见 fund_index_statistics. Defaults to None.
+        - kwargs: 传给 fund_index_statistics 的其它参数
+    """
+    fund_returns = fund_return_panel(funds)
+    index_returns = index_return_panel(index_data, fund_returns.index)
+    return fund_index_statistics(fund_returns, index_returns, windows, **kwargs)
+
+def fund_index_table(statistics: pd.DataFrame, fund_name: str, window: str = "成立以来") -> np.ndarray:
+    """
+    生成某只基金在某个窗口下与各个指数的统计表，每个单元格都是字符串，可以直接写入 WORD
+
+    Args:
+        - statistics (pd.DataFrame): fund_index_statistics 的返回结果
+        - fund_name (str): 基金名称
+        - window (str, optional): 窗口名称. Defaults to "成立以来".
+
+    Returns:
+        np.ndarray: 第一行是表头 [指数, 样本数, 相关系数, 贝塔, 年化阿尔法, R方]
+    """
+    rows = statistics[(statistics["基金名称"] == fund_name) & (statistics["窗口"] == window)]
+    table_contents = [["指数"] + STATISTIC_COLUMNS]
+    for _, row in rows.iterrows():
+        table_contents.append([row["指数名称"], str(row["样本数"])] +
+                              ["-" if pd.isna(row[column]) else ("{:.1%}".format(row[column]) if column == "年化阿尔法"
+                                                                else "{:.2f}".format(row[column]))
+                               for column in STATISTIC_COLUMNS[1:]])
+    return np.array(table_contents)
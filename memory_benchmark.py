@@ -0,0 +1,330 @@
+"""
+此文件用于测量批量计算各阶段的内存：峰值内存与计算结束后仍然保留的内存(retained)，超过预算时以非零状态码退出。
+每个 (阶段, 基金数) 都在全新的子进程中运行，互不影响：
+    - tracemalloc 统计 Python 与 numpy 分配的峰值与保留内存；
+    - 后台线程每隔几毫秒采样一次进程的 RSS(常驻内存)，得到 RSS 的峰值与保留增量；
+    - 保留内存除以对象个数即单个对象的保留大小，并列出第一个对象各属性的大小，便于定位占用内存的字段。
+测试数据是合成的净值数据表(默认 100/1,000 只基金 × 260 周)，multi_fund_report 阶段使用不写入任何文件的假 WORD 后端。
+耗时：tracemalloc 会让每个阶段慢数倍，全部五个阶段合计，100 只基金约 1~2 分钟，1,000 只约 8~12 分钟，耗时与基金数大致成正比；
+10,000 只需要一个半小时以上，因此不在默认规模中，需要时用 --sizes 10000 单独运行。
+
+用法示例：
+    python memory_benchmark.py
+    python memory_benchmark.py --sizes 100 1000 --stages Fund EnhancedFund --detail
+    python memory_benchmark.py --sizes 10000 --stages Fund    # 大规模只在需要时单独运行
+    python memory_benchmark.py --budget memory_budget.json
+"""
+import os
+import sys
+import gc
+import json
+import time
+import types
+import argparse
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+PANEL_SIZES: list = [100, 1000] # 10,000 只基金耗时过长，用 --sizes 10000 显式指定
+DEFAULT_PERIODS: int = 260 # 5 年周度数据
+STAGES: list = ["Fund", "EnhancedFund", "IndexHandler", "table_builders", "multi_fund_report"]
+# 每只基金的内存预算(KB)，按默认的 260 周设定，大约是实测值的 1.6 倍：peak 是阶段内 tracemalloc 的峰值，
+# retained 是阶段结束后仍然保留的内存。可以用 --budget 指定 JSON 文件覆盖
+DEFAULT_BUDGETS: dict = {
+    "Fund" : {"peak_kb" : 80, "retained_kb" : 80},
+    "EnhancedFund" : {"peak_kb" : 240, "retained_kb" : 240},
+    "IndexHandler" : {"peak_kb" : 48, "retained_kb" : 48},
+    "table_builders" : {"peak_kb" : 80, "retained_kb" : 80},
+    "multi_fund_report" : {"peak_kb" : 120, "retained_kb" : 8},
+}
+RSS_SAMPLE_SECONDS: float = 0.005
+WARMUP_FUNDS: int = 2
+
+def current_rss() -> int:
+    """ 当前进程的常驻内存(字节)。优先使用 psutil，没有安装时读取 /proc/self/statm，都不可用时返回 0 """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+class RssSampler:
+    def __init__(self, interval: float = RSS_SAMPLE_SECONDS):
+        """
+        在后台线程中定期采样 RSS，记录采样期间的最大值。用法：with RssSampler() as sampler: ...，结束后读取 sampler.peak
+
+        Args:
+            interval (float, optional): 采样间隔(秒). Defaults to 0.005.
+        """
+        self.interval: float = interval
+        self.peak: int = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target = self.run, daemon = True)
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, current_rss())
+            self.stopped.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stopped.set()
+        self.thread.join()
+        self.peak = max(self.peak, current_rss())
+
+def synthetic_panel(funds_num: int, periods: int = DEFAULT_PERIODS, seed: int = 0) -> tuple:
+    """
+    生成合成的净值数据表与指数数据表，日期是周五。每只基金的成立时间不同(前面是空值)，净值已经清洗过
+
+    Args:
+        - funds_num (int): 基金个数
+        - periods (int, optional): 周数. Defaults to 260.
+        - seed (int, optional): 随机数种子. Defaults to 0.
+
+    Returns:
+        tuple: (净值数据表 pd.DataFrame, 指数数据表 pd.DataFrame，列为 中证500、中证1000)
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end = "2023-12-29", periods = periods, freq = "W-FRI")
+    index_returns = rng.normal(0.001, 0.025, (periods, 2))
+    index_returns[0] = 0.0
+    index_data = pd.DataFrame(5000 * np.cumprod(1 + index_returns, axis = 0), index = dates, columns = ["中证500", "中证1000"])
+    fund_returns = index_returns[:, [0]] + rng.normal(0.0015, 0.01, (periods, funds_num))
+    nav = np.cumprod(1 + fund_returns, axis = 0)
+    start_positions = rng.integers(0, periods // 2, funds_num)
+    nav = nav / nav[start_positions, np.arange(funds_num)]
+    nav[np.arange(periods)[:, None] < start_positions[None, :]] = np.nan
+    netval_data = pd.DataFrame(nav, index = dates, columns = [f"基金{idx:05d}" for idx in range(funds_num)])
+    return netval_data, index_data
+
+class FakeWordHandler:
+    """ 假的 WORD 后端：接口与 word_handler.WordHandler 一致，只统计调用次数，不打开 WORD，也不写入任何文件 """
+    calls: int = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name: str):
+        def record(*args, **kwargs):
+            FakeWordHandler.calls += 1
+        return record
+
+    def close_and_save(self, fund_name: str) -> str:
+        FakeWordHandler.calls += 1
+        return os.path.abspath(os.path.join("output", fund_name + ".docx"))
+
+def run_stage(stage: str, netval_data: pd.DataFrame, index_data: pd.DataFrame, prepared: list) -> list:
+    """
+    运行一个阶段，返回需要保留的对象(每只基金一个，保留内存按它们计算)
+
+    Args:
+        - stage (str): 阶段名称，必须是 STAGES 之一
+        - netval_data (pd.DataFrame): 合成的净值数据表
+        - index_data (pd.DataFrame): 合成的指数数据表
+        - prepared (list): prepare_stage 的返回结果
+    """
+    import fund
+    import enhanced_fund as ef
+    import index_handler as ih
+    import report_context as rctx
+    import trading_calendar as tc
+    calendar = tc.batch_calendar(netval_data.index)
+    fund_names = list(netval_data.columns)
+    if stage == "Fund":
+        return [fund.Fund(fund_names[idx], netval_data.iloc[:, idx], cleaned = True, calendar = calendar)
+                for idx in range(len(fund_names))]
+    if stage == "EnhancedFund":
+        return [ef.EnhancedFund(fund_names[idx], netval_data.iloc[:, idx], index_data, "中证500", cleaned = True, calendar = calendar)
+                for idx in range(len(fund_names))]
+    if stage == "IndexHandler":
+        # 与 Fund.get_chart_data 一致：每只基金以自己的首个净值日期对指数数据的副本做标准化
+        return [ih.IndexHandler(index_data.copy(), this_fund.get_first_netval_date()) for this_fund in prepared]
+    if stage == "table_builders":
+        return [rctx.ReportContext(this_fund, index_data = index_data, main_report = True, indicators_tables = True,
+                                   chart_data = False) for this_fund in prepared]
+    if stage == "multi_fund_report":
+        import utils
+        import report_generate as rg
+        entries = [{"fund_name" : fund_names[idx], "netval_data" : netval_data.iloc[:, idx], "enhanced_fund" : False,
+                    "corp_name" : utils.CORP_DEFAULT_NAME, "start_date" : None, "calendar" : calendar, "index_data" : index_data}
+                   for idx in range(len(fund_names))]
+        utils.create_output_folder()
+        rg.batch_report(entries, add_indicators_tables = True)
+        return []
+    raise ValueError(stage, "阶段名称必须是其中之一：", STAGES)
+
+def prepare_stage(stage: str, netval_data: pd.DataFrame) -> list:
+    """ 准备阶段的输入(不计入该阶段的内存)：IndexHandler 与 table_builders 需要事先构造好的基金对象 """
+    if stage not in ["IndexHandler", "table_builders"]:
+        return []
+    import fund
+    import trading_calendar as tc
+    calendar = tc.batch_calendar(netval_data.index)
+    return [fund.Fund(netval_data.columns[idx], netval_data.iloc[:, idx], cleaned = True, calendar = calendar)
+            for idx in range(len(netval_data.columns))]
+
+def deep_sizeof(obj, seen: set = None) -> int:
+    """ 估算对象及其引用的所有对象的总大小(字节)，pandas 与 numpy 对象使用它们自己报告的内存 """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep = True, index = True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(obj, pd.Index):
+        return int(obj.memory_usage(deep = True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes) + sys.getsizeof(obj) if obj.dtype != object else \
+               sys.getsizeof(obj) + sum(deep_sizeof(elem, seen) for elem in obj.ravel())
+    if isinstance(obj, (types.ModuleType, type, types.FunctionType)):
+        return 0
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(elem, seen) for elem in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+def object_breakdown(obj) -> dict:
+    """ 对象各属性的大小(字节)，从大到小排列。共享的对象只计入第一个引用它的属性 """
+    if not hasattr(obj, "__dict__"):
+        return {}
+    seen = {id(obj)}
+    sizes = {name : deep_sizeof(value, seen) for name, value in vars(obj).items()}
+    return dict(sorted(sizes.items(), key = lambda elem: -elem[1]))
+
+def measure_stage(stage: str, funds_num: int, periods: int = DEFAULT_PERIODS) -> dict:
+    """
+    在当前进程中测量一个阶段的内存。为了让 RSS 的数值有意义，应该在全新的进程中调用(见 measure_in_subprocess)
+
+    Args:
+        - stage (str): 阶段名称，必须是 STAGES 之一
+        - funds_num (int): 合成净值数据表的基金个数
+        - periods (int, optional): 每只基金的周数. Defaults to 260.
+
+    Returns:
+        dict: funds(基金个数), seconds(耗时), peak_mb/retained_mb(tracemalloc), rss_peak_mb/rss_retained_mb(RSS 增量),
+              per_object_kb(每只基金的保留大小), breakdown(第一个对象各属性的大小，字节)
+    """
+    netval_data, index_data = synthetic_panel(funds_num, periods)
+    warmup_netval, warmup_index = synthetic_panel(WARMUP_FUNDS, periods, seed = 1)
+    work_dir = tempfile.TemporaryDirectory() if stage == "multi_fund_report" else None
+    original_dir, original_backend = os.getcwd(), None
+    if work_dir is not None: # 图表数据会导出到当前目录的 output 文件夹，放在临时目录中
+        import report_generate as rg
+        os.chdir(work_dir.name)
+        original_backend = rg.load_word_backend
+        rg.load_word_backend = lambda: types.SimpleNamespace(WordHandler = FakeWordHandler)
+    try:
+        # 先用几只基金预热，模块的延迟导入与一次性的缓存不计入该阶段
+        run_stage(stage, warmup_netval, warmup_index, prepare_stage(stage, warmup_netval))
+        prepared = prepare_stage(stage, netval_data)
+        gc.collect()
+        rss_before = current_rss()
+        tracemalloc.start()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        start_time = time.perf_counter()
+        with RssSampler() as sampler:
+            retained = run_stage(stage, netval_data, index_data, prepared)
+        seconds = time.perf_counter() - start_time
+        _, traced_peak = tracemalloc.get_traced_memory()
+        gc.collect()
+        traced_after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        rss_after = current_rss()
+    finally:
+        if work_dir is not None:
+            rg.load_word_backend = original_backend
+            os.chdir(original_dir)
+            work_dir.cleanup()
+    retained_bytes = traced_after - traced_before
+    return {"stage" : stage, "funds" : funds_num, "seconds" : seconds,
+            "peak_mb" : (traced_peak - traced_before) / 1024 ** 2, "retained_mb" : retained_bytes / 1024 ** 2,
+            "rss_peak_mb" : (sampler.peak - rss_before) / 1024 ** 2, "rss_retained_mb" : (rss_after - rss_before) / 1024 ** 2,
+            "per_object_kb" : retained_bytes / funds_num / 1024,
+            "breakdown" : object_breakdown(retained[0]) if retained else {}}
+
+def measure_in_subprocess(stage: str, funds_num: int, periods: int = DEFAULT_PERIODS) -> dict:
+    """ 在全新的子进程中运行 measure_stage，返回它的结果 """
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", stage, str(funds_num), str(periods)],
+                               capture_output = True, text = True, cwd = os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise RuntimeError(stage, funds_num, "测量失败：", completed.stderr[-2000:])
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def check_budget(result: dict, budgets: dict) -> list:
+    """ 返回超出预算的项目，例如 ["peak 512.0KB > 480KB"]；没有配置预算的阶段不检查 """
+    budget = budgets.get(result["stage"], {})
+    exceeded = []
+    for key, value in [("peak_kb", result["peak_mb"] * 1024 / result["funds"]), ("retained_kb", result["retained_mb"] * 1024 / result["funds"])]:
+        if key in budget and value > budget[key]:
+            exceeded.append(f"{key[:-3]} {value:.1f}KB > {budget[key]}KB")
+    return exceeded
+
+def run_benchmark(sizes: list = None, stages: list = None, periods: int = DEFAULT_PERIODS, budgets: dict = None,
+                  detail: bool = False) -> bool:
+    """
+    测量所有 (阶段, 基金数) 的内存并与预算(每只基金)比较，打印结果
+
+    Args:
+        - sizes (list, optional): 基金个数列表. Defaults to [100, 1000].
+        - stages (list, optional): 阶段列表. Defaults to STAGES.
+        - periods (int, optional): 每只基金的周数. Defaults to 260.
+        - budgets (dict, optional): {阶段 : {"peak_kb" : 每只基金的峰值预算, "retained_kb" : 每只基金的保留预算}}. Defaults to DEFAULT_BUDGETS.
+        - detail (bool, optional): 是否打印第一个对象各属性的大小. Defaults to False.
+
+    Returns:
+        bool: 是否全部满足预算
+    """
+    budgets = DEFAULT_BUDGETS if budgets is None else budgets
+    all_passed = True
+    print(f"{'阶段':<20}{'基金数':>8}{'耗时(s)':>10}{'峰值(MB)':>11}{'保留(MB)':>11}{'RSS峰值(MB)':>13}{'RSS保留(MB)':>13}{'单个对象(KB)':>14}  结果")
+    for stage in stages or STAGES:
+        for funds_num in sizes or PANEL_SIZES:
+            result = measure_in_subprocess(stage, funds_num, periods)
+            exceeded = check_budget(result, budgets)
+            all_passed = all_passed and not exceeded
+            print(f"{stage:<20}{funds_num:>8}{result['seconds']:>10.2f}{result['peak_mb']:>11.1f}{result['retained_mb']:>11.1f}"
+                  f"{result['rss_peak_mb']:>13.1f}{result['rss_retained_mb']:>13.1f}{result['per_object_kb']:>14.1f}  "
+                  + ("通过" if not exceeded else "超出预算：" + "，".join(exceeded)))
+            if detail and result["breakdown"]:
+                top = list(result["breakdown"].items())[:6]
+                print(" " * 20 + "  ".join(f"{name}={size / 1024:.1f}KB" for name, size in top))
+    return all_passed
+
+def main(argv: list = None):
+    if argv and argv[0] == "--child": # 子进程：测量一个阶段并以 JSON 输出结果
+        stage, funds_num, periods = argv[1], int(argv[2]), int(argv[3])
+        print(json.dumps(measure_stage(stage, funds_num, periods)))
+        return
+    parser = argparse.ArgumentParser(description = "测量批量计算各阶段的峰值内存与保留内存")
+    parser.add_argument("--sizes", type = int, nargs = "+", default = PANEL_SIZES, help = "合成净值数据表的基金个数，默认是 100 1000；10,000 只基金需要一个半小时以上，需要时显式指定")
+    parser.add_argument("--stages", nargs = "+", choices = STAGES, default = STAGES, help = "需要测量的阶段")
+    parser.add_argument("--periods", type = int, default = DEFAULT_PERIODS, help = "每只基金的周数")
+    parser.add_argument("--budget", default = None, help = "预算文件(JSON)，格式与 DEFAULT_BUDGETS 一致，没有列出的阶段使用默认预算")
+    parser.add_argument("--detail", action = "store_true", help = "打印第一个对象各属性的大小")
+    args = parser.parse_args(argv)
+    budgets = dict(DEFAULT_BUDGETS)
+    if args.budget:
+        with open(args.budget, "r", encoding = "utf-8") as f:
+            budgets.update(json.load(f))
+    if not run_benchmark(args.sizes, args.stages, args.periods, budgets, args.detail):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
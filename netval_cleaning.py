@@ -0,0 +1,100 @@
+"""
+此文件用于对整张净值数据表(日期 × 基金)一次性完成清洗：把无法转换为数值的单元格转为空值，然后逐列线性插值，
+并生成每只基金的清洗报告(有多少个数据无法转换、有多少个数据是插值得到的、分别在哪些日期)。
+插值规则与 Fund.interpolation 完全一致：首部缺失不填充，中部缺失取线性，尾部缺失取尾数
+"""
+import numpy as np
+import pandas as pd
+
+REPORT_COLUMNS: list = ["无法转换的个数", "插值的个数", "无法转换的日期", "插值的日期"]
+
+def coerce_numeric(netval_data: pd.DataFrame) -> tuple:
+    """
+    一次性把整张表转为数值，不能转换的单元格变为 np.nan
+
+    Args:
+        netval_data (pd.DataFrame): 日期 × 基金 的原始净值数据
+
+    Returns:
+        tuple: (数值表 pd.DataFrame, 无法转换的单元格掩码 np.ndarray)
+    """
+    if all(pd.api.types.is_float_dtype(dtype) for dtype in netval_data.dtypes):
+        return netval_data.astype(np.float64), np.zeros(netval_data.shape, dtype = bool)
+    raw_values = netval_data.to_numpy(dtype = object)
+    numeric_values = pd.to_numeric(pd.Series(raw_values.ravel()), errors = "coerce").to_numpy(dtype = np.float64)
+    numeric_values = numeric_values.reshape(raw_values.shape)
+    coerced_mask = np.isnan(numeric_values) & ~pd.isna(raw_values)
+    return pd.DataFrame(numeric_values, index = netval_data.index, columns = netval_data.columns), coerced_mask
+
+def interpolate_numeric(numeric_data):
+    """
+    对数值表(或者单个序列)逐列线性插值：首部缺失不填充，中部缺失取线性，尾部缺失取尾数
+
+    Args:
+        numeric_data (pd.DataFrame | pd.Series): 已经转为数值的净值数据
+    """
+    return numeric_data.interpolate(method = 'linear')
+
+def clean_series(net_val: pd.Series) -> pd.Series:
+    """
+    清洗单只基金的净值序列，结果与 Fund.interpolation 原来的逐元素转换一致。已经是浮点数的序列不再转换
+
+    Args:
+        net_val (pd.Series): 基金净值数据
+    """
+    if not pd.api.types.is_float_dtype(net_val.dtype):
+        net_val = pd.to_numeric(net_val, errors = 'coerce')
+    return interpolate_numeric(net_val)
+
+def describe_dates(dates: list) -> str:
+    """ 把日期列表压缩为紧凑的文本，连续的日期合并为区间，例如 "2023-01-06~2023-01-20; 2023-03-03" """
+    if len(dates) == 0:
+        return ""
+    return "; ".join(str(first) if first == last else f"{first}~{last}" for first, last in dates)
+
+def date_runs(index: pd.Index, mask: np.ndarray) -> list:
+    """ 把一列掩码中连续为 True 的位置合并为 (开始日期, 结束日期) 区间列表 """
+    positions = np.flatnonzero(mask)
+    if len(positions) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(positions) > 1)
+    starts = np.r_[positions[0], positions[breaks + 1]]
+    ends = np.r_[positions[breaks], positions[-1]]
+    return [(index[start], index[end]) for start, end in zip(starts, ends)]
+
+def clean_panel(netval_data: pd.DataFrame) -> tuple:
+    """
+    清洗整张净值数据表，并生成清洗报告
+
+    Args:
+        netval_data (pd.DataFrame): 日期 × 基金 的原始净值数据，例如 pd.read_excel(netval_path, index_col = 0)
+
+    Returns:
+        tuple: (清洗后的净值数据表 pd.DataFrame, 清洗报告 pd.DataFrame)。
+               清洗报告的 index 是基金名称，列为 REPORT_COLUMNS，日期是压缩后的文本
+    """
+    numeric_data, coerced_mask = coerce_numeric(netval_data)
+    cleaned_data = interpolate_numeric(numeric_data)
+    interpolated_mask = numeric_data.isna().to_numpy() & cleaned_data.notna().to_numpy()
+    index = netval_data.index.map(lambda elem: elem.date() if hasattr(elem, "date") else elem)
+    report = pd.DataFrame({
+        "无法转换的个数" : coerced_mask.sum(axis = 0),
+        "插值的个数" : interpolated_mask.sum(axis = 0),
+        "无法转换的日期" : [describe_dates(date_runs(index, coerced_mask[:, col])) for col in range(coerced_mask.shape[1])],
+        "插值的日期" : [describe_dates(date_runs(index, interpolated_mask[:, col])) for col in range(interpolated_mask.shape[1])],
+    }, index = pd.Index(netval_data.columns, name = "基金名称")) # 新建索引，不修改原数据表列索引的名称
+    return cleaned_data, report
+
+def print_clean_report(report: pd.DataFrame):
+    """ 只打印存在问题的基金，没有问题时不打印任何内容 """
+    problems = report[(report["无法转换的个数"] > 0) | (report["插值的个数"] > 0)]
+    if len(problems) == 0:
+        return
+    print(f"以下{len(problems)}只基金的净值数据存在无法转换为数值或者缺失的数据，已经进行线性插值：")
+    for fund_name, row in problems.iterrows():
+        message = f"{fund_name}：插值{row['插值的个数']}个"
+        if row["插值的个数"] > 0:
+            message += f"({row['插值的日期']})"
+        if row["无法转换的个数"] > 0:
+            message += f"，无法转换为数值的有{row['无法转换的个数']}个({row['无法转换的日期']})"
+        print(message)
@@ -70,9 +70,11 @@ def multi_fund_indicator_tables(netval_path: str, **kwargs):
         - netval_path (str): 净值数据路径，数据表第一列必须是日期，第二列必须是净值数据，且净值数据列名必须等于产品名
         - corp_names (list[str]): 可选参数，私募管理人名称列表，如果没有输入该参数，默认是 "私募管理人"
         - start_dates (list[date]): 可选参数，起始计算日期列表，可以不填，如果填写必须填 datetime.date 格式. 
+        - select_funds (list[str]): 可选参数，只读取净值数据表中的这些基金，corp_names, start_dates 的顺序与之一致
+        - date_window (tuple): 可选参数，(起始日期, 结束日期)，只读取该区间内的净值
 
     """
-    netval_data = pd.read_excel(netval_path, index_col = 0)
+    netval_data = xr.load_netval(netval_path, kwargs.get("select_funds", None), kwargs.get("date_window", None))
     funds_num: int = len(netval_data.columns)
     print(f"净值数据表中有{funds_num}只基金：", netval_data.columns)
     fund_names: list = netval_data.columns
@@ -0,0 +1,260 @@
+"""
+此文件实现磁盘上的净值面板存储：所有基金共用一条日期轴，净值保存为 基金 × 日期 的 float64 矩阵(.npy 文件，通过内存映射读取)。
+每只基金的净值在文件中是连续的一行，因此打开单只基金只会读取这一行，与存储中有多少只基金无关。
+
+目录结构：
+    - meta.json：{"n_dates" : 已使用的日期数, "n_funds" : 已使用的基金数, "names" : [基金名称, ...]}
+    - dates.npy：datetime64[D] 日期轴，长度是日期容量
+    - values.npy：基金容量 × 日期容量 的矩阵，没有数据的位置是 np.nan
+容量大于已使用的部分，追加日期或者基金时直接写入空余位置；容量不足时按两倍扩容并重写文件。
+"""
+import os
+import json
+import numpy as np
+import pandas as pd
+from datetime import date
+
+import date_handler as dh
+from fund import Fund
+
+META_FILE: str = "meta.json"
+DATES_FILE: str = "dates.npy"
+VALUES_FILE: str = "values.npy"
+
+def to_datetime64(dates) -> np.ndarray:
+    """ 把任意日期序列(date、datetime、字符串、Timestamp)转为 datetime64[D] 数组 """
+    return np.array([np.datetime64(dh.scalar_to_date(elem), "D") for elem in dates], dtype = "datetime64[D]")
+
+class PanelStore:
+    def __init__(self, path: str, writable: bool = False):
+        """
+        打开一个已经存在的净值面板存储。新建请使用 PanelStore.create 或者 PanelStore.from_frame
+
+        Args:
+            - path (str): 存储目录
+            - writable (bool, optional): 是否需要追加数据。只读打开时矩阵以只读内存映射的方式打开. Defaults to False.
+        """
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            raise ValueError(path, "不是一个净值面板存储目录，请先使用 PanelStore.create 创建")
+        self.path = path
+        self.writable = writable
+        self._date_index: pd.Index = None
+        self.load()
+
+    def load(self):
+        """ 读取元数据并重新建立内存映射 """
+        with open(os.path.join(self.path, META_FILE), "r", encoding = "utf-8") as f:
+            meta: dict = json.load(f)
+        self.n_dates: int = meta["n_dates"]
+        self.n_funds: int = meta["n_funds"]
+        self.names: list = meta["names"]
+        self.column_index: dict = {name : idx for idx, name in enumerate(self.names)}
+        mmap_mode = "r+" if self.writable else "r"
+        self._dates: np.ndarray = np.load(os.path.join(self.path, DATES_FILE), mmap_mode = mmap_mode)
+        self._values: np.ndarray = np.load(os.path.join(self.path, VALUES_FILE), mmap_mode = mmap_mode)
+        self._date_index = None
+
+    @classmethod
+    def create(cls, path: str, dates, names: list, values: np.ndarray = None,
+               date_capacity: int = None, fund_capacity: int = None) -> "PanelStore":
+        """
+        新建一个净值面板存储，目录已经存在时会覆盖其中的存储文件
+
+        Args:
+            - path (str): 存储目录
+            - dates (Iterable): 日期轴，必须严格递增
+            - names (list): 基金名称，不允许重复
+            - values (np.ndarray, optional): 基金 × 日期 的净值矩阵，None 表示全部是空值. Defaults to None.
+            - date_capacity (int, optional): 日期容量，默认是日期数的两倍(至少 64). Defaults to None.
+            - fund_capacity (int, optional): 基金容量，默认是基金数的两倍(至少 16). Defaults to None.
+        """
+        dates = to_datetime64(dates)
+        names = [str(name) for name in names]
+        if len(set(names)) != len(names):
+            raise ValueError("基金名称不允许重复")
+        if len(dates) > 1 and not np.all(dates[1:] > dates[:-1]):
+            raise ValueError("日期轴必须严格递增")
+        values = np.full((len(names), len(dates)), np.nan) if values is None else np.asarray(values, dtype = np.float64)
+        if values.shape != (len(names), len(dates)):
+            raise ValueError(values.shape, "净值矩阵的形状必须是 (基金数, 日期数)：", (len(names), len(dates)))
+        date_capacity = max(date_capacity or 2 * len(dates), len(dates), 64)
+        fund_capacity = max(fund_capacity or 2 * len(names), len(names), 16)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        cls._write_arrays(path, dates, values, date_capacity, fund_capacity)
+        cls._write_meta(path, len(dates), names)
+        return cls(path)
+
+    @classmethod
+    def from_frame(cls, path: str, netval_data: pd.DataFrame, **kwargs) -> "PanelStore":
+        """
+        由 日期 × 基金 的净值数据表(例如 pd.read_excel(netval_path, index_col = 0) 的结果)新建存储。
+        无法转为数值的单元格保存为 np.nan
+
+        Args:
+            - path (str): 存储目录
+            - netval_data (pd.DataFrame): 净值数据表，index 是日期，列名是基金名称
+            - kwargs: 传给 create 的容量参数
+        """
+        netval_data = netval_data.sort_index()
+        values = netval_data.apply(pd.to_numeric, errors = "coerce").to_numpy(dtype = np.float64).T
+        return cls.create(path, netval_data.index, list(netval_data.columns), values, **kwargs)
+
+    @staticmethod
+    def _write_arrays(path: str, dates: np.ndarray, values: np.ndarray, date_capacity: int, fund_capacity: int):
+        """ 按给定容量写入日期轴与净值矩阵，先写临时文件再替换 """
+        all_dates = np.full(date_capacity, np.datetime64("NaT"), dtype = "datetime64[D]")
+        all_dates[:len(dates)] = dates
+        np.save(os.path.join(path, DATES_FILE + ".tmp.npy"), all_dates)
+        tmp_values_path = os.path.join(path, VALUES_FILE + ".tmp.npy")
+        all_values = np.lib.format.open_memmap(tmp_values_path, mode = "w+", dtype = np.float64,
+                                               shape = (fund_capacity, date_capacity))
+        all_values[:] = np.nan
+        all_values[:values.shape[0], :values.shape[1]] = values
+        all_values.flush()
+        del all_values
+        os.replace(os.path.join(path, DATES_FILE + ".tmp.npy"), os.path.join(path, DATES_FILE))
+        os.replace(tmp_values_path, os.path.join(path, VALUES_FILE))
+
+    @staticmethod
+    def _write_meta(path: str, n_dates: int, names: list):
+        """ 写入元数据。数据文件写完之后才更新元数据，中途失败时读到的仍然是旧的一致状态 """
+        tmp_path = os.path.join(path, META_FILE + ".tmp")
+        with open(tmp_path, "w", encoding = "utf-8") as f:
+            json.dump({"n_dates" : n_dates, "n_funds" : len(names), "names" : names}, f, ensure_ascii = False)
+        os.replace(tmp_path, os.path.join(path, META_FILE))
+
+    def __len__(self) -> int:
+        return self.n_funds
+
+    def __contains__(self, fund_name: str) -> bool:
+        return fund_name in self.column_index
+
+    @property
+    def dates(self) -> np.ndarray:
+        """ 已使用的日期轴，datetime64[D] """
+        return self._dates[:self.n_dates]
+
+    @property
+    def values(self) -> np.ndarray:
+        """ 已使用部分的 基金 × 日期 净值矩阵(内存映射视图，不复制) """
+        return self._values[:self.n_funds, :self.n_dates]
+
+    def date_index(self) -> pd.Index:
+        """ 日期轴对应的 datetime.date 索引，与 Fund 使用的日期格式一致。只转换一次，所有基金共用 """
+        if self._date_index is None:
+            self._date_index = pd.Index(self.dates.astype(object), dtype = object)
+        return self._date_index
+
+    def row(self, fund_name: str) -> np.ndarray:
+        """ 某只基金的净值(内存映射视图，不复制) """
+        if fund_name not in self.column_index:
+            raise ValueError(fund_name, "不在净值面板存储中")
+        return self._values[self.column_index[fund_name], :self.n_dates]
+
+    def series(self, fund_name: str) -> pd.Series:
+        """ 某只基金的净值序列，数据部分直接引用内存映射，不复制 """
+        return pd.Series(self.row(fund_name), index = self.date_index(), name = fund_name, copy = False)
+
+    def fund(self, fund_name: str, start_date: date = None, create_time: date = None) -> Fund:
+        """
+        由存储中的一列构造基金对象。只会读取这一只基金的数据，开销与存储中的基金数量无关。
+        首个有效净值之后没有空值时，基金的净值直接引用内存映射，不复制；否则需要插值，净值是插值后的副本
+
+        Args:
+            - fund_name (str): 基金名称
+            - start_date (date, optional): 起始计算日期. Defaults to None.
+            - create_time (date, optional): 基金成立日期. Defaults to None.
+        """
+        return Fund(fund_name, self.series(fund_name), start_date, create_time, not self.has_gaps(fund_name))
+
+    def has_gaps(self, fund_name: str) -> bool:
+        """ 某只基金在首个有效净值之后是否还有空值(需要插值)，首部的空值不算 """
+        valid = ~np.isnan(self.row(fund_name))
+        return bool(valid.any()) and not valid[valid.argmax():].all()
+
+    def frame(self, fund_names: list = None) -> pd.DataFrame:
+        """
+        日期 × 基金 的净值数据表，格式与从 Excel 读取的净值数据一致，可以直接传给 multi_fund_report 的各个环节
+
+        Args:
+            fund_names (list, optional): 需要的基金，None 表示全部. Defaults to None.
+        """
+        fund_names = self.names if fund_names is None else list(fund_names)
+        rows = [self.column_index[name] for name in fund_names]
+        return pd.DataFrame(self._values[rows, :self.n_dates].T, index = self.date_index(), columns = fund_names)
+
+    def _ensure_capacity(self, n_dates: int, n_funds: int):
+        """ 容量不足时按两倍扩容，重写数据文件 """
+        date_capacity, fund_capacity = self._dates.shape[0], self._values.shape[0]
+        if n_dates <= date_capacity and n_funds <= fund_capacity:
+            return
+        new_date_capacity = max(date_capacity, 2 * n_dates) if n_dates > date_capacity else date_capacity
+        new_fund_capacity = max(fund_capacity, 2 * n_funds) if n_funds > fund_capacity else fund_capacity
+        dates, values = np.array(self.dates), np.array(self.values)
+        self._dates, self._values = None, None # 释放内存映射，Windows 下才能替换文件
+        self._write_arrays(self.path, dates, values, new_date_capacity, new_fund_capacity)
+        self.load()
+
+    def append_dates(self, dates, values=None):
+        """
+        在日期轴末尾追加新的日期
+
+        Args:
+            - dates (Iterable): 新的日期，必须严格递增并且晚于已有的最后一个日期
+            - values (np.ndarray | pd.DataFrame, optional): 新日期的净值。ndarray 的形状是 (基金数, 新日期数)；
+                                                          DataFrame 是 日期 × 基金 格式，按列名匹配，缺少的基金为空值. Defaults to None.
+        """
+        if not self.writable:
+            raise ValueError(self.path, "追加数据需要以 writable = True 打开")
+        new_dates = to_datetime64(dates)
+        if len(new_dates) == 0:
+            return
+        if not np.all(new_dates[1:] > new_dates[:-1]) or (self.n_dates > 0 and new_dates[0] <= self.dates[-1]):
+            raise ValueError("追加的日期必须严格递增，并且晚于已有的最后一个日期：", self.dates[-1] if self.n_dates else None)
+        if isinstance(values, pd.DataFrame):
+            values = values.apply(pd.to_numeric, errors = "coerce").reindex(columns = self.names).to_numpy(dtype = np.float64).T
+        values = np.full((self.n_funds, len(new_dates)), np.nan) if values is None else np.asarray(values, dtype = np.float64)
+        if values.shape != (self.n_funds, len(new_dates)):
+            raise ValueError(values.shape, "追加的净值形状必须是 (基金数, 新日期数)：", (self.n_funds, len(new_dates)))
+        start, end = self.n_dates, self.n_dates + len(new_dates)
+        self._ensure_capacity(end, self.n_funds)
+        self._dates[start:end] = new_dates
+        self._values[:self.n_funds, start:end] = values
+        self._dates.flush()
+        self._values.flush()
+        self._write_meta(self.path, end, self.names)
+        self.n_dates = end
+        self._date_index = None
+
+    def append_funds(self, fund_names: list, values=None):
+        """
+        追加新的基金
+
+        Args:
+            - fund_names (list): 新的基金名称，不能与已有基金重名
+            - values (np.ndarray | pd.DataFrame, optional): 新基金的净值。ndarray 的形状是 (新基金数, 日期数)；
+                                                          DataFrame 是 日期 × 基金 格式，按日期匹配，不在日期轴上的日期会被忽略. Defaults to None.
+        """
+        if not self.writable:
+            raise ValueError(self.path, "追加数据需要以 writable = True 打开")
+        fund_names = [str(name) for name in fund_names]
+        duplicated = [name for name in fund_names if name in self.column_index]
+        if duplicated or len(set(fund_names)) != len(fund_names):
+            raise ValueError(duplicated, "基金名称不允许重复")
+        if isinstance(values, pd.DataFrame):
+            values = values.copy()
+            values.index = to_datetime64(values.index)
+            values = values.apply(pd.to_numeric, errors = "coerce").reindex(index = self.dates, columns = fund_names)
+            values = values.to_numpy(dtype = np.float64).T
+        values = np.full((len(fund_names), self.n_dates), np.nan) if values is None else np.asarray(values, dtype = np.float64)
+        if values.shape != (len(fund_names), self.n_dates):
+            raise ValueError(values.shape, "追加的净值形状必须是 (新基金数, 日期数)：", (len(fund_names), self.n_dates))
+        start, end = self.n_funds, self.n_funds + len(fund_names)
+        self._ensure_capacity(self.n_dates, end)
+        self._values[start:end, :self.n_dates] = values
+        self._values.flush()
+        self._write_meta(self.path, self.n_dates, self.names + fund_names)
+        self.names = self.names + fund_names
+        self.column_index.update({name : start + idx for idx, name in enumerate(fund_names)})
+        self.n_funds = end
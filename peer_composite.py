@@ -0,0 +1,208 @@
+"""
+此文件用于把一张宽净值数据表(日期 × 基金)中的多只基金合成为一条同类平均(或者自定义权重)的净值曲线，
+例如所有中证1000指增产品的平均净值，可以叠加在走势图中，也可以作为计算超额收益的基准。
+
+合成规则(不使用任何未来数据)：
+    ① 每只基金第 t 期的收益率 = 第 t 期净值 / 此前最近一个有效净值 - 1，只用到第 t 期及以前的数据；
+    ② 基金从第二个有效净值开始参与合成，成立较晚的基金加入时不会让合成净值跳变；
+    ③ 净值缺失的期间该基金不参与平均，恢复披露后第一期的收益是相对于缺失前最后一个净值的收益；
+    ④ 每一期的合成收益率 = 参与基金收益率的加权平均，权重在参与的基金之间重新归一化；
+    ⑤ 时变权重表中某一日期的权重作用于下一期的收益(调仓日的权重只决定之后的收益)。
+注意传入原始净值数据(例如 pd.read_excel 的结果)，不要传入 netval_cleaning.clean_panel 插值后的数据，线性插值会用到缺失之后的净值。
+
+结果是一列的 DataFrame(index 是 datetime.date)，可以直接作为 index_data 传给 EnhancedFund、Fund.get_chart_data、multi_fund_report 等，
+也可以用 join_index 拼到已有的指数数据后面。命令行用法(结果保存为 EXCEL，可以作为 index_path)：
+    python peer_composite.py data/非指增批量测试数据.xlsx --output output/同类平均.xlsx
+    python peer_composite.py data/非指增批量测试数据.xlsx --groups peers.json --output output/同类平均.xlsx
+"""
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+import netval_cleaning as nc
+import excel_reader as xr
+import date_handler as dh
+
+DEFAULT_NAME: str = "同类平均"
+
+def prepare_panel(netval_data: pd.DataFrame) -> pd.DataFrame:
+    """ 把原始净值数据表转为数值(不插值)，丢弃日期列中不是日期的行(例如 “成立日期” 说明行)，并按日期升序排列 """
+    numeric_data, _ = nc.coerce_numeric(netval_data)
+    dates = [xr.try_date(elem) for elem in numeric_data.index]
+    keep = [elem is not None for elem in dates]
+    numeric_data = numeric_data[keep]
+    numeric_data.index = pd.Index([elem for elem in dates if elem is not None], name = netval_data.index.name)
+    return numeric_data.sort_index()
+
+def period_returns(numeric_data: pd.DataFrame) -> np.ndarray:
+    """
+    每只基金每一期的收益率，相对于此前最近一个有效净值计算；本期没有净值或者此前没有净值的位置是 np.nan
+
+    Args:
+        numeric_data (pd.DataFrame): prepare_panel 的结果
+
+    Returns:
+        np.ndarray: 日期 × 基金 的收益率矩阵
+    """
+    values = numeric_data.to_numpy(dtype = np.float64)
+    # 只向前填充，第 t 期看到的 “上一个净值” 不会用到第 t 期之后的数据
+    previous = numeric_data.ffill().shift(1).to_numpy(dtype = np.float64)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        returns = values / previous - 1
+    returns[~np.isfinite(returns)] = np.nan
+    return returns
+
+def weight_matrix(numeric_data: pd.DataFrame, weights = None) -> np.ndarray:
+    """
+    把权重展开为 日期 × 基金 的矩阵(未归一化)
+
+    Args:
+        - numeric_data (pd.DataFrame): prepare_panel 的结果
+        - weights (_type_, optional): None 表示等权；dict 或 pd.Series 表示固定权重 {基金名称 : 权重}，没有列出的基金不参与合成；
+                                      pd.DataFrame 表示时变权重(日期 × 基金)，某一日期的权重从下一期开始生效，
+                                      日期之间向前填充. Defaults to None.
+    """
+    funds = numeric_data.columns
+    if weights is None:
+        return np.ones(numeric_data.shape)
+    if isinstance(weights, pd.DataFrame):
+        unknown_funds = [name for name in weights.columns if name not in funds]
+        if unknown_funds:
+            raise ValueError(unknown_funds, "权重表中的这些基金没有出现在净值数据表中")
+        weights = weights.copy()
+        weights.index = dh.list_to_date(weights.index)
+        # 先合并到净值的日期上向前填充，再整体后移一期：第 t 期的收益只使用第 t-1 期及以前设定的权重
+        all_dates = weights.index.union(numeric_data.index)
+        aligned = weights.sort_index().reindex(all_dates).ffill().reindex(numeric_data.index).shift(1)
+        matrix = aligned.reindex(columns = funds).fillna(0).to_numpy(dtype = np.float64)
+    else:
+        weights = pd.Series(weights, dtype = np.float64)
+        unknown_funds = [name for name in weights.index if name not in funds]
+        if unknown_funds:
+            raise ValueError(unknown_funds, "权重中的这些基金没有出现在净值数据表中")
+        matrix = np.broadcast_to(weights.reindex(funds).fillna(0).to_numpy(), numeric_data.shape)
+    if (matrix < 0).any():
+        raise ValueError("权重不能是负数")
+    return matrix
+
+def composite_returns(netval_data: pd.DataFrame, weights = None, min_members: int = 1) -> pd.DataFrame:
+    """
+    计算每一期的合成收益率与参与合成的基金数量
+
+    Args:
+        - netval_data (pd.DataFrame): 原始净值数据表，第一列(index)是日期，每只基金一列
+        - weights (_type_, optional): 权重，见 weight_matrix. Defaults to None，表示等权.
+        - min_members (int, optional): 参与基金少于该数量的期间，合成收益率是 np.nan. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: index 是日期，列为 ["收益率", "成分数量"]
+    """
+    if min_members < 1:
+        raise ValueError(min_members, "min_members 至少是 1")
+    numeric_data = prepare_panel(netval_data)
+    returns = period_returns(numeric_data)
+    active = ~np.isnan(returns)
+    weights = np.where(active, weight_matrix(numeric_data, weights), 0)
+    active &= weights > 0
+    weight_sums = weights.sum(axis = 1)
+    members = active.sum(axis = 1)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        result = (np.where(active, returns, 0) * weights).sum(axis = 1) / weight_sums
+    result[(members < min_members) | (weight_sums <= 0)] = np.nan
+    return pd.DataFrame({"收益率" : result, "成分数量" : members}, index = numeric_data.index)
+
+def composite_nav(netval_data: pd.DataFrame, weights = None, name: str = DEFAULT_NAME, min_members: int = 1,
+                  base: float = 1.0) -> pd.DataFrame:
+    """
+    合成净值：从第一期有合成收益率的前一个日期开始，以 base 为起点按合成收益率复利累积
+
+    Args:
+        - netval_data (pd.DataFrame): 原始净值数据表，第一列(index)是日期，每只基金一列
+        - weights (_type_, optional): 权重，见 weight_matrix. Defaults to None，表示等权.
+        - name (str, optional): 合成净值的列名，也就是作为指数时的指数名称. Defaults to "同类平均".
+        - min_members (int, optional): 参与基金少于该数量的期间不计算收益. Defaults to 1.
+        - base (float, optional): 起点净值. Defaults to 1.0.
+
+    Returns:
+        pd.DataFrame: 只有一列的合成净值，起点之前是 np.nan；起点之后参与基金不足的期间净值保持不变
+    """
+    returns = composite_returns(netval_data, weights, min_members)
+    values = returns["收益率"].to_numpy()
+    valid = np.flatnonzero(~np.isnan(values))
+    nav = np.full(len(values), np.nan)
+    if len(valid) > 0:
+        start = valid[0] - 1 # 第一期收益率的前一个日期就是起点，第 0 期没有收益率，所以 start >= 0
+        nav[start:] = base * np.cumprod(1 + np.nan_to_num(values[start:]))
+    return pd.DataFrame({name : nav}, index = returns.index)
+
+def group_composites(netval_data: pd.DataFrame, peer_groups: dict, weights = None, min_members: int = 1) -> pd.DataFrame:
+    """
+    按同类组分别合成净值，每个同类组一列
+
+    Args:
+        - netval_data (pd.DataFrame): 原始净值数据表
+        - peer_groups (dict): {基金名称 : 同类组名称}，例如 peer_rank.load_peer_groups 的结果，没有列出的基金不参与任何同类组
+        - weights (_type_, optional): 权重，见 weight_matrix，只使用各组成员的权重. Defaults to None.
+        - min_members (int, optional): 见 composite_nav. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: 日期 × 同类组 的合成净值，列的顺序与同类组第一次出现的顺序一致
+    """
+    groups: dict = {}
+    for fund_name in netval_data.columns:
+        if fund_name in peer_groups:
+            groups.setdefault(peer_groups[fund_name], []).append(fund_name)
+    if not groups:
+        raise ValueError("净值数据表中没有任何基金属于给定的同类组")
+    composites = []
+    for group, fund_names in groups.items():
+        group_weights = weights
+        if isinstance(weights, pd.DataFrame):
+            group_weights = weights[[name for name in fund_names if name in weights.columns]]
+        elif weights is not None:
+            group_weights = {name : value for name, value in dict(weights).items() if name in fund_names}
+        composites.append(composite_nav(netval_data[fund_names], group_weights, group, min_members))
+    return pd.concat(composites, axis = 1)
+
+def join_index(index_data: pd.DataFrame, composite: pd.DataFrame) -> pd.DataFrame:
+    """
+    把合成净值拼到已有的指数数据后面(按日期外连接，日期转为 datetime.date)，结果仍然可以作为 index_data 使用。
+    注意 EnhancedFund 以指数数据的第一列作为主要对标指数，想以合成净值为基准时把它放在第一列，即 join_index(composite, index_data)
+
+    Args:
+        - index_data (pd.DataFrame): 指数数据，例如 pd.read_excel(index_path, index_col = 0)
+        - composite (pd.DataFrame): composite_nav 或者 group_composites 的结果
+    """
+    duplicated = [name for name in composite.columns if name in index_data.columns]
+    if duplicated:
+        raise ValueError(duplicated, "合成净值的列名与指数数据的列名重复")
+    left, right = index_data.copy(), composite.copy()
+    left.index, right.index = dh.list_to_date(left.index), dh.list_to_date(right.index)
+    return left.join(right, how = "outer").sort_index()
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description = "把净值数据表中的多只基金合成为同类平均净值，保存为可以作为 index_path 的 EXCEL")
+    parser.add_argument("netval_path", help = "净值数据表路径(.xlsx)，第一列是日期，每只基金一列")
+    parser.add_argument("--output", required = True, help = "输出文件路径(.xlsx)")
+    parser.add_argument("--groups", default = None, help = "同类组映射文件(格式见 peer_rank.load_peer_groups)，每个同类组合成一列")
+    parser.add_argument("--weights", default = None, help = "固定权重文件(.json)，{基金名称 : 权重}，不填表示等权")
+    parser.add_argument("--name", default = DEFAULT_NAME, help = "没有同类组时合成净值的列名")
+    parser.add_argument("--min-members", type = int, default = 1, help = "参与基金少于该数量的期间不计算收益")
+    args = parser.parse_args(argv)
+    netval_data = pd.read_excel(args.netval_path, index_col = 0)
+    weights = None
+    if args.weights:
+        import json
+        with open(args.weights, "r", encoding = "utf-8") as f:
+            weights = json.load(f)
+    if args.groups:
+        import peer_rank as pr
+        result = group_composites(netval_data, pr.load_peer_groups(args.groups), weights, args.min_members)
+    else:
+        result = composite_nav(netval_data, weights, args.name, args.min_members)
+    result.to_excel(args.output)
+    print(f"合成净值已保存到 {args.output}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
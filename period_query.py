@@ -0,0 +1,106 @@
+"""
+此文件用于回答任意日期区间的查询，例如 “2022-03-15 到 2023-06-30 的收益率”，不需要以新的 start_date 重新构造基金对象。
+区间端点用二分查找匹配最近的净值日期(与 date_handler.find_closest_date 的规则一致)，
+收益率的一阶矩、二阶矩与个数预先求前缀和，因此每个查询是 O(log n)，成千上万个查询可以一次向量化完成
+"""
+import math
+import numpy as np
+import pandas as pd
+
+import date_handler as dh
+
+QUERY_COLUMNS: list = ["起始日期", "结束日期", "区间收益率", "年化收益率", "年化波动率", "夏普比率"]
+
+class PeriodQuery:
+    def __init__(self, nav: pd.Series, returns: pd.Series, periods_per_year: int = 52, risk_free_rate: float = 0.015):
+        """
+        区间查询器。构造时对收益率求一次前缀和，之后的查询不再遍历数据
+
+        Args:
+            - nav (pd.Series): 净值，index 是升序的 datetime.date，例如 Fund.basic_data.nav
+            - returns (pd.Series): 与 nav 日期一致的收益率，例如 Fund.basic_data.returns
+            - periods_per_year (int, optional): 每年多少期，用于年化波动率，与 Fund.annual_volatility 一致取 52. Defaults to 52.
+            - risk_free_rate (float, optional): 无风险利率，与 Fund.sharpe_ratio 一致. Defaults to 0.015.
+        """
+        self.dates: pd.Index = nav.index
+        self.date_days: np.ndarray = dh.to_day_numbers(nav.index)
+        self.nav: np.ndarray = nav.to_numpy(dtype = np.float64)
+        return_values = returns.to_numpy(dtype = np.float64)
+        valid = ~np.isnan(return_values)
+        filled = np.where(valid, return_values, 0.0)
+        # 前缀和的第 k 个元素是前 k 个收益率之和，区间 (s, e] 的和就是 prefix[e + 1] - prefix[s + 1]
+        self.prefix_count: np.ndarray = np.concatenate([[0], np.cumsum(valid)])
+        self.prefix_sum: np.ndarray = np.concatenate([[0.0], np.cumsum(filled)])
+        self.prefix_square: np.ndarray = np.concatenate([[0.0], np.cumsum(filled ** 2)])
+        self.periods_per_year: int = periods_per_year
+        self.risk_free_rate: float = risk_free_rate
+
+    def positions(self, dates) -> np.ndarray:
+        """ 查询日期对应的净值日期位置，规则与 find_closest_date 一致，不在日期范围内的是 -1 """
+        return dh.closest_date_positions(dh.to_day_numbers(dates), self.date_days)
+
+    def query_positions(self, starts: np.ndarray, ends: np.ndarray) -> pd.DataFrame:
+        """
+        按位置批量计算区间指标，区间是 [起始位置, 结束位置]，收益率使用 (起始位置, 结束位置] 内的数值
+
+        Args:
+            - starts (np.ndarray): 起始位置，-1 表示无效
+            - ends (np.ndarray): 结束位置，-1 表示无效
+
+        Returns:
+            pd.DataFrame: 列为 QUERY_COLUMNS，无效的查询(端点不在日期范围内或者起始晚于结束)各项数值是 np.nan
+        """
+        valid = (starts >= 0) & (ends >= 0) & (starts <= ends)
+        safe_starts, safe_ends = np.where(valid, starts, 0), np.where(valid, ends, 0)
+        count = (self.prefix_count[safe_ends + 1] - self.prefix_count[safe_starts + 1]).astype(np.float64)
+        sum_returns = self.prefix_sum[safe_ends + 1] - self.prefix_sum[safe_starts + 1]
+        sum_squares = self.prefix_square[safe_ends + 1] - self.prefix_square[safe_starts + 1]
+        days = (self.date_days[safe_ends] - self.date_days[safe_starts]).astype(np.float64)
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            period_return = self.nav[safe_ends] / self.nav[safe_starts] - 1
+            annual_return = (1 + period_return) ** (365 / days) - 1
+            variance = (sum_squares - sum_returns ** 2 / count) / (count - 1)
+            volatility = np.sqrt(np.maximum(variance, 0.0)) * math.sqrt(self.periods_per_year)
+            volatility = np.where(count > 1, volatility, np.nan)
+            sharpe = (annual_return - self.risk_free_rate) / volatility
+        dates = np.array(self.dates, dtype = object)
+        return pd.DataFrame({
+            "起始日期" : np.where(valid, dates[safe_starts], None),
+            "结束日期" : np.where(valid, dates[safe_ends], None),
+            "区间收益率" : np.where(valid, period_return, np.nan),
+            "年化收益率" : np.where(valid & (days > 0), annual_return, np.nan),
+            "年化波动率" : np.where(valid, volatility, np.nan),
+            "夏普比率" : np.where(valid, sharpe, np.nan),
+        }, columns = QUERY_COLUMNS)
+
+    def query(self, starts, ends) -> pd.DataFrame:
+        """
+        批量查询任意日期区间，每个端点匹配最近的净值日期
+
+        Args:
+            - starts (_type_): 起始日期序列(或者单个日期)，元素可以是 str, datetime.datetime, datetime.date
+            - ends (_type_): 结束日期序列(或者单个日期)，长度与 starts 一致
+
+        Returns:
+            pd.DataFrame: 每个查询一行，列为 QUERY_COLUMNS，起始日期、结束日期是实际匹配到的净值日期
+        """
+        starts, ends = self.positions(starts), self.positions(ends)
+        if len(starts) != len(ends):
+            raise ValueError(len(starts), len(ends), "起始日期与结束日期的个数必须一致")
+        return self.query_positions(starts, ends)
+
+    def query_one(self, start, end) -> dict:
+        """
+        查询单个日期区间
+
+        Args:
+            - start (_type_): 起始日期，可以是 str, datetime.datetime, datetime.date
+            - end (_type_): 结束日期
+
+        Returns:
+            dict: {QUERY_COLUMNS 中的名称 : 数值}
+        """
+        result = self.query([start], [end])
+        if result["起始日期"].iloc[0] is None:
+            raise ValueError(start, end, "查询区间的端点必须在净值日期范围内，并且起始日期不能晚于结束日期")
+        return result.iloc[0].to_dict()
@@ -0,0 +1,306 @@
+"""
+此文件实现可合并的流式分位数草图(KLL sketch)，用于在整个同类组(例如 3,000 只基金的全部滚动一年收益)上统计滚动收益的分位数，
+不需要把所有滚动收益同时放在内存中：每只基金(或者每一块基金)的滚动收益依次送入草图，草图可以跨基金、跨进程合并。
+
+KLL 草图由若干层压缩器组成，第 h 层的每个元素代表 2^h 个原始数据。某一层装满后排序，随机保留奇数位或者偶数位的元素并提升到上一层，
+总权重始终等于原始数据个数，保存的元素个数约为 3k，与数据量无关(只随层数缓慢增长)。
+
+精度保证(以排名误差衡量)：
+    草图给出的 q 分位数 x 是某个原始数据，它在全部数据中的真实排名(小于等于 x 的数据占比)与 q 之差称为排名误差。
+    KLL 的理论保证是排名误差为 O(1/k)，压缩器的容量衰减系数取 2/3、最小宽度取 8 时，
+    k = 200 的单个分位数排名误差以 99% 的概率不超过约 1.65%，k 增大一倍误差约减半。
+    换言之，草图的 25 分位数一定落在精确的 (25% - ε) 分位数与 (25% + ε) 分位数之间(以 99% 的概率)，
+    与 pd.Series.quantile 的差距取决于该处数据的密集程度。最小值与最大值单独记录，是精确的。
+    compare_exact 会对给定数据实际计算排名误差，命令行示例：
+        python quantile_sketch.py --synthetic 3000 520 --k 200 --workers 2
+        python quantile_sketch.py data/非指增批量测试数据.xlsx
+"""
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_K: int = 200
+MIN_WIDTH: int = 8 # 每层压缩器的最小容量
+CAPACITY_DECAY: float = 2 / 3 # 每往下一层，容量乘以这个系数
+# 与 Fund.get_rolling_return_data 一致：滚动期限 --> 期数(一年的窗口期是 50)
+PERIOD_WINDOWS: dict = {"半年" : 25, "一年" : 50, "二年" : 100, "三年" : 150, "五年" : 250}
+# 与 Fund.get_rolling_quantile_dataframe 一致
+QUANTILES: list = [0.0, 0.25, 0.50, 0.75, 1.00]
+QUANTILE_NAMES: list = ["最小值", "25分位", "中位数", "75分位", "最大值"]
+
+class KLLSketch:
+    def __init__(self, k: int = DEFAULT_K, seed: int = None):
+        """
+        可合并的流式分位数草图
+
+        Args:
+            - k (int, optional): 精度参数，最上层压缩器的容量，越大越精确、占用越多内存. Defaults to 200.
+            - seed (int, optional): 压缩时随机选择奇偶位的随机数种子，设定后结果可以复现. Defaults to None.
+        """
+        if k < MIN_WIDTH:
+            raise ValueError(k, f"k 不能小于 {MIN_WIDTH}")
+        self.k: int = k
+        self.levels: list = [np.empty(0)] # 第 h 层的元素权重是 2^h
+        self.count: int = 0 # 已经送入的数据个数(不包括空值)
+        self.min_value: float = np.nan
+        self.max_value: float = np.nan
+        self.rng = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        """ 草图中实际保存的元素个数 """
+        return sum(len(level) for level in self.levels)
+
+    @property
+    def nbytes(self) -> int:
+        """ 草图中保存的元素占用的字节数 """
+        return sum(level.nbytes for level in self.levels)
+
+    def capacity(self, level: int) -> int:
+        """ 第 level 层压缩器的容量：最上层是 k，往下每层乘以 2/3，但不小于 MIN_WIDTH """
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * CAPACITY_DECAY ** depth)), MIN_WIDTH)
+
+    def update(self, values) -> "KLLSketch":
+        """
+        送入一批数据，空值会被忽略
+
+        Args:
+            values (_type_): 标量、列表、np.ndarray 或者 pd.Series
+        """
+        values = np.asarray(values, dtype = np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.count += len(values)
+        self.min_value = np.nanmin([self.min_value, values.min()])
+        self.max_value = np.nanmax([self.max_value, values.max()])
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.compress()
+        return self
+
+    def compress(self):
+        """ 总元素个数超过总容量时，从下往上找到第一个装满的层进行压缩，直到总元素个数不超过总容量 """
+        while len(self) > sum(self.capacity(level) for level in range(len(self.levels))):
+            for level in range(len(self.levels)):
+                if len(self.levels[level]) >= self.capacity(level):
+                    self.compact(level)
+                    break
+
+    def compact(self, level: int):
+        """ 把第 level 层排序后两两配对，随机保留每对中的同一位置的元素提升到上一层；个数是奇数时多出的一个元素留在本层 """
+        items = np.sort(self.levels[level])
+        kept = items[len(items) - len(items) % 2:] # 奇数个时留下最大的一个，它的权重不变，不引入误差
+        paired = items[:len(items) - len(items) % 2]
+        promoted = paired[self.rng.integers(2)::2]
+        if level + 1 == len(self.levels):
+            self.levels.append(np.empty(0))
+        self.levels[level] = kept
+        self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """
+        把另一个草图合并进来(修改自身)，合并后相当于两个草图的数据都送入了同一个草图
+
+        Args:
+            other (KLLSketch): 另一个草图，k 必须相同
+        """
+        if other.k != self.k:
+            raise ValueError(self.k, other.k, "只能合并 k 相同的草图")
+        if other.count == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self.min_value = np.nanmin([self.min_value, other.min_value])
+        self.max_value = np.nanmax([self.max_value, other.max_value])
+        self.compress()
+        return self
+
+    def sorted_items(self) -> tuple:
+        """ (按数值排序的元素, 对应的累计权重) """
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_items), 2 ** level, dtype = np.int64)
+                                  for level, level_items in enumerate(self.levels)])
+        order = np.argsort(items, kind = "stable")
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, quantiles: list) -> np.ndarray:
+        """
+        查询多个分位数，0 与 1 分别返回精确的最小值与最大值；没有任何数据时返回 np.nan
+
+        Args:
+            quantiles (list): 分位数，例如 [0.25, 0.5, 0.75]
+        """
+        quantiles = np.asarray(quantiles, dtype = np.float64)
+        if ((quantiles < 0) | (quantiles > 1)).any():
+            raise ValueError(quantiles, "分位数必须在 [0, 1] 之间")
+        if self.count == 0:
+            return np.full(len(quantiles), np.nan)
+        items, cumulative_weights = self.sorted_items()
+        positions = np.searchsorted(cumulative_weights, quantiles * self.count, side = "left")
+        result = items[np.minimum(positions, len(items) - 1)]
+        result[quantiles <= 0] = self.min_value
+        result[quantiles >= 1] = self.max_value
+        return result
+
+    def quantile(self, quantile: float) -> float:
+        """ 查询单个分位数 """
+        return float(self.quantiles([quantile])[0])
+
+    def rank(self, value: float) -> float:
+        """ 小于等于 value 的数据占比的估计值 """
+        if self.count == 0:
+            return np.nan
+        items, cumulative_weights = self.sorted_items()
+        position = np.searchsorted(items, value, side = "right")
+        return float(cumulative_weights[position - 1] / self.count) if position > 0 else 0.0
+
+def rolling_returns(netval_data: pd.DataFrame, window: int) -> np.ndarray:
+    """ 整张净值表的滚动收益，与 Fund.get_rolling_return_data 中的 net_val.pct_change(periods = window) 一致 """
+    return netval_data.pct_change(periods = window).to_numpy(dtype = np.float64)
+
+def fund_sketches(this_fund, k: int = DEFAULT_K, seed: int = None) -> dict:
+    """
+    把单只基金的滚动收益(Fund.rolling_return_data)送入草图
+
+    Args:
+        - this_fund (Fund): 基金对象
+        - k (int, optional): 精度参数. Defaults to 200.
+        - seed (int, optional): 随机数种子. Defaults to None.
+
+    Returns:
+        dict: {滚动期限 : KLLSketch}
+    """
+    return {period_name : KLLSketch(k, seed).update(this_fund.rolling_return_data[period_name])
+            for period_name in this_fund.rolling_return_data.columns}
+
+def panel_sketches(netval_data: pd.DataFrame, k: int = DEFAULT_K, seed: int = None, chunk_size: int = 200) -> dict:
+    """
+    把整张净值表所有基金的滚动收益送入草图，每次只计算 chunk_size 只基金的滚动收益，内存占用与基金总数无关
+
+    Args:
+        - netval_data (pd.DataFrame): 清洗后的净值数据表(netval_cleaning.clean_panel 的结果)，日期 × 基金
+        - k (int, optional): 精度参数. Defaults to 200.
+        - seed (int, optional): 随机数种子. Defaults to None.
+        - chunk_size (int, optional): 每块基金数. Defaults to 200.
+
+    Returns:
+        dict: {滚动期限 : KLLSketch}，滚动期限与 PERIOD_WINDOWS 一致
+    """
+    sketches = {period_name : KLLSketch(k, seed) for period_name in PERIOD_WINDOWS}
+    for start in range(0, len(netval_data.columns), chunk_size):
+        chunk = netval_data.iloc[:, start:start + chunk_size]
+        for period_name, window in PERIOD_WINDOWS.items():
+            sketches[period_name].update(rolling_returns(chunk, window))
+    return sketches
+
+def merge_sketches(sketch_dicts: list, seed: int = None) -> dict:
+    """
+    合并多组 {滚动期限 : KLLSketch}(例如多个子进程的结果)，返回新的一组草图，不修改输入
+
+    Args:
+        - sketch_dicts (list): [{滚动期限 : KLLSketch}]，按顺序合并
+        - seed (int, optional): 合并结果的随机数种子(合并后的压缩也要随机选择奇偶位)，设定后结果可以复现. Defaults to None.
+    """
+    result: dict = {}
+    for sketches in sketch_dicts:
+        for period_name, sketch in sketches.items():
+            if period_name not in result:
+                result[period_name] = KLLSketch(sketch.k, seed)
+            result[period_name].merge(sketch)
+    return result
+
+def quantile_table(sketches: dict) -> pd.DataFrame:
+    """ 草图 --> 滚动收益分位数表，格式与 Fund.get_rolling_quantile_dataframe 一致 """
+    result = pd.DataFrame({period_name : sketch.quantiles(QUANTILES) for period_name, sketch in sketches.items()},
+                          index = QUANTILE_NAMES)
+    result.index.name = "滚动收益"
+    return result
+
+def pooled_rolling_quantiles(netval_data: pd.DataFrame, k: int = DEFAULT_K, workers: int = 1, chunk_size: int = 200,
+                             seed: int = None) -> tuple:
+    """
+    同类组内所有基金滚动收益合在一起的分位数表。workers 大于 1 时按列分块在进程池中计算草图，再在主进程中合并
+
+    Args:
+        - netval_data (pd.DataFrame): 清洗后的净值数据表，日期 × 基金
+        - k (int, optional): 精度参数. Defaults to 200.
+        - workers (int, optional): 进程数. Defaults to 1.
+        - chunk_size (int, optional): 每块基金数. Defaults to 200.
+        - seed (int, optional): 随机数种子，设定后每一块使用 seed + 块序号，合并使用 seed + 块数，结果可以复现. Defaults to None.
+
+    Returns:
+        tuple: (分位数表 pd.DataFrame, {滚动期限 : KLLSketch})
+    """
+    if workers <= 1:
+        sketches = panel_sketches(netval_data, k, seed, chunk_size)
+        return quantile_table(sketches), sketches
+    starts = list(range(0, len(netval_data.columns), chunk_size))
+    chunks = [netval_data.iloc[:, start:start + chunk_size] for start in starts]
+    seeds = [seed + idx if seed is not None else None for idx in range(len(chunks))]
+    with ProcessPoolExecutor(max_workers = workers) as executor:
+        parts = list(executor.map(panel_sketches, chunks, [k] * len(chunks), seeds, [chunk_size] * len(chunks)))
+    sketches = merge_sketches(parts, seed + len(chunks) if seed is not None else None)
+    return quantile_table(sketches), sketches
+
+def compare_exact(netval_data: pd.DataFrame, sketches: dict) -> pd.DataFrame:
+    """
+    用精确计算检验草图：把全部滚动收益放在一起求精确分位数(pd.Series.quantile)，并计算草图结果的真实排名误差
+
+    Args:
+        - netval_data (pd.DataFrame): 送入草图的清洗后的净值数据表
+        - sketches (dict): pooled_rolling_quantiles 或者 panel_sketches 的结果
+
+    Returns:
+        pd.DataFrame: 每个 (滚动期限, 分位数) 一行，列为 ["精确值", "草图", "排名误差"]
+    """
+    records = []
+    for period_name, window in PERIOD_WINDOWS.items():
+        values = rolling_returns(netval_data, window).ravel()
+        values = np.sort(values[~np.isnan(values)])
+        estimates = sketches[period_name].quantiles(QUANTILES)
+        for quantile, name, estimate in zip(QUANTILES, QUANTILE_NAMES, estimates):
+            exact = pd.Series(values).quantile(quantile) if len(values) > 0 else np.nan
+            # 草图给出的是一个原始数据，它的真实排名是区间 [小于它的占比, 小于等于它的占比]，排名误差是 q 到这个区间的距离
+            error = np.nan
+            if len(values) > 0:
+                lower_rank = np.searchsorted(values, estimate, side = "left") / len(values)
+                upper_rank = np.searchsorted(values, estimate, side = "right") / len(values)
+                error = max(lower_rank - quantile, quantile - upper_rank, 0)
+            records.append([period_name, name, exact, estimate, error])
+    return pd.DataFrame(records, columns = ["滚动期限", "分位数", "精确值", "草图", "排名误差"]).set_index(["滚动期限", "分位数"])
+
+def main(argv: list = None):
+    import time
+    import netval_cleaning as nc
+    parser = argparse.ArgumentParser(description = "以 KLL 草图统计同类组全部基金滚动收益的分位数，并与精确计算对比")
+    parser.add_argument("netval_path", nargs = "?", default = None, help = "净值数据表路径(.xlsx)")
+    parser.add_argument("--synthetic", nargs = 2, type = int, default = None, metavar = ("FUNDS", "PERIODS"),
+                        help = "不读取文件，使用合成数据：基金个数 周数")
+    parser.add_argument("--k", type = int, default = DEFAULT_K, help = "精度参数，默认是 200")
+    parser.add_argument("--workers", type = int, default = 1, help = "进程数，默认是 1")
+    parser.add_argument("--seed", type = int, default = 0, help = "随机数种子，默认是 0")
+    args = parser.parse_args(argv)
+    if args.synthetic:
+        import memory_benchmark as mb
+        netval_data, _ = mb.synthetic_panel(args.synthetic[0], args.synthetic[1], args.seed)
+    elif args.netval_path:
+        netval_data, _ = nc.clean_panel(pd.read_excel(args.netval_path, index_col = 0))
+    else:
+        parser.error("需要净值数据表路径或者 --synthetic")
+    start_time = time.perf_counter()
+    table, sketches = pooled_rolling_quantiles(netval_data, args.k, args.workers, seed = args.seed)
+    elapsed = time.perf_counter() - start_time
+    print(table.round(4))
+    comparison = compare_exact(netval_data, sketches)
+    print(comparison.round(4))
+    print(f"草图耗时 {elapsed:.2f} 秒，最大排名误差 {comparison['排名误差'].max():.2%}，"
+          f"草图共保存 {sum(len(sketch) for sketch in sketches.values())} 个元素"
+          f"(原始滚动收益 {sum(sketch.count for sketch in sketches.values())} 个)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
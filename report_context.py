@@ -0,0 +1,104 @@
+""" 此文件用于构建单只基金的报告上下文：一次性算出报告需要的全部数值与格式化文本，分析文本、脚注、表格都从上下文中取数 """
+import numpy as np
+import pandas as pd
+
+import utils
+import bootstrap as bs
+import drawdown_episodes as de
+from fund import Fund
+from enhanced_fund import EnhancedFund
+
+class ReportContext:
+    def __init__(self, this_fund: Fund, corp_name: str = utils.CORP_DEFAULT_NAME, index_data: pd.DataFrame = None,
+                 main_report: bool = True, indicators_tables: bool = False, **kwargs):
+        """
+        报告上下文。构造时把报告需要的每一个数值只计算一次，然后基于这些数值生成所有表格与文本。
+        上下文中不保存基金对象本身，只保存计算结果，因此可以被 pickle 序列化(用于缓存或者跨进程传输)。
+        NOTE 指增基金的分析文本、历史收益表、补充表格统计的都是超额部分(相对主要对标指数)。
+        指数数据包含多个指数时，补充表格中会增加 “多基准对比” 表
+
+        Args:
+            - this_fund (Fund): 基金对象，可以是指增基金
+            - corp_name (str, optional): 私募管理人名称. Defaults to "私募管理人".
+            - index_data (pd.DataFrame, optional): 指数数据，非指增基金生成净值走势图时需要. Defaults to None.
+            - main_report (bool, optional): 是否计算报告主体(分析文本、收益风险指标、历史收益分析、绘图数据). Defaults to True.
+            - indicators_tables (bool, optional): 是否计算 “关键指标汇总”, “滚动收益率分布”, “收益概率统计” 三张补充表格. Defaults to False.
+            - kwargs: 其它可选参数：\n
+                ① analyze_text_start_year ，分析文本的年度收益从哪一年开始 \n
+                ② history_table_start_year ，历史收益表从哪一年开始 \n
+                ③ peer_ranking (PeerRanking) ，同类排名结果，传入后补充表格中会增加 “同类排名” 表 \n
+                ④ chart_data (bool) ，报告主体是否包括绘图数据，只导出数值时不需要，默认是 True \n
+                ⑤ bootstrap_samples (int) ，自助法重抽样次数，大于 0 时补充表格中会增加 “指标置信区间” 表，默认是 0 \n
+                ⑥ bootstrap_seed (int) ，自助法的随机数种子，默认是 None \n
+                ⑦ drawdown_episodes (int) ，回撤区间表保留最深的几段回撤，大于 0 时补充表格中会增加 “回撤区间” 表，默认是 0
+        """
+        analyze_text_start_year: int = kwargs.get("analyze_text_start_year", None)
+        history_table_start_year: int = kwargs.get("history_table_start_year", None)
+        peer_ranking = kwargs.get("peer_ranking", None)
+        need_chart_data: bool = kwargs.get("chart_data", True)
+        bootstrap_samples: int = kwargs.get("bootstrap_samples", 0) or 0
+        episodes_num: int = kwargs.get("drawdown_episodes", 0) or 0
+        self.enhanced_fund: bool = isinstance(this_fund, EnhancedFund)
+        target: Fund = this_fund.excess if self.enhanced_fund else this_fund
+        self.fund_name: str = this_fund.fund_name
+        self.corp_name: str = corp_name
+        self.first_netval_date = this_fund.get_first_netval_date()
+        self.last_date = this_fund.get_last_date()
+        self.footer_text: str = this_fund.get_footnote_text(corp_name)
+
+        # PART1: 数值部分，每个数值只计算一次
+        self.indicators: dict = target.summary_indicators() if indicators_tables else target.risk_indicators()
+        first_year, end_year = target.get_first_netval_date().year, target.get_last_date().year
+        self.year_returns: dict = {year : target.one_year_return(year) for year in range(first_year, end_year + 1)}
+        self.month_returns: dict = None
+        self.recent_returns: dict = None
+
+        # PART2: 报告主体
+        self.return_risk_indicators: dict = None # “收益风险指标” 表头部分每一行的原始数值 {统计口径 : {指标名称 : 数值}}
+        self.return_risk_table: np.ndarray = None
+        self.history_return_table: np.ndarray = None
+        self.analyze_text: str = None
+        self.chart_data: pd.DataFrame = None
+        if main_report:
+            target.err_check_start_year_ge_first_netval(history_table_start_year)
+            history_start_year = first_year if history_table_start_year is None else history_table_start_year
+            self.month_returns = {(year, month) : target.one_month_return(year, month)
+                                  for year in range(history_start_year, end_year + 1) for month in range(1, 13)}
+            self.return_risk_indicators = this_fund.return_risk_indicators(self.indicators)
+            self.return_risk_table = this_fund.return_risk_table(None, self.indicators, self.year_returns, self.return_risk_indicators)
+            self.history_return_table = target.history_return_table(history_table_start_year, self.month_returns, self.year_returns)
+            self.analyze_text = target.get_analyze_text(analyze_text_start_year, self.indicators, self.year_returns)
+            if need_chart_data:
+                self.chart_data = this_fund.get_chart_data() if self.enhanced_fund else this_fund.get_chart_data(index_data)
+
+        # PART3: 补充表格，同时保留未格式化的数值，便于导出
+        self.rolling_quantile_data: pd.DataFrame = None
+        self.earning_probability_data: pd.DataFrame = None
+        self.summary_indicator_table: np.ndarray = None
+        self.rolling_quantile_table: np.ndarray = None
+        self.earning_probability_table: np.ndarray = None
+        self.peer_rank_table: np.ndarray = None
+        self.bootstrap_intervals: pd.DataFrame = None
+        self.bootstrap_table: np.ndarray = None
+        self.drawdown_episodes: pd.DataFrame = None
+        self.drawdown_episode_table: np.ndarray = None
+        self.benchmark_indicators: pd.DataFrame = None
+        self.benchmark_table: np.ndarray = None
+        if indicators_tables:
+            self.recent_returns = target.all_recent_return()
+            self.summary_indicator_table = np.r_[utils.dict_to_matrix(self.indicators), utils.dict_to_matrix(self.recent_returns)]
+            self.rolling_quantile_data = target.get_rolling_quantile_dataframe()
+            self.earning_probability_data = target.get_earning_probability()
+            self.rolling_quantile_table = utils.df_to_matrix(self.rolling_quantile_data)
+            self.earning_probability_table = utils.df_to_matrix(self.earning_probability_data)
+            if peer_ranking is not None and self.fund_name in peer_ranking.matrix.index:
+                self.peer_rank_table = peer_ranking.rank_table(self.fund_name)
+            if bootstrap_samples > 0:
+                self.bootstrap_intervals = bs.confidence_intervals(target, bootstrap_samples, seed = kwargs.get("bootstrap_seed", None))
+                self.bootstrap_table = bs.interval_table(self.bootstrap_intervals)
+            if episodes_num > 0:
+                self.drawdown_episodes = de.drawdown_episodes(target, episodes_num)
+                self.drawdown_episode_table = de.episode_table(self.drawdown_episodes)
+            if self.enhanced_fund and len(this_fund.benchmark_names) > 1: # 指数数据包含多个指数时，列出相对每个指数的超额指标
+                self.benchmark_indicators = this_fund.benchmark_indicators()
+                self.benchmark_table = this_fund.benchmark_table(self.benchmark_indicators)
@@ -1,14 +1,29 @@
 """ 此文件用于生成指增或者非指增基金的产品分析部分的WORD """
 import os
+import shutil
 from tqdm import tqdm
 import numpy as np
 import pandas as pd
 from datetime import date
+from typing import TYPE_CHECKING
 
 import fund
 import enhanced_fund as ef
-import word_handler as wh
+import result_cache as rc
+import peer_rank as pr
+import report_context as rctx
 import utils
+import netval_cleaning as nc
+import trading_calendar as tc
+import chart_service as cs
+import excel_reader as xr
+import workbook_batch as wb
+import date_handler as dh
+import html_report as hr
+import peer_composite as pc
+
+if TYPE_CHECKING: # WORD 后端依赖 win32com，只在真正写入 WORD 时才导入，见 load_word_backend
+    import word_handler as wh
 
 def multi_fund_report(netval_path: str, index_path: str, enhanced_fund: bool, **kwargs):
     """
@@ -16,35 +31,173 @@ def multi_fund_report(netval_path: str, index_path: str, enhanced_fund: bool, **
 
     Args:
         - netval_path (str): 净值数据路径，数据表第一列必须是日期，第二列必须是净值数据，且净值数据列名必须等于产品名
-        - index_path (str): 指数数据文件路径，数据表第一列必须是日期，后面的列可以传入多个指数数据(允许传入收盘价)，每列列名必须等于指数名
+        - index_path (str): 指数数据文件路径，数据表第一列必须是日期，后面的列可以传入多个指数数据(允许传入收盘价)，每列列名必须等于指数名。
+                              指增基金以第一列为主要对标指数，有多列时补充表格中会增加相对每个指数的 “多基准对比” 表
         - enhanced_fund (bool): 是否是指增基金
         - corp_names (list[str]): 可选参数，私募管理人名称列表，如果没有输入该参数，默认是 "私募管理人"
         - start_dates (list[date]): 可选参数，起始计算日期列表，可以不填，如果填写必须填 datetime.date 格式. 
         - add_indicators_tables (bool, optional): 可选参数，表示是否包含 “关键指标汇总”, “滚动收益率分布”, “收益概率统计” 这三张表
+        - cache_dir (str, optional): 可选参数，计算结果缓存目录。默认是 None，表示不使用缓存。
+                                     使用缓存后，净值数据、指数数据、起始日期、管理人名称、报告选项以及代码都没有变化的基金会直接复用上次的结果
+        - cache_document (bool, optional): 可选参数，是否把生成好的 WORD 文档也放入缓存，命中后直接复制文档，不再打开 WORD. 默认 False
+        - cache_max_bytes (int, optional): 可选参数，缓存目录最多占用的字节数，超过后按照最近最少使用的顺序淘汰
+        - peer_group_path (str, optional): 可选参数，同类组映射文件路径(格式见 peer_rank.load_peer_groups)。
+                                           传入后会在同类组内对所有基金的指标排名，并在补充表格中增加 “同类排名” 表，
+                                           仅在 add_indicators_tables 为 True 时生效
+        - bootstrap_samples (int, optional): 可选参数，自助法重抽样次数，大于 0 时补充表格中会增加 “指标置信区间” 表
+                                             (夏普、Sortino、Calmar、最大回撤)，仅在 add_indicators_tables 为 True 时生效
+        - bootstrap_seed (int, optional): 可选参数，自助法的随机数种子，设定后每次运行的置信区间完全相同
+        - picture_chart (bool, optional): 可选参数，是否以 matplotlib 绘制净值走势图并以图片插入(不再打开 EXCEL 绘图)。
+                                          使用缓存时，绘图数据没有变化的基金直接复用上次的图片. 默认 False
+        - chart_workers (int, optional): 可选参数，picture_chart 为 True 时并行绘图的进程数. 默认 1
+        - drawdown_episodes (int, optional): 可选参数，大于 0 时补充表格中会增加 “回撤区间” 表，列出最深的几段回撤
+                                             (高点、低点、修复日期，下跌与修复天数)，仅在 add_indicators_tables 为 True 时生效
+        - select_funds (list[str], optional): 可选参数，只读取净值数据表中的这些基金(以只读模式流式读取，不解析其它列)，
+                                              此时 corp_names, start_dates 的顺序与 select_funds 一致
+        - date_window (tuple, optional): 可选参数，(起始日期, 结束日期)，只读取该区间内的净值，任意一端可以是 None
+        - composite_name (str, optional): 可选参数，传入后把净值数据表中全部基金的等权合成净值(见 peer_composite.py)以该名称
+                                          加入指数数据的最后一列，叠加在走势图中；指增基金的补充表格中会增加相对它的 “多基准对比”
+        - html_dir (str, optional): 可选参数，不生成 WORD，而是在该文件夹中为每只基金生成一个 HTML 页面(内联 SVG 净值走势图)
+                                    以及整批基金的索引页 index.html，见 html_report.py. 默认 None
     """
-    netval_data = pd.read_excel(netval_path, index_col = 0)
+    netval_data = xr.load_netval(netval_path, kwargs.get("select_funds", None), kwargs.get("date_window", None))
     index_data = pd.read_excel(index_path, index_col = 0)
+    composite_name: str = kwargs.get("composite_name", None)
+    if composite_name: # 合成净值必须用清洗(插值)之前的原始净值计算，插值会用到缺失之后的净值
+        index_data = pc.join_index(index_data, pc.composite_nav(netval_data, name = composite_name))
+    # 整张净值表一次性转为数值并插值，后面构造基金对象时不再逐只清洗
+    netval_data, clean_report = nc.clean_panel(netval_data)
+    nc.print_clean_report(clean_report)
+    # 同一张表中的基金共用日期列，月末、年末、近期收益的日期只匹配一次
+    calendar: tc.TradingCalendar = tc.batch_calendar(netval_data.index)
     funds_num: int = len(netval_data.columns)
     print(f"净值数据表中有{funds_num}只基金：", netval_data.columns)
     fund_names: list = netval_data.columns
-    index_name = index_data.columns[0] # 仅用于指增基金，用于给定标准的指数名称，便于后续处理
     start_dates: list = kwargs.get("start_dates", [])
     corp_names: list = kwargs.get("corp_names", [])
     corp_names = [utils.CORP_DEFAULT_NAME if not elem else elem for elem in corp_names]
     start_dates += (funds_num - len(start_dates)) * [None]
     corp_names += (funds_num - len(corp_names)) * [utils.CORP_DEFAULT_NAME]
+    entries: list = [{"fund_name" : fund_names[idx], "netval_data" : netval_data.iloc[:, idx], "enhanced_fund" : enhanced_fund,
+                      "corp_name" : corp_names[idx], "start_date" : start_dates[idx], "calendar" : calendar,
+                      "index_data" : index_data}
+                     for idx in range(funds_num)]
+    batch_report(entries, **kwargs)
+
+def multi_sheet_report(workbook_path: str, index_path: str, manifest = None, **kwargs):
+    """
+    为一个工作簿中多个工作表(每个工作表的格式与 multi_fund_report 的净值数据表一致)中的所有基金生成报告。
+    工作表并行解析，各工作表的管理人名称、是否指增等选项由清单指定，所有工作表的基金合并为一批处理(同类排名、绘图在整批基金上进行)
+
+    Args:
+        - workbook_path (str): 工作簿路径
+        - index_path (str): 指数数据文件路径，清单中没有指定 index_path 的工作表使用该指数数据
+        - manifest (_type_, optional): 工作表清单，文件路径或者字典，格式见 workbook_batch.load_manifest。
+                                       每个工作表可以设置 corp_name, enhanced_fund, index_path, funds({基金名称 : {corp_name, start_date}}).
+                                       Defaults to None.
+        - sheets (list[str], optional): 可选参数，只处理这些工作表，默认处理清单中列出的工作表，没有清单时处理全部工作表
+        - sheet_workers (int, optional): 可选参数，并行解析工作表的进程数. 默认 1
+        - enhanced_fund (bool, optional): 可选参数，清单中没有指定 enhanced_fund 的工作表是否是指增基金. 默认 False
+        - 其余可选参数与 multi_fund_report 一致(add_indicators_tables, cache_dir, peer_group_path, picture_chart 等)
+    """
+    sheet_batches: list = wb.read_workbook(workbook_path, manifest, kwargs.get("sheets", None), kwargs.get("sheet_workers", 1))
+    index_tables: dict = {} # 指数数据路径 --> 指数数据，同一个文件只读取一次
+    entries: list = []
+    for sheet_batch in sheet_batches:
+        sheet_options: dict = sheet_batch["options"]
+        sheet_index_path: str = sheet_options.get("index_path", index_path)
+        if sheet_index_path not in index_tables:
+            index_tables[sheet_index_path] = pd.read_excel(sheet_index_path, index_col = 0)
+        print(f"工作表 {sheet_batch['sheet']} 中有{len(sheet_batch['netval_data'].columns)}只基金：", sheet_batch["netval_data"].columns)
+        for fund_name in sheet_batch["netval_data"].columns:
+            options = {**sheet_options, **sheet_batch["funds"].get(fund_name, {})}
+            start_date = options.get("start_date", None)
+            entries.append({"fund_name" : fund_name, "netval_data" : sheet_batch["netval_data"][fund_name],
+                            "enhanced_fund" : options.get("enhanced_fund", kwargs.get("enhanced_fund", False)),
+                            "corp_name" : options.get("corp_name", None) or utils.CORP_DEFAULT_NAME,
+                            "start_date" : dh.scalar_to_date(start_date) if start_date else None,
+                            "calendar" : sheet_batch["calendar"], "index_data" : index_tables[sheet_index_path]})
+    batch_report(entries, **kwargs)
+
+def batch_report(entries: list, **kwargs):
+    """
+    为一批基金生成报告，multi_fund_report 与 multi_sheet_report 共用
+
+    Args:
+        - entries (list[dict]): 每只基金一项，包括 fund_name, netval_data(清洗后的净值序列), enhanced_fund, corp_name, start_date,
+                                calendar(交易日历，可以是 None), index_data(指数数据，多只基金可以共用同一个对象)
+        - kwargs: 与 multi_fund_report 的可选参数一致
+    """
+    funds_num: int = len(entries)
     add_indicators_tables: bool = kwargs.get("add_indicators_tables", False)
+    cache_dir: str = kwargs.get("cache_dir", None)
+    cache_document: bool = kwargs.get("cache_document", False)
+    result_cache = rc.ResultCache(cache_dir, kwargs.get("cache_max_bytes", rc.DEFAULT_MAX_BYTES)) if cache_dir else None
+    # NOTE 指数数据在计算过程中会被原地修改(日期格式化、标准化)，所以必须在循环开始之前对原始数据求哈希
+    index_digests: dict = {id(entry["index_data"]) : rc.hash_data(entry["index_data"]) for entry in entries} if result_cache else {}
 
     # utils.kill_process_by_name("WINWORD.EXE")  # 杀死所有Word进程
     # utils.kill_process_by_name("EXCEL.EXE")    # 杀死所有Excel进程
 
-    for idx in tqdm(range(funds_num)):   
-        generate_report(netval_data.iloc[:, idx], index_data, enhanced_fund, corp_names[idx], start_dates[idx],
-                        add_indicators_tables = add_indicators_tables, fund_name = fund_names[idx], index_name = index_name)
+    # 同类排名需要先算出所有基金的指标，因此提前构造全部基金对象，生成报告时直接复用
+    peer_group_path: str = kwargs.get("peer_group_path", None)
+    funds: list = [None] * funds_num
+    peer_ranking: pr.PeerRanking = None
+    if peer_group_path and add_indicators_tables:
+        funds = [ef.EnhancedFund(entry["fund_name"], entry["netval_data"], entry["index_data"], entry["index_data"].columns[0],
+                                 entry["start_date"], cleaned = True, calendar = entry["calendar"]) 
+                 if entry["enhanced_fund"] else fund.Fund(entry["fund_name"], entry["netval_data"], entry["start_date"], cleaned = True,
+                                                          calendar = entry["calendar"]) 
+                 for entry in entries]
+        # 指增与非指增基金分别统计(超额部分与绝对收益)，再按原顺序合并
+        flags: list = [entry["enhanced_fund"] for entry in entries]
+        matrix = pd.concat([pr.indicator_matrix([this_fund for this_fund, flag in zip(funds, flags) if flag == enhanced], enhanced)
+                            for enhanced in dict.fromkeys(flags)])
+        peer_ranking = pr.PeerRanking(matrix.loc[[entry["fund_name"] for entry in entries]], pr.load_peer_groups(peer_group_path))
+
+    # index_name 仅用于指增基金，以指数数据的第一列为标准的指数名称，便于后续处理
+    entry_kwargs: list = [{"fund_name" : entry["fund_name"], "index_name" : entry["index_data"].columns[0], "calendar" : entry["calendar"],
+                           "index_digest" : index_digests.get(id(entry["index_data"]), None)} for entry in entries]
+    report_kwargs: dict = {"result_cache" : result_cache, "cache_document" : cache_document, "peer_ranking" : peer_ranking, "cleaned" : True,
+                           "bootstrap_samples" : kwargs.get("bootstrap_samples", 0), "bootstrap_seed" : kwargs.get("bootstrap_seed", None),
+                           "drawdown_episodes" : kwargs.get("drawdown_episodes", 0)}
+    html_dir: str = kwargs.get("html_dir", None)
+    if html_dir:
+        # 只输出 HTML：报告上下文与 WORD 报告完全相同(同样使用缓存)，不打开 WORD/EXCEL，也不需要 matplotlib
+        rows: list = []
+        for idx in tqdm(range(funds_num)):
+            entry = entries[idx]
+            context, _, _ = prepare_report(entry["netval_data"], entry["index_data"], entry["enhanced_fund"], entry["corp_name"],
+                                           entry["start_date"], None, add_indicators_tables, this_fund = funds[idx],
+                                           **entry_kwargs[idx], **{**report_kwargs, "cache_document" : False})
+            rows.append(hr.write_fund_page(context, html_dir, add_indicators_tables))
+            print_warning_messages(context.fund_name, context.first_netval_date, context.last_date)
+        print("索引页已生成：", hr.write_index_page(rows, html_dir))
+        return
+
+    if not kwargs.get("picture_chart", False):
+        for idx in tqdm(range(funds_num)):
+            entry = entries[idx]
+            generate_report(entry["netval_data"], entry["index_data"], entry["enhanced_fund"], entry["corp_name"], entry["start_date"],
+                            add_indicators_tables = add_indicators_tables, this_fund = funds[idx], **entry_kwargs[idx], **report_kwargs)
+        return
+
+    # 以图片插入净值走势图：先算出所有基金的报告上下文，再在进程池中一次性绘制所有(缓存中没有的)图，最后逐只写入 WORD
+    utils.create_output_folder()
+    chart_service = cs.ChartService(result_cache, workers = kwargs.get("chart_workers", 1))
+    report_kwargs["chart_service"] = chart_service
+    prepared: list = [prepare_report(entries[idx]["netval_data"], entries[idx]["index_data"], entries[idx]["enhanced_fund"],
+                                     entries[idx]["corp_name"], entries[idx]["start_date"], None, add_indicators_tables,
+                                     this_fund = funds[idx], **entry_kwargs[idx], **report_kwargs)
+                      for idx in tqdm(range(funds_num))]
+    pending: list = [(context, cache_key) for context, cache_key, output_path in prepared if output_path is None]
+    chart_paths: list = chart_service.render_all([(context.fund_name, context.chart_data) for context, _ in pending])
+    for (context, cache_key), chart_path in zip(pending, chart_paths):
+        finish_report(context, add_indicators_tables, cache_key, chart_path, **report_kwargs)
 
 def generate_report(netval_data: pd.Series, index_data: pd.DataFrame, enhanced_fund: bool,
                     corp_name: str = utils.CORP_DEFAULT_NAME, start_date: date = None, create_date: date = None, 
-                    add_indicators_tables: bool = False, **kwargs):
+                    add_indicators_tables: bool = False, **kwargs) -> str:
     """
     生成单个基金产品报告的WORD。填入参数时注意参数类型。pd.Sries和pd.DataFrame是两种类型，需要区分。
     start_date是可选参数，表示开始计算的日期，如果是None，则会默认从传入数据的第一个有净值数据的日期开始计算
@@ -60,45 +213,163 @@ def generate_report(netval_data: pd.Series, index_data: pd.DataFrame, enhanced_f
         - add_indicators_tables (bool, optional): 可选参数，是否包含 “关键指标汇总”, “滚动收益率分布”, “收益概率统计” 这三张表
         - kwargs: 其它可选参数，需要个性化定制，目前支持的可选参数如下：\n
             ① analyze_text_start_year ，可选参数，它表示获得分析文本的年度收益时，从哪一年开始 \n
-            ② history_table_start_year ，可选参数，它表示 历史收益数据表计算月度数据时，从哪一年开始
+            ② history_table_start_year ，可选参数，它表示 历史收益数据表计算月度数据时，从哪一年开始 \n
+            ③ result_cache (rc.ResultCache)，可选参数，计算结果缓存，命中后跳过计算 \n
+            ④ index_digest (str)，可选参数，指数数据的哈希值，批量计算时由调用方预先计算；不传则现场计算 \n
+            ⑤ cache_document (bool)，可选参数，是否缓存生成好的 WORD 文档 \n
+            ⑥ peer_ranking (pr.PeerRanking)，可选参数，同类排名结果，传入后补充表格中会增加 “同类排名” 表 \n
+            ⑦ this_fund (fund.Fund)，可选参数，已经构造好的基金对象，传入后不再重新构造 \n
+            ⑧ cleaned (bool)，可选参数，净值数据是否已经由 netval_cleaning.clean_panel 清洗过 \n
+            ⑨ bootstrap_samples (int), bootstrap_seed (int)，可选参数，自助法置信区间的重抽样次数与随机数种子 \n
+            ⑩ drawdown_episodes (int)，可选参数，回撤区间表保留最深的几段回撤 \n
+            ⑪ calendar (tc.TradingCalendar)，可选参数，整批基金共用的交易日历，只影响速度，不影响结果 \n
+            ⑫ chart_service (cs.ChartService)，可选参数，绘图服务，传入后净值走势图以 matplotlib 绘制(或者复用缓存的图片)并以图片插入
+
+    Returns:
+        str: 生成的 WORD 文档路径
     """
     # PART0: 设置输出文件夹，如果有，就不管；如果没有，则创建 output 文件夹
     utils.create_output_folder()
 
-    # PART0: 接收输入的参数
+    # PART1：查询缓存，获取生成word所需要的数据，每个数值只计算一次
+    context, cache_key, output_path = prepare_report(netval_data, index_data, enhanced_fund, corp_name, start_date, create_date,
+                                                     add_indicators_tables, **kwargs)
+    if output_path is not None: # 缓存中有生成好的 WORD 文档
+        return output_path
+
+    # PART2：开始写入 WORD，有绘图服务时插入 matplotlib 绘制(或者缓存)的图片
+    chart_service: cs.ChartService = kwargs.get("chart_service", None)
+    chart_path: str = chart_service.render(context.fund_name, context.chart_data) if chart_service is not None else None
+    return finish_report(context, add_indicators_tables, cache_key, chart_path, **kwargs)
+
+def prepare_report(netval_data: pd.Series, index_data: pd.DataFrame, enhanced_fund: bool,
+                   corp_name: str = utils.CORP_DEFAULT_NAME, start_date: date = None, create_date: date = None, 
+                   add_indicators_tables: bool = False, **kwargs) -> tuple:
+    """
+    生成报告的计算部分：查询缓存，没有命中时计算报告上下文并放入缓存。参数含义与 generate_report 完全一致
+
+    Returns:
+        tuple: (报告上下文, 缓存键, WORD 文档路径)。缓存中有生成好的 WORD 文档时直接复制到 output 文件夹，
+               第三项是复制后的路径，否则是 None；不使用缓存时缓存键是 None
+    """
+    # 查询缓存，净值数据、指数数据以及各项选项都没有变化时，直接复用上一次的结果
+    result_cache: rc.ResultCache = kwargs.get("result_cache", None)
+    cache_document: bool = kwargs.get("cache_document", False)
+    cache_key: str = None
+    context: rctx.ReportContext = None
+    if result_cache is not None:
+        index_digest = kwargs.get("index_digest") or rc.hash_data(index_data)
+        options = {"enhanced_fund" : enhanced_fund, "create_date" : create_date, "add_indicators_tables" : add_indicators_tables,
+                   **{key : kwargs.get(key) for key in ["fund_name", "index_name", "analyze_text_start_year", "history_table_start_year",
+                                                        "bootstrap_samples", "bootstrap_seed", "drawdown_episodes"]}}
+        peer_ranking: pr.PeerRanking = kwargs.get("peer_ranking", None)
+        if peer_ranking is not None and add_indicators_tables: # 同类组中其它基金变化时，本基金的排名也会变化
+            options["peer_rank_table"] = peer_ranking.rank_table(kwargs.get("fund_name")).tolist()
+        if kwargs.get("chart_service", None) is not None: # 插入图片与插入 EXCEL 图表的 WORD 文档不同
+            options["picture_chart"] = True
+            options["chart_code_version"] = cs.chart_code_version() # 文档中嵌入了图片，绘图代码修改后缓存的文档也要失效
+        cache_key = result_cache.make_key(netval_data, index_digest, start_date, corp_name, options)
+        context = result_cache.get(cache_key)
+        cached_document = result_cache.get_document(cache_key) if (context is not None and cache_document) else None
+        if cached_document is not None:
+            output_path = os.path.abspath("output/" + utils.generate_filename(context.fund_name, ".docx"))
+            try:
+                shutil.copyfile(cached_document, output_path)
+            except FileNotFoundError: # 其它进程刚刚把它淘汰了，当作没有命中，重新生成 WORD
+                cached_document = None
+        if cached_document is not None:
+            print(f"{context.fund_name} 的输入没有变化，已直接复用缓存的报告")
+            print_warning_messages(context.fund_name, context.first_netval_date, context.last_date)
+            return context, cache_key, output_path
+
+    if context is None:
+        context = build_report_context(netval_data, index_data, enhanced_fund, corp_name, start_date, create_date,
+                                       add_indicators_tables, **kwargs)
+        if result_cache is not None:
+            result_cache.put(cache_key, context)
+    return context, cache_key, None
+
+def finish_report(context: rctx.ReportContext, add_indicators_tables: bool = False, cache_key: str = None,
+                  chart_path: str = None, **kwargs) -> str:
+    """
+    生成报告的排版部分：写入 WORD，需要时把生成好的文档放入缓存
+
+    Args:
+        - context (rctx.ReportContext): prepare_report 返回的报告上下文
+        - add_indicators_tables (bool, optional): 是否包含补充表格. Defaults to False.
+        - cache_key (str, optional): prepare_report 返回的缓存键. Defaults to None.
+        - chart_path (str, optional): 净值走势图的图片路径，None 表示使用 EXCEL 图表. Defaults to None.
+        - kwargs: result_cache, cache_document，含义与 generate_report 一致
+
+    Returns:
+        str: 生成的 WORD 文档路径
+    """
+    result_cache: rc.ResultCache = kwargs.get("result_cache", None)
+    output_path = render_report(context, add_indicators_tables, chart_path)
+    if result_cache is not None and kwargs.get("cache_document", False):
+        result_cache.put(cache_key, context, output_path)
+    return output_path
+
+def build_report_context(netval_data: pd.Series, index_data: pd.DataFrame, enhanced_fund: bool,
+                         corp_name: str = utils.CORP_DEFAULT_NAME, start_date: date = None, create_date: date = None, 
+                         add_indicators_tables: bool = False, **kwargs) -> rctx.ReportContext:
+    """
+    构造基金对象并计算生成单个基金报告所需要的全部数据，不涉及任何 WORD 操作。
+    参数含义与 generate_report 完全一致。返回的报告上下文可以被 pickle 序列化，因此可以放入缓存。
+    """
     fund_name = kwargs.get("fund_name")
     index_name = kwargs.get("index_name")
-    analyze_text_start_year = kwargs.get("analyze_text_start_year", None)
-    history_table_start_year = kwargs.get("history_table_start_year", None)
-    this_fund = ef.EnhancedFund(fund_name, netval_data, index_data, index_name, start_date, create_date) \
-                if enhanced_fund else fund.Fund(fund_name, netval_data, start_date, create_date)
-    
-    # PART1：获取生成word所需要的数据
-    return_risk_table = this_fund.return_risk_table() # 获取表格“收益风险指标”所有单元格的数据
-    history_return_table = property_method(enhanced_fund, "history_return_table", this_fund)(history_table_start_year) # 获取“历史收益分析”所有单元格的数据
-    # 获取绘图数据，由于二者参数不一致，所以无法重载
-    draw_data = this_fund.get_chart_data() if enhanced_fund else this_fund.get_chart_data(index_data)
-    file_name = this_fund.export_chart_data(draw_data) # 导出绘图数据，并返回文件名
-    file_abs_path = os.path.abspath("output/" + file_name) # 由于win32py只有绝对路径，所以把相对路径转为绝对路径
-    # 获取分析文本那一段话
-    analyze_text = property_method(enhanced_fund, "get_analyze_text", this_fund)(analyze_text_start_year) 
-    footer_text = this_fund.get_footnote_text(corp_name) # 获取两个表格的脚注文本
+    this_fund = kwargs.get("this_fund", None)
+    if this_fund is None:
+        cleaned: bool = kwargs.get("cleaned", False)
+        calendar: tc.TradingCalendar = kwargs.get("calendar", None)
+        this_fund = ef.EnhancedFund(fund_name, netval_data, index_data, index_name, start_date, create_date, cleaned, calendar) \
+                    if enhanced_fund else fund.Fund(fund_name, netval_data, start_date, create_date, cleaned, calendar)
+    return rctx.ReportContext(this_fund, corp_name, index_data, True, add_indicators_tables,
+                              analyze_text_start_year = kwargs.get("analyze_text_start_year", None),
+                              history_table_start_year = kwargs.get("history_table_start_year", None),
+                              peer_ranking = kwargs.get("peer_ranking", None),
+                              bootstrap_samples = kwargs.get("bootstrap_samples", 0),
+                              bootstrap_seed = kwargs.get("bootstrap_seed", None),
+                              drawdown_episodes = kwargs.get("drawdown_episodes", 0),
+                              chart_data = kwargs.get("chart_data", True))
+
+def render_report(context: rctx.ReportContext, add_indicators_tables: bool = False, chart_path: str = None) -> str:
+    """
+    根据报告上下文写入 WORD，返回生成的 WORD 文档路径。本函数只负责排版，不做任何计算
+
+    Args:
+        - context (rctx.ReportContext): 报告上下文(也可能来自缓存)
+        - add_indicators_tables (bool, optional): 是否包含 “关键指标汇总”, “滚动收益率分布”, “收益概率统计” 这三张表
+        - chart_path (str, optional): 净值走势图的图片路径。None 表示导出绘图数据并插入 EXCEL 图表. Defaults to None.
+    """
+    fund_name: str = context.fund_name
+    corp_name: str = context.corp_name
+    enhanced_fund: bool = context.enhanced_fund
+    return_risk_table: np.ndarray = context.return_risk_table
+    history_return_table: np.ndarray = context.history_return_table
+    footer_text: str = context.footer_text
+    if chart_path is None:
+        file_name = utils.export_chart_data(fund_name, context.chart_data) # 导出绘图数据，并返回文件名
+        file_abs_path = os.path.abspath("output/" + file_name) # 由于win32py只有绝对路径，所以把相对路径转为绝对路径
     blank_fill = "超额" if enhanced_fund else ""
 
-    # PART2：开始写入 WORD
-    word_handler = wh.WordHandler(visible = False) 
+    word_handler = load_word_backend().WordHandler(visible = False) 
     word_handler.set_page_layout() # 把 A4 纸横过来
     # 生成标题
-    word_handler.add_text_content("1. " + this_fund.fund_name, "title")
+    word_handler.add_text_content("1. " + fund_name, "title")
     # 生成净值走势图和脚注
-    word_handler.add_excel_chart(file_abs_path)
+    if chart_path is None:
+        word_handler.add_excel_chart(file_abs_path)
+    else:
+        word_handler.add_picture(os.path.abspath(chart_path))
     word_handler.add_text_content("数据来源：" + corp_name + "，Wind", "footnote")
     word_handler.add_text_content("", "footnote")
     # 生成标题
     word_handler.add_text_content("1) 业绩分析", "title")
     word_handler.add_text_content("1.1) 收益走势", "title")
     # 生成产品分析文本
-    word_handler.add_text_content(analyze_text)
+    word_handler.add_text_content(context.analyze_text)
     # 生成标题
     word_handler.add_text_content("1.2) 收益风险指标", "title")
     word_handler.add_text_content("", "footnote")
@@ -116,19 +387,17 @@ def generate_report(netval_data: pd.Series, index_data: pd.DataFrame, enhanced_f
     word_handler.add_text_content("", "footnote")
 
     if add_indicators_tables: # 添加补充的三张表格
-        generate_word_indicator_tables(netval_data, corp_name, start_date, create_date, word_handler, this_fund, fund_name = fund_name)
-        return # 上面的函数自己已经包含了保存并退出的功能
+        write_indicator_tables(word_handler, context, ["1.4)", "1.5)", "1.6)", "1.7)", "1.8)", "1.9)", "1.10)"])
     
     # 保存文件并退出
-    word_handler.close_and_save(this_fund.fund_name)
+    output_path = word_handler.close_and_save(fund_name)
     # 生成并打印警告信息
-    print_warning_messages(this_fund.fund_name, this_fund.get_first_netval_date(), this_fund.get_last_date())
-
-
+    print_warning_messages(fund_name, context.first_netval_date, context.last_date)
+    return output_path
 
 def generate_word_indicator_tables(netval_data: pd.Series,  corp_name: str = "私募管理人", 
                                    start_date: date = None, create_date: date = None, 
-                                   word_handler: wh.WordHandler = None, this_fund: fund.Fund = None, **kwargs):
+                                   word_handler: "wh.WordHandler" = None, this_fund: fund.Fund = None, **kwargs):
     """
     生成单个基金产品各类指标(不包括月度/年度指标)汇总表[不包括指增基金]，滚动收益率分位数表，盈利概率表。
     填入参数时注意参数类型。pd.Sries和pd.DataFrame是两种类型，需要区分。
@@ -142,6 +411,10 @@ def generate_word_indicator_tables(netval_data: pd.Series,  corp_name: str = "
         - word_handler (wh.WordHandler, optional):  如果传入了该参数并且合法，则会在该 word 里面追加写入内容，而不会新建一个 word 文档
         - this_fund (fund.Fund, optional): 基金计算对象，如果是空的话会新建一个，否则会沿用原来的对象。
         - fund_name (str): 基金名称(可选参数，在**kwargs中)。
+        - peer_ranking (pr.PeerRanking): 同类排名结果(可选参数，在**kwargs中)，传入后会增加 “同类排名” 表。
+        - bootstrap_samples (int), bootstrap_seed (int): 自助法重抽样次数与随机数种子(可选参数，在**kwargs中)，
+                                                         重抽样次数大于 0 时会增加 “指标置信区间” 表。
+        - drawdown_episodes (int): 回撤区间表保留最深的几段回撤(可选参数，在**kwargs中)，大于 0 时会增加 “回撤区间” 表。
     """
     # PART0: 设置输出文件夹，如果有，就不管；如果没有，则创建 output 文件夹
     utils.create_output_folder()
@@ -155,30 +428,44 @@ def generate_word_indicator_tables(netval_data: pd.Series,  corp_name: str = "
         output_file_name: str = this_fund.fund_name
     
     # PART1：获取生成word所需要的数据[也就是三张表的数据]，如果是指增基金，则统计的是超额净值的滚动情况
-    # 这里通过反射来调用合适的函数，表示是获取超额净值的数据还是普通基金净值的数据
-    enhanced_fund: bool = isinstance(this_fund, ef.EnhancedFund)
-    summary_indicators = property_method(enhanced_fund, "summary_indicators", this_fund)()
-    all_recent_return = property_method(enhanced_fund, "all_recent_return", this_fund)()
-    rolling_quantile_dataframe = property_method(enhanced_fund, "get_rolling_quantile_dataframe", this_fund)()
-    earning_probability = property_method(enhanced_fund, "get_earning_probability", this_fund)()
-
-    summary_indicator_table = np.r_[utils.dict_to_matrix(summary_indicators), 
-                                    utils.dict_to_matrix(all_recent_return)]
-    rolling_quantile_table = utils.df_to_matrix(rolling_quantile_dataframe)
-    earning_probability_table = utils.df_to_matrix(earning_probability)
-    footer_text = this_fund.get_footnote_text(corp_name) # 获取表格的脚注文本
-
-    blank_fill: str = "" if not enhanced_fund else "超额" 
-
-    series_list = ["1.4)", "1.5)", "1.6)"]
+    context = rctx.ReportContext(this_fund, corp_name, main_report = False, indicators_tables = True,
+                                 peer_ranking = kwargs.get("peer_ranking", None),
+                                 bootstrap_samples = kwargs.get("bootstrap_samples", 0),
+                                 bootstrap_seed = kwargs.get("bootstrap_seed", None),
+                                 drawdown_episodes = kwargs.get("drawdown_episodes", 0))
+
+    series_list = ["1.4)", "1.5)", "1.6)", "1.7)", "1.8)", "1.9)", "1.10)"]
     # PART2：开始写入 WORD 
     if word_handler is None:
-        series_list = ["1.", "2.", "3."] 
-        word_handler = wh.WordHandler(visible = False)
+        series_list = ["1.", "2.", "3.", "4.", "5.", "6.", "7."] 
+        word_handler = load_word_backend().WordHandler(visible = False)
         word_handler.set_page_layout()
+    write_indicator_tables(word_handler, context, series_list)
+
+    # 保存文件并退出
+    word_handler.close_and_save(output_file_name)
+    # 打印警告信息
+    print_warning_messages(context.fund_name, context.first_netval_date, context.last_date)
+
+def write_indicator_tables(word_handler: "wh.WordHandler", context: rctx.ReportContext, series_list: list):
+    """
+    将报告上下文中的补充表格写入 WORD，不负责保存
+
+    Args:
+        - word_handler (wh.WordHandler): 正在写入的 WORD 对象
+        - context (rctx.ReportContext): 报告上下文，必须包含补充表格(indicators_tables = True)
+        - series_list (list): 各张表的标题序号，例如 ["1.4)", "1.5)", "1.6)", "1.7)", "1.8)", "1.9)", "1.10)"]，
+                              后面的序号依次用于存在的 “同类排名”、“指标置信区间”、“回撤区间”、“多基准对比” 表
+    """
+    fund_name: str = context.fund_name
+    footer_text: str = context.footer_text
+    blank_fill: str = "" if not context.enhanced_fund else "超额" 
+    summary_indicator_table: np.ndarray = context.summary_indicator_table
+    rolling_quantile_table: np.ndarray = context.rolling_quantile_table
+    earning_probability_table: np.ndarray = context.earning_probability_table
 
     # 生成标题
-    word_handler.add_text_content(f"{series_list[0]} {this_fund.fund_name}{blank_fill}关键指标汇总", "title")
+    word_handler.add_text_content(f"{series_list[0]} {fund_name}{blank_fill}关键指标汇总", "title")
     word_handler.add_text_content("", "footnote")
     # 生成“收益风险指标”表格及其脚注
     word_handler.add_table(summary_indicator_table.shape[0], summary_indicator_table.shape[1], 
@@ -187,7 +474,7 @@ def generate_word_indicator_tables(netval_data: pd.Series,  corp_name: str = "
     word_handler.add_text_content("", "footnote") 
 
     # 生成标题
-    word_handler.add_text_content(f"{series_list[1]} {this_fund.fund_name}{blank_fill}滚动收益率分布", "title")
+    word_handler.add_text_content(f"{series_list[1]} {fund_name}{blank_fill}滚动收益率分布", "title")
     word_handler.add_text_content("", "footnote")
     # 生成“收益风险指标”表格及其脚注
     word_handler.add_table(rolling_quantile_table.shape[0], rolling_quantile_table.shape[1], 
@@ -196,7 +483,7 @@ def generate_word_indicator_tables(netval_data: pd.Series,  corp_name: str = "
     word_handler.add_text_content("", "footnote")
 
     # 生成标题
-    word_handler.add_text_content(f"{series_list[2]} {this_fund.fund_name}{blank_fill}收益概率统计", "title")
+    word_handler.add_text_content(f"{series_list[2]} {fund_name}{blank_fill}收益概率统计", "title")
     word_handler.add_text_content("", "footnote")
     # 生成“收益风险指标”表格及其脚注
     word_handler.add_table(earning_probability_table.shape[0], earning_probability_table.shape[1], 
@@ -204,10 +491,26 @@ def generate_word_indicator_tables(netval_data: pd.Series,  corp_name: str = "
     word_handler.add_text_content(footer_text, "footnote")
     word_handler.add_text_content("", "footnote")
 
-    # 保存文件并退出
-    word_handler.close_and_save(output_file_name)
-    # 打印警告信息
-    print_warning_messages(this_fund.fund_name, this_fund.get_first_netval_date(), this_fund.get_last_date())
+    # 可选表格：存在哪张就写哪张，序号依次递增
+    optional_tables = [("同类排名", context.peer_rank_table), ("指标置信区间", context.bootstrap_table),
+                       ("回撤区间", context.drawdown_episode_table), ("多基准对比", context.benchmark_table)]
+    optional_tables = [(title, table) for title, table in optional_tables if table is not None]
+    for series, (title, table) in zip(series_list[3:], optional_tables):
+        # 生成标题
+        word_handler.add_text_content(f"{series} {fund_name}{blank_fill}{title}", "title")
+        word_handler.add_text_content("", "footnote")
+        # 生成表格及其脚注
+        word_handler.add_table(table.shape[0], table.shape[1], "first_row", table)
+        word_handler.add_text_content(footer_text, "footnote")
+        word_handler.add_text_content("", "footnote")
+
+def load_word_backend():
+    """
+    首次写入 WORD 时才导入 word_handler(以及它依赖的 win32com、word_table_handler、excel_chart_handler)。
+    只计算指标的运行(例如命令行的 --compute-only、进程池中的子进程)不需要为此付出导入开销，在 Linux 上也不会因为缺少 win32com 而失败
+    """
+    import word_handler as wh
+    return wh
 
 def property_method(enhanced_fund: bool, method_name: str, this_fund):
     """
@@ -0,0 +1,292 @@
+"""
+此文件是一个常驻的本地 HTTP 服务(只使用标准库 asyncio)，分析师临时查询单只基金的数值时不必每次重新导入模块、重新读取 EXCEL。
+启动时按批量配置文件(格式与 cli.py 一致)读取并清洗全部净值数据与指数数据；计算在进程池中进行，
+每个子进程启动时收到一份净值与指数数据，构造好的基金对象与报告上下文常驻在子进程中，之后的查询直接复用。
+同时到达的相同查询只计算一次(合并为同一个任务)，最近的查询结果保存在主进程中，重复查询不再进入进程池。
+
+接口(GET，返回 JSON，出错时返回 {"error" : 错误信息})：
+    /funds                                   全部基金名称
+    /indicators?fund=基金名称                 summary_indicators(指增基金是超额收益的指标)
+    /history?fund=基金名称&start_year=2020    history_return_table 的矩阵(指增基金是超额收益)
+    /report?fund=基金名称&format=html         完整报告，format=html 时直接返回 HTML 页面(见 html_report.py)，
+                                             format=word 时生成 WORD 并返回文件路径(需要 WORD 后端)
+    /health                                  服务状态
+
+用法示例：
+    python report_service.py batch.json --port 8765 --workers 2
+    curl "http://127.0.0.1:8765/indicators?fund=沣京价值增强一期"
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+import pandas as pd
+
+DEFAULT_HOST: str = "127.0.0.1"
+DEFAULT_PORT: int = 8765
+DEFAULT_CACHE_SIZE: int = 256 # 主进程中保存最近多少个查询结果
+REPORT_FORMATS: list = ["html", "word"]
+STATUS_TEXT: dict = {200 : "OK", 400 : "Bad Request", 404 : "Not Found", 405 : "Method Not Allowed", 500 : "Internal Server Error"}
+
+# ------------------------------- 以下在进程池的子进程中运行 -------------------------------
+_jobs: dict = {}         # 基金名称 --> 任务(cli.build_jobs 的一项)
+_index_tables: dict = {} # 指数数据路径 --> 指数数据
+_funds: dict = {}        # 基金名称 --> 构造好的基金对象
+_contexts: dict = {}     # 基金名称 --> 报告上下文
+
+def init_worker(jobs: dict, index_tables: dict):
+    """ 子进程的初始化函数：保存净值与指数数据，并提前导入计算模块，之后该进程中的所有查询共用 """
+    global _jobs, _index_tables
+    import report_generate # 同时导入了 fund, enhanced_fund 等计算模块
+    _jobs, _index_tables = jobs, index_tables
+    _funds.clear()
+    _contexts.clear()
+
+def worker_fund(fund_name: str):
+    """ 子进程中的基金对象，第一次查询时构造，之后直接复用 """
+    if fund_name not in _funds:
+        import fund
+        import enhanced_fund as ef
+        job = _jobs[fund_name]
+        index_data = _index_tables[job["index_path"]]
+        _funds[fund_name] = ef.EnhancedFund(fund_name, job["netval_data"], index_data, index_data.columns[0], job["start_date"],
+                                            job["create_date"], True, job["calendar"]) if job["enhanced_fund"] \
+                            else fund.Fund(fund_name, job["netval_data"], job["start_date"], job["create_date"], True, job["calendar"])
+    return _funds[fund_name]
+
+def worker_context(fund_name: str):
+    """ 子进程中的报告上下文，与 cli.py 生成报告时使用的选项一致 """
+    if fund_name not in _contexts:
+        import report_generate as rg
+        job = _jobs[fund_name]
+        index_data = _index_tables[job["index_path"]]
+        _contexts[fund_name] = rg.build_report_context(job["netval_data"], index_data, job["enhanced_fund"], job["corp_name"],
+                                                       job["start_date"], job["create_date"], job["add_indicators_tables"],
+                                                       fund_name = fund_name, index_name = index_data.columns[0],
+                                                       this_fund = worker_fund(fund_name),
+                                                       **{key : job[key] for key in ["analyze_text_start_year", "history_table_start_year",
+                                                                                     "bootstrap_samples", "bootstrap_seed",
+                                                                                     "drawdown_episodes"]})
+    return _contexts[fund_name]
+
+def compute(kind: str, fund_name: str, params: tuple):
+    """
+    在子进程中执行一次查询，返回值必须可以被 pickle 序列化
+
+    Args:
+        - kind (str): 查询类型，"indicators", "history", "report"
+        - fund_name (str): 基金名称
+        - params (tuple): 查询参数 ((参数名, 参数值), ...)
+
+    Returns:
+        _type_: indicators 返回 dict，history 返回二维列表，report 返回 HTML 文本或者 WORD 文档路径
+    """
+    params = dict(params)
+    this_fund = worker_fund(fund_name)
+    target = this_fund.excess if _jobs[fund_name]["enhanced_fund"] else this_fund
+    if kind == "indicators":
+        return target.summary_indicators()
+    if kind == "history":
+        start_year = params.get("start_year", None)
+        return target.history_return_table(int(start_year) if start_year else None).tolist()
+    if kind == "report":
+        context = worker_context(fund_name)
+        if params.get("format", "html") == "html":
+            import html_report as hr
+            return hr.fund_page(context, _jobs[fund_name]["add_indicators_tables"])
+        import utils
+        import report_generate as rg
+        utils.create_output_folder()
+        return rg.finish_report(context, _jobs[fund_name]["add_indicators_tables"])
+    raise ValueError(kind, "未知的查询类型")
+
+# ------------------------------- 以下在主进程中运行 -------------------------------
+def to_json_value(value):
+    """ 把查询结果转为可以写入 JSON 的值：numpy 数值转为 Python 数值，nan 转为 None，日期转为字符串 """
+    if isinstance(value, dict):
+        return {str(key) : to_json_value(elem) for key, elem in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_value(elem) for elem in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+class ReportService:
+    def __init__(self, config: dict, workers: int = 1, cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        常驻查询服务：启动时读取并清洗批量配置中的全部净值数据(cli.build_jobs)与指数数据，然后启动进程池
+
+        Args:
+            - config (dict): 批量配置，格式与 cli.py 一致
+            - workers (int, optional): 计算进程数. Defaults to 1.
+            - cache_size (int, optional): 主进程中保存最近多少个查询结果，0 表示不保存. Defaults to DEFAULT_CACHE_SIZE.
+        """
+        import cli
+        if workers < 1:
+            raise ValueError(workers, "workers 至少是 1")
+        self.jobs: dict = {}
+        for job in cli.build_jobs(config):
+            if job["fund_name"] in self.jobs:
+                raise ValueError(job["fund_name"], "这只基金在配置中出现了不止一次，查询时无法区分")
+            self.jobs[job["fund_name"]] = job
+        self.index_tables: dict = {}
+        for job in self.jobs.values():
+            if job["index_path"] not in self.index_tables:
+                self.index_tables[job["index_path"]] = pd.read_excel(job["index_path"], index_col = 0)
+        self.executor = ProcessPoolExecutor(max_workers = workers, initializer = init_worker,
+                                            initargs = (self.jobs, self.index_tables))
+        self.cache_size: int = cache_size
+        self.results: OrderedDict = OrderedDict() # 查询键 --> 结果，按最近使用的顺序排列
+        self.pending: dict = {}                   # 查询键 --> 正在计算的 asyncio.Future
+        self.stats: dict = {"requests" : 0, "computed" : 0, "coalesced" : 0, "cache_hits" : 0}
+
+    async def query(self, kind: str, fund_name: str, params: dict):
+        """
+        执行一次查询：最近算过的直接返回；相同的查询正在计算时等待同一个结果；否则提交到进程池
+
+        Args:
+            - kind (str): 查询类型，见 compute
+            - fund_name (str): 基金名称
+            - params (dict): 查询参数
+        """
+        key = (kind, fund_name, tuple(sorted(params.items())))
+        if key in self.results:
+            self.stats["cache_hits"] += 1
+            self.results.move_to_end(key)
+            return self.results[key]
+        if key in self.pending:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(self.pending[key])
+        future = asyncio.get_running_loop().run_in_executor(self.executor, compute, kind, fund_name, key[2])
+        self.pending[key] = future
+        self.stats["computed"] += 1
+        try:
+            result = await asyncio.shield(future)
+        finally:
+            del self.pending[key]
+        if self.cache_size > 0:
+            self.results[key] = result
+            if len(self.results) > self.cache_size:
+                self.results.popitem(last = False)
+        return result
+
+    async def dispatch(self, path: str, query: dict) -> tuple:
+        """
+        根据路径与参数执行查询
+
+        Returns:
+            tuple: (HTTP 状态码, Content-Type, 响应内容 bytes)
+        """
+        params = {name : values[-1] for name, values in query.items()}
+        fund_name = params.pop("fund", None)
+        if path == "/health":
+            return self.json_response(200, {"funds" : len(self.jobs), **self.stats})
+        if path == "/funds":
+            return self.json_response(200, list(self.jobs))
+        if path not in ["/indicators", "/history", "/report"]:
+            return self.json_response(404, {"error" : f"未知的接口：{path}"})
+        if not fund_name:
+            return self.json_response(400, {"error" : "缺少参数 fund"})
+        if fund_name not in self.jobs:
+            return self.json_response(404, {"error" : f"没有这只基金：{fund_name}"})
+        kind = path[1:]
+        if kind == "history":
+            params = {"start_year" : params["start_year"]} if params.get("start_year") else {}
+        elif kind == "report":
+            params = {"format" : params.get("format", "html")}
+            if params["format"] not in REPORT_FORMATS:
+                return self.json_response(400, {"error" : f"format 只能是 {REPORT_FORMATS} 之一"})
+        else:
+            params = {}
+        try:
+            result = await self.query(kind, fund_name, params)
+        except ValueError as error:
+            return self.json_response(400, {"error" : " ".join(str(elem) for elem in error.args)})
+        except Exception as error:
+            return self.json_response(500, {"error" : repr(error)})
+        if kind == "report" and params["format"] == "html":
+            return 200, "text/html; charset=utf-8", result.encode("utf-8")
+        return self.json_response(200, {"fund" : fund_name, "result" : result})
+
+    @staticmethod
+    def json_response(status: int, content) -> tuple:
+        body = json.dumps(to_json_value(content), ensure_ascii = False).encode("utf-8")
+        return status, "application/json; charset=utf-8", body
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """ 处理一个 HTTP/1.1 连接，支持 keep-alive，同一个连接上的请求依次处理 """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if int(headers.get("content-length", 0)) > 0: # 不使用请求体，读出后丢弃
+                    await reader.readexactly(int(headers["content-length"]))
+                start_time = time.perf_counter()
+                self.stats["requests"] += 1
+                if method != "GET":
+                    status, content_type, body = self.json_response(405, {"error" : "只支持 GET 请求"})
+                else:
+                    url = urlsplit(target)
+                    status, content_type, body = await self.dispatch(url.path, parse_qs(url.query))
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                writer.write((f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\nContent-Type: {content_type}\r\n"
+                              f"Content-Length: {len(body)}\r\nX-Elapsed-Ms: {(time.perf_counter() - start_time) * 1000:.2f}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode("latin-1") + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError):
+            pass # 格式错误的请求或者客户端断开，直接关闭连接
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """ 启动服务并一直运行 """
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        # 预热：启动子进程并完成初始化(收到净值与指数数据、导入计算模块)，第一个查询不需要等待
+        await asyncio.get_running_loop().run_in_executor(self.executor, time.sleep, 0)
+        print(f"已加载{len(self.jobs)}只基金，服务地址 http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures = True)
+
+def main(argv: list = None):
+    import cli
+    parser = argparse.ArgumentParser(description = "常驻的基金指标与报告查询服务")
+    parser.add_argument("config", help = "批量配置文件路径，格式与 cli.py 一致")
+    parser.add_argument("--host", default = DEFAULT_HOST, help = f"监听地址，默认是 {DEFAULT_HOST}(只允许本机访问)")
+    parser.add_argument("--port", type = int, default = DEFAULT_PORT, help = f"监听端口，默认是 {DEFAULT_PORT}")
+    parser.add_argument("--workers", type = int, default = 1, help = "计算进程数，默认是 1")
+    parser.add_argument("--cache-size", type = int, default = DEFAULT_CACHE_SIZE, help = "主进程中保存最近多少个查询结果")
+    args = parser.parse_args(argv)
+    service = ReportService(cli.load_config(args.config), args.workers, args.cache_size)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,217 @@
+""" 此文件用于在磁盘上缓存每只基金的计算结果(指标、表格矩阵，以及可选的 WORD 文档、净值走势图)，使得批量运行时输入没有变化的基金可以直接跳过 """
+import os
+import json
+import pickle
+import shutil
+import hashlib
+import pandas as pd
+from datetime import date
+
+DEFAULT_CACHE_DIR: str = "cache"
+DEFAULT_MAX_BYTES: int = 1024 ** 3 # 缓存目录默认最多占用 1GB
+# 这些文件的源代码会参与“代码版本”的计算，任何一个文件被修改，旧的缓存都会自动失效
+CODE_FILES: list = ["fund.py", "enhanced_fund.py", "index_handler.py", "date_handler.py", "utils.py",
+                    "report_generate.py", "report_context.py", "netval_cleaning.py", "bootstrap.py", "drawdown_episodes.py",
+                    "trading_calendar.py", "word_handler.py", "word_table_handler.py", "excel_chart_handler.py"]
+
+_code_version: str = None
+
+def code_version() -> str:
+    """ 对参与计算和渲染的源代码文件求哈希，作为代码版本号。同一进程内只计算一次 """
+    global _code_version
+    if _code_version is None:
+        hasher = hashlib.sha256()
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        for file_name in CODE_FILES:
+            file_path = os.path.join(base_dir, file_name)
+            if os.path.exists(file_path):
+                with open(file_path, "rb") as f:
+                    hasher.update(f.read())
+        _code_version = hasher.hexdigest()
+    return _code_version
+
+def hash_data(data) -> str:
+    """
+    对净值数据或者指数数据(包括日期索引与列名)求哈希
+
+    Args:
+        data (pd.Series | pd.DataFrame): 原始的净值数据或者指数数据
+
+    Returns:
+        str: 十六进制的哈希值
+    """
+    hasher = hashlib.sha256()
+    names = [data.name] if isinstance(data, pd.Series) else list(data.columns)
+    hasher.update(repr(names).encode("utf-8"))
+    hasher.update(pd.util.hash_pandas_object(data, index = True).values.tobytes())
+    return hasher.hexdigest()
+
+class ResultCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        基于内容寻址的计算结果缓存。键是 (净值数据, 指数数据, 开始日期, 管理人名称, 报告选项, 代码版本) 的哈希值，
+        值是计算好的报告上下文(指标与表格矩阵)，也可以额外保存生成好的 WORD 文档。
+        缓存目录超过 max_bytes 时按照最近最少使用(LRU)的顺序淘汰，最近使用时间以文件的修改时间记录。
+
+        Args:
+            - cache_dir (str, optional): 缓存目录，不存在时会自动创建. Defaults to "cache".
+            - max_bytes (int, optional): 缓存目录允许占用的最大字节数. Defaults to 1GB.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def make_key(self, netval_data: pd.Series, index_digest: str, start_date: date = None,
+                 corp_name: str = None, options: dict = None) -> str:
+        """
+        生成某只基金的缓存键
+
+        Args:
+            - netval_data (pd.Series): 该基金的原始净值数据
+            - index_digest (str): 指数数据的哈希值，由 hash_data(index_data) 得到。批量计算时指数数据共用，只需要计算一次
+            - start_date (date, optional): 起始计算日期. Defaults to None.
+            - corp_name (str, optional): 私募管理人名称. Defaults to None.
+            - options (dict, optional): 其它会影响报告内容的选项，例如是否为指增基金、是否添加补充表格. Defaults to None.
+
+        Returns:
+            str: 缓存键
+        """
+        key_content = {
+            "netval": hash_data(netval_data),
+            "index": index_digest,
+            "start_date": str(start_date),
+            "corp_name": corp_name,
+            "options": options or {},
+            "code_version": code_version()
+        }
+        return hashlib.sha256(json.dumps(key_content, sort_keys = True, default = str).encode("utf-8")).hexdigest()
+
+    def result_path(self, key: str) -> str:
+        """ 计算结果的文件路径 """
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def document_path(self, key: str) -> str:
+        """ 缓存的 WORD 文档路径 """
+        return os.path.join(self.cache_dir, key + ".docx")
+
+    def image_path(self, key: str, suffix: str = ".png") -> str:
+        """ 缓存的图片路径 """
+        return os.path.join(self.cache_dir, key + suffix)
+
+    def touch(self, path: str):
+        """ 命中缓存后更新文件的修改时间，用于 LRU 淘汰 """
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+    def get(self, key: str) -> dict:
+        """ 读取缓存的计算结果，没有命中或者缓存文件损坏时返回 None """
+        path = self.result_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except FileNotFoundError: # 其它进程刚刚把它淘汰了，当作没有命中
+            return None
+        except Exception:
+            try:
+                os.remove(path) # 缓存文件损坏，直接删掉，重新计算
+            except FileNotFoundError:
+                pass
+            return None
+        self.touch(path)
+        return result
+
+    def get_document(self, key: str) -> str:
+        """ 读取缓存的 WORD 文档路径，没有命中时返回 None """
+        path = self.document_path(key)
+        if not os.path.exists(path):
+            return None
+        self.touch(path)
+        return path
+
+    def get_image(self, key: str, suffix: str = ".png") -> str:
+        """ 读取缓存的图片路径，没有命中时返回 None """
+        path = self.image_path(key, suffix)
+        if not os.path.exists(path):
+            return None
+        self.touch(path)
+        return path
+
+    def put_image(self, key: str, image_path: str):
+        """ 把渲染好的图片复制一份到缓存目录，后缀名与原图片一致 """
+        target_path = self.image_path(key, os.path.splitext(image_path)[1])
+        tmp_path = target_path + ".tmp" + str(os.getpid())
+        shutil.copyfile(image_path, tmp_path)
+        os.replace(tmp_path, target_path)
+        self.evict()
+
+    def put(self, key: str, result: dict, document_path: str = None):
+        """
+        写入缓存。先写入临时文件再重命名，避免多个进程同时写入时读到不完整的文件
+
+        Args:
+            - key (str): 缓存键
+            - result (dict): 计算结果，必须可以被 pickle 序列化
+            - document_path (str, optional): 生成好的 WORD 文档路径，如果传入，会复制一份到缓存目录. Defaults to None.
+        """
+        path = self.result_path(key)
+        tmp_path = path + ".tmp" + str(os.getpid())
+        with open(tmp_path, "wb") as f:
+            pickle.dump(result, f, protocol = pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        if document_path is not None and os.path.exists(document_path):
+            tmp_path = self.document_path(key) + ".tmp" + str(os.getpid())
+            shutil.copyfile(document_path, tmp_path)
+            os.replace(tmp_path, self.document_path(key))
+        self.evict()
+
+    def file_stats(self, include_tmp: bool = True) -> list:
+        """
+        缓存目录中每个文件的 (路径, 字节数, 修改时间)。多个进程共用缓存目录时，文件可能在遍历途中被其它进程删除，这样的文件直接跳过
+
+        Args:
+            include_tmp (bool, optional): 是否包括正在写入的临时文件. Defaults to True.
+        """
+        stats = []
+        for entry in os.scandir(self.cache_dir):
+            if not include_tmp and ".tmp" in entry.name:
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            stats.append((entry.path, stat.st_size, stat.st_mtime))
+        return stats
+
+    def total_bytes(self) -> int:
+        """ 缓存目录当前占用的字节数 """
+        return sum(size for _, size, _ in self.file_stats())
+
+    def evict(self):
+        """ 缓存目录超过 max_bytes 时，按照最近使用时间从旧到新删除文件，直到占用空间回到上限以内 """
+        stats = self.file_stats(include_tmp = False)
+        total = sum(size for _, size, _ in stats)
+        if total <= self.max_bytes:
+            return
+        for path, size, _ in sorted(stats, key = lambda elem: elem[2]):
+            if total <= self.max_bytes:
+                break
+            total -= size
+            try:
+                os.remove(path)
+            except OSError: # 包括已经被其它进程删除的情况
+                pass
+
+    def clear(self):
+        """ 清空缓存目录 """
+        for path, _, _ in self.file_stats():
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,147 @@
+"""
+此文件用于计算基金在整个存续期内的滚动风险指标时间序列：滚动年化收益率、滚动年化波动率、滚动夏普比率、滚动周胜率、滚动最大回撤。
+所有指标的计算量都是 O(n)，与窗口长度无关：
+    - 收益率的一阶矩、二阶矩、正收益个数使用滑动求和(前缀和之差)；
+    - 滚动最大回撤(与 Fund.max_drawdown_of_recent_year 口径一致，即窗口内回撤序列的最小值)使用单调队列；
+    - 窗口内最大回撤(以窗口内的最高点为基准)使用双栈队列聚合，每个元素最多入栈出栈各两次。
+"""
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+
+from fund import Fund
+
+DEFAULT_WINDOW: int = 52 # 默认窗口：52 期，周度数据即近一年
+RISK_FREE_RATE: float = 0.015 # 与 Fund.sharpe_ratio 的默认值一致
+ROLLING_COLUMNS: list = ["滚动年化收益率", "滚动年化波动率", "滚动夏普比率", "滚动周胜率", "滚动最大回撤", "窗口内最大回撤"]
+
+def sliding_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    滑动求和：第 t 个位置是 values[t - window + 1 : t + 1] 之和，前 window - 1 个位置是 np.nan。空值按 0 计算
+
+    Args:
+        - values (np.ndarray): 一维数组
+        - window (int): 窗口长度
+    """
+    prefix = np.concatenate([[0.0], np.cumsum(np.nan_to_num(values, nan = 0.0))])
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        result[window - 1:] = prefix[window:] - prefix[:-window]
+    return result
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    单调队列求滑动最小值：队列中保存下标，对应的数值单调递增，队首就是当前窗口的最小值。空值会被跳过
+
+    Args:
+        - values (np.ndarray): 一维数组
+        - window (int): 窗口长度，前 window - 1 个位置是 np.nan
+    """
+    result = np.full(len(values), np.nan)
+    candidates = deque()
+    for idx, value in enumerate(values):
+        if not np.isnan(value):
+            while candidates and values[candidates[-1]] >= value:
+                candidates.pop()
+            candidates.append(idx)
+        while candidates and candidates[0] <= idx - window:
+            candidates.popleft()
+        if idx >= window - 1 and candidates:
+            result[idx] = values[candidates[0]]
+    return result
+
+def combine_segments(left: tuple, right: tuple) -> tuple:
+    """
+    合并两个相邻净值片段的摘要 (最高净值, 最低净值, 片段内最大回撤)。
+    右侧片段的最低点相对左侧片段的最高点形成的回撤，就是跨越两个片段的最大回撤
+    """
+    if left is None:
+        return right
+    if right is None:
+        return left
+    crossing_drawdown = right[1] / left[0] - 1
+    return (max(left[0], right[0]), min(left[1], right[1]), min(left[2], right[2], crossing_drawdown))
+
+def rolling_window_drawdown(nav: np.ndarray, window: int) -> np.ndarray:
+    """
+    双栈队列求窗口内最大回撤：窗口内的净值(共 window + 1 个)以窗口内的最高点为基准的最大回撤。
+    后栈保存新入队元素的累计摘要，前栈保存从队首开始的后缀摘要，出队时前栈为空才把后栈整体翻转过去
+
+    Args:
+        - nav (np.ndarray): 净值，空值会被跳过
+        - window (int): 窗口长度(收益率的个数)，前 window 个位置是 np.nan
+    """
+    result = np.full(len(nav), np.nan)
+    front: list = [] # (下标, 从该元素到前栈底部的摘要)
+    back: list = [] # (下标, 元素自身的摘要)
+    back_summary = None
+    for idx, value in enumerate(nav):
+        if not np.isnan(value):
+            back.append((idx, (value, value, 0.0)))
+            back_summary = combine_segments(back_summary, (value, value, 0.0))
+        while True:
+            if not front and back:
+                summary = None
+                for back_idx, element in reversed(back):
+                    summary = combine_segments(element, summary)
+                    front.append((back_idx, summary))
+                back, back_summary = [], None
+            if front and front[-1][0] < idx - window:
+                front.pop()
+                continue
+            break
+        if idx >= window:
+            summary = combine_segments(front[-1][1] if front else None, back_summary)
+            result[idx] = summary[2] if summary is not None else np.nan
+    return result
+
+def rolling_metrics(this_fund: Fund, window: int = DEFAULT_WINDOW, periods_per_year: int = 52,
+                    risk_free_rate: float = RISK_FREE_RATE) -> pd.DataFrame:
+    """
+    计算基金整个存续期的滚动指标，每个日期的指标只使用截至该日期(含)的最近 window 期收益率
+
+    Args:
+        - this_fund (Fund): 基金对象(指增基金可以传入 this_fund.excess)
+        - window (int, optional): 窗口长度(期数)，周度数据 52 期即近一年. Defaults to 52.
+        - periods_per_year (int, optional): 每年多少期，用于年化波动率，周度数据是 52. Defaults to 52.
+        - risk_free_rate (float, optional): 无风险利率. Defaults to 0.015.
+
+    Returns:
+        pd.DataFrame: index 是日期，列为 ROLLING_COLUMNS，窗口不满的日期是 np.nan。
+                      年化收益率按窗口首尾的实际天数年化，与 Fund.annual_return 一致；
+                      滚动最大回撤是窗口内回撤序列的最小值，与 Fund.max_drawdown_of_recent_year 一致
+    """
+    nav = this_fund.basic_data.nav.to_numpy(dtype = np.float64)
+    returns = this_fund.basic_data.returns.to_numpy(dtype = np.float64)
+    drawdown = this_fund.basic_data.drawdown.to_numpy(dtype = np.float64)
+    dates = this_fund.basic_data.index
+
+    valid = ~np.isnan(returns)
+    count = sliding_sum(valid.astype(np.float64), window)
+    sum_returns = sliding_sum(returns, window)
+    sum_squares = sliding_sum(returns ** 2, window)
+    positive_count = sliding_sum((returns > 0).astype(np.float64), window)
+
+    # 窗口首尾的净值与天数，用于年化收益率
+    start_nav = np.full(len(nav), np.nan)
+    days = np.full(len(nav), np.nan)
+    if len(nav) > window:
+        start_nav[window:] = nav[:-window]
+        ordinal_days = np.array([elem.toordinal() for elem in dates], dtype = np.float64)
+        days[window:] = ordinal_days[window:] - ordinal_days[:-window]
+
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        full_window = count == window
+        variance = (sum_squares - sum_returns ** 2 / count) / (count - 1)
+        volatility = np.sqrt(np.maximum(variance, 0.0)) * math.sqrt(periods_per_year)
+        annual_return = (nav / start_nav) ** (365 / days) - 1
+        result = pd.DataFrame({
+            "滚动年化收益率" : np.where(full_window, annual_return, np.nan),
+            "滚动年化波动率" : np.where(full_window, volatility, np.nan),
+            "滚动夏普比率" : np.where(full_window, (annual_return - risk_free_rate) / volatility, np.nan),
+            "滚动周胜率" : np.where(full_window, positive_count / count, np.nan),
+            "滚动最大回撤" : np.where(full_window, rolling_min(drawdown, window), np.nan),
+            "窗口内最大回撤" : np.where(full_window, rolling_window_drawdown(nav, window), np.nan),
+        }, index = dates)
+    return result
@@ -0,0 +1,79 @@
+"""
+此文件用于构建一批基金共用的交易日历。同一张净值数据表中的基金共用一列日期，因此每个月末、每个年末、
+以及最新日期往前 1/3/6/12/24/36 个月对应的最近日期，只需要在整批基金开始计算之前匹配一次。
+匹配规则与 date_handler.find_closest_date 完全一致(最近的日期，距离相同取较早的日期)，基金对象通过 Fund.closest_date 复用这些结果
+"""
+from datetime import date
+from dateutil.relativedelta import relativedelta
+import numpy as np
+
+import date_handler as dh
+
+LOOKBACK_MONTHS: list = [1, 3, 6, 12, 24, 36] # 近期收益(all_recent_return)与过去一年最大回撤用到的回看月数
+
+class TradingCalendar:
+    def __init__(self, dates):
+        """
+        交易日历，构造时预先匹配所有月末(包括年末)以及最新日期往前 LOOKBACK_MONTHS 个月的日期
+
+        Args:
+            dates (_type_): 净值数据表的日期列，例如 netval_data.index，必须严格升序
+        """
+        self.dates: list = dh.list_to_date(dates)
+        if len(self.dates) == 0:
+            raise ValueError("交易日历的日期序列不能为空")
+        self.date_days: np.ndarray = dh.to_day_numbers(self.dates)
+        if np.any(np.diff(self.date_days) <= 0):
+            raise ValueError("交易日历的日期序列必须严格升序并且不能重复")
+        first_date, last_date = self.dates[0], self.dates[-1]
+        # 所有月末：从首个日期的上一年 12 月(用于首年的年度收益)到最后一年的 12 月(用于当年以来的收益)
+        anchor_dates = [date(first_date.year - 1, 12, 31)]
+        anchor_dates += [date(year, month, dh.last_date_of_month(month, year))
+                         for year in range(first_date.year, last_date.year + 1) for month in range(1, 13)]
+        anchor_dates += [last_date - relativedelta(months = month) for month in LOOKBACK_MONTHS]
+        positions = dh.closest_date_positions(dh.to_day_numbers(anchor_dates), self.date_days)
+        self.anchors: dict = {anchor : int(position) for anchor, position in zip(anchor_dates, positions)}
+
+    def position(self, target_date: date) -> int:
+        """ 目标日期在日历中最近日期的位置，优先使用预先匹配的结果，否则二分查找；不在日历范围内时返回 -1 """
+        position = self.anchors.get(target_date)
+        if position is None:
+            position = int(dh.closest_date_positions(dh.to_day_numbers(target_date), self.date_days)[0])
+        return position
+
+    def closest_date(self, target_date: date, first_date: date, last_date: date) -> date:
+        """
+        在日历的 [first_date, last_date] 区间内查找最近的日期，与 find_closest_date(target_date, 该区间的日期列表) 的结果一致
+
+        Args:
+            - target_date (date): 目标日期
+            - first_date (date): 基金日期序列的第一个日期
+            - last_date (date): 基金日期序列的最后一个日期
+
+        Returns:
+            date: 匹配到的日期，target_date 不在 [first_date, last_date] 范围内时返回 None
+        """
+        if target_date < first_date or target_date > last_date:
+            return None
+        # 区间内的日期是日历的连续片段，目标日期又在区间内，因此在整个日历中最近的日期一定落在区间内
+        return self.dates[self.position(target_date)]
+
+    def covers(self, date_list) -> bool:
+        """ 判断某只基金的日期序列是否是日历中连续的一段，只有这样基金才能复用日历 """
+        if len(date_list) == 0 or len(date_list) > len(self.dates):
+            return False
+        fund_days = dh.to_day_numbers(date_list)
+        start = int(np.searchsorted(self.date_days, fund_days[0]))
+        return bool(np.array_equal(self.date_days[start : start + len(fund_days)], fund_days))
+
+def batch_calendar(dates) -> TradingCalendar:
+    """
+    为一批基金构建交易日历。日期序列不是严格升序时返回 None，此时各基金仍然各自匹配日期(结果不变，只是更慢)
+
+    Args:
+        dates (_type_): 净值数据表的日期列，例如 netval_data.index
+    """
+    try:
+        return TradingCalendar(dates)
+    except ValueError:
+        return None
@@ -4,6 +4,7 @@ import pandas as pd
 from datetime import datetime
 import subprocess
 import os
+from functools import lru_cache
 
 CORP_DEFAULT_NAME: str = "私募管理人"
 
@@ -37,6 +38,28 @@ def not_pct_indicator(indicator_name: str) -> bool:
             return False 
     return True
 
+def is_table_header(title_mode: str, row_idx: int, col_idx: int) -> bool:
+    """
+    查询某个单元格是否是表头单元格[即私募报告中被红色填充的位置]，WORD 表格与 HTML 表格共用同一套规则
+
+    Args:
+        - title_mode (str): 表头模式，含义见 word_table_handler.WordTableHandler
+        - row_idx (int): 行索引，从0开始
+        - col_idx (int): 列索引，从0开始
+    """
+    if title_mode == "first_col":
+        return col_idx == 0
+    if title_mode == "first_row":
+        return row_idx == 0
+    if title_mode == "first":
+        return col_idx == 0 or row_idx == 0
+    if title_mode == "sep":
+        return col_idx == 0 or (row_idx % 2 == 0)
+    if title_mode == "weak_sep":
+        return col_idx == 0 or  (row_idx % 2 == 0 and row_idx != 2)
+    if title_mode == "row_sep":
+        return row_idx % 2 == 0
+
 def convert_to_RGB(BGR_value: int) -> int:
     """ 通过位运算将 BGR 转为 RGB """
     blue = (BGR_value & 0xFF0000) >> 16
@@ -76,6 +99,61 @@ def suitable_convert(number: float, indicator_name: str) -> str:
     else:
         return round_decimal(number)
 
+@lru_cache(maxsize = None)
+def format_rule(indicator_name: str) -> tuple:
+    """
+    根据指标名称得到格式化规则，结果会被缓存，同一个指标名称只判断一次。与 suitable_convert 的规则一致
+
+    Args:
+        indicator_name (str): 指标名称
+
+    Returns:
+        tuple: (格式字符串, 倍数)，例如百分比是 ("%.1f%%", 100.0)，保留一位小数是 ("%.1f", 1.0)
+    """
+    return ("%.1f%%", 100.0) if not_pct_indicator(indicator_name) else ("%.1f", 1.0)
+
+def format_array(values: np.ndarray, fmt: str = "%.1f%%", scale: float = 100.0, na_rep: str = '-') -> np.ndarray:
+    """
+    将一整个数组格式化为字符串数组。空值通过掩码一次性找出并填充为 na_rep，其余数值先整体乘以倍数再统一格式化。
+    默认参数与 decimal_to_pct 的结果完全一致("{:.1%}" 也是先乘以 100 再保留一位小数)
+
+    Args:
+        - values (np.ndarray): 任意形状的数值数组，空值可以是 np.nan 或者 None
+        - fmt (str, optional): 格式字符串. Defaults to "%.1f%%".
+        - scale (float, optional): 格式化之前乘以的倍数. Defaults to 100.0.
+        - na_rep (str, optional): 空值显示的字符串. Defaults to '-'.
+
+    Returns:
+        np.ndarray: 形状相同的字符串数组(dtype 为 object)
+    """
+    values = np.asarray(values, dtype = np.float64)
+    result = np.full(values.shape, na_rep, dtype = object)
+    valid_mask = ~np.isnan(values)
+    result[valid_mask] = list(map(fmt.__mod__, (values[valid_mask] * scale).tolist()))
+    return result
+
+def format_indicator_values(indicators_names: list, indicators_values: list) -> list:
+    """
+    suitable_convert 的批量版本：按格式化规则把指标分组，每组整体格式化，字符串原样保留
+
+    Args:
+        - indicators_names (list): 指标名称
+        - indicators_values (list): 与指标名称一一对应的数值
+
+    Returns:
+        list: 转换后的字符串列表，顺序与输入一致
+    """
+    result = list(indicators_values)
+    groups: dict = {}
+    for idx, (name, value) in enumerate(zip(indicators_names, indicators_values)):
+        if type(value) != str:
+            groups.setdefault(format_rule(name), []).append(idx)
+    for (fmt, scale), positions in groups.items():
+        formatted = format_array([indicators_values[idx] for idx in positions], fmt, scale)
+        for idx, text in zip(positions, formatted):
+            result[idx] = text
+    return result
+
 def dict_to_series(data: dict) -> pd.Series:
     """
     由于fund模块计算出的指标都是 dict 格式，某些时候也许难以处理，所以这里提供 dict -> pd.Series 
@@ -128,6 +206,18 @@ def drop_suffix(_str: str, suffix: str = "标准化") -> str:
         return _str[:-len(suffix)]
     return _str
 
+def export_chart_data(fund_name: str, chart_data: pd.DataFrame) -> str:
+    """
+    将绘图数据导出到 output 文件夹，返回导出的作图文件的名称
+
+    Args:
+        - fund_name (str): 基金名称，用于生成文件名
+        - chart_data (pd.DataFrame): Fund.get_chart_data 的返回结果
+    """
+    file_name = generate_filename("__" + fund_name + "作图数据") 
+    chart_data.to_excel("output/" + file_name)
+    return file_name
+
 def create_output_folder():
     """ 创建 output 文件夹 """
     # 定义要创建的文件夹名称
@@ -153,8 +243,7 @@ def df_to_matrix(df: pd.DataFrame) -> np.ndarray:
     Returns:
         np.ndarray: 转换为 np.array 后的矩阵
     """
-    value_array = np.array(df)
-    value_array = np.array([[decimal_to_pct(elem) if not pd.isna(elem) else '-' for elem in row] for row in value_array])
+    value_array = format_array(df.to_numpy(dtype = np.float64, na_value = np.nan)).astype(str)
     colname_array = np.array([df.columns])
     indexname_array = np.array([df.index.name] + list(df.index))
     indexname_array = indexname_array.reshape(len(indexname_array), 1)
@@ -173,7 +262,7 @@ def dict_to_matrix(indicators_dict: dict, column_number: int = 6) -> np.ndarray:
     """
     indicators_names = list(indicators_dict.keys())
     indicators_values = list(indicators_dict.values())
-    indicators_values = [suitable_convert(value, name) for (value, name) in zip(indicators_values, indicators_names)]
+    indicators_values = format_indicator_values(indicators_names, indicators_values)
     sep_indicators_names = [indicators_names[idx : idx + column_number] 
                             for idx in range(0, len(indicators_names), column_number)]
     sep_indicators_values = [indicators_values[idx : idx + column_number] 
@@ -160,11 +160,14 @@ class WordHandler:
         table_handler.add_text(text_array)
         self.cursor.EndKey(Unit=win32.constants.wdStory)
     
-    def close_and_save(self, fund_name: str):
-        """ 关闭并保存得到的结果 """
+    def close_and_save(self, fund_name: str) -> str:
+        """ 关闭并保存得到的结果，返回保存的文件路径 """
         if self.is_new_doc:
-            self.this_doc.SaveAs(os.path.abspath("output/" + utils.generate_filename(fund_name, ".docx")))
+            output_path = os.path.abspath("output/" + utils.generate_filename(fund_name, ".docx"))
+            self.this_doc.SaveAs(output_path)
         else:
+            output_path = self.this_doc.FullName
             self.this_doc.Save()
         self.this_doc.Close()
-        self.word_app.Quit()
\ No newline at end of file
+        self.word_app.Quit()
+        return output_path
\ No newline at end of file
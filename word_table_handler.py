@@ -79,18 +79,7 @@ class WordTableHandler:
             - row_idx (int): 行索引，从0开始
             - col_idx (int): 列索引，从0开始
         """
-        if self.title_mode == "first_col":
-            return col_idx == 0
-        if self.title_mode == "first_row":
-            return row_idx == 0
-        if self.title_mode == "first":
-            return col_idx == 0 or row_idx == 0
-        if self.title_mode == "sep":
-            return col_idx == 0 or (row_idx % 2 == 0)
-        if self.title_mode == "weak_sep":
-            return col_idx == 0 or  (row_idx % 2 == 0 and row_idx != 2)
-        if self.title_mode == "row_sep":
-            return row_idx % 2 == 0
+        return utils.is_table_header(self.title_mode, row_idx, col_idx)
 
     def fill_table_color(self):
         """ 给表格的表头部分上色 """
@@ -0,0 +1,92 @@
+"""
+此文件用于读取一个工作簿中的多个工作表，每个工作表的格式与 非指增批量测试数据.xlsx 一致(第一列是日期，每只基金一列)。
+工作表在进程池中并行解析(openpyxl 是纯 Python 实现，多线程无法并行)并各自清洗，
+每个工作表通过清单(manifest)指定自己的管理人名称、是否指增等选项，最后合并为一批基金统一处理。
+
+清单格式(JSON 或 TOML，也可以直接传入 dict)，键是工作表名称，没有列出的选项使用批次的默认值：
+    {
+        "沣京": {"corp_name": "沣京", "enhanced_fund": false, "funds": {"沣京价值增强一期": {"start_date": "2019-01-04"}}},
+        "中证1000指增": {"corp_name": "裕锦量化", "enhanced_fund": true}
+    }
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import excel_reader as xr
+import netval_cleaning as nc
+import trading_calendar as tc
+
+def load_manifest(manifest) -> dict:
+    """
+    读取工作表清单
+
+    Args:
+        manifest (_type_): 清单文件路径(.json 或者 .toml)，或者 {工作表名称 : 选项} 字典，None 表示没有清单
+
+    Returns:
+        dict: {工作表名称 : 选项}，选项中的 funds 是该工作表中各基金的单独设置
+    """
+    if manifest is None:
+        return {}
+    if isinstance(manifest, str):
+        import cli # 与批量配置文件共用读取逻辑
+        manifest = cli.load_config(manifest)
+    for sheet_name, options in manifest.items():
+        if not isinstance(options, dict):
+            raise ValueError(sheet_name, "清单中每个工作表的选项必须是字典")
+    return manifest
+
+def sheet_names(workbook_path: str) -> list:
+    """ 工作簿中所有工作表的名称，按工作簿中的顺序排列 """
+    import openpyxl
+    workbook = openpyxl.load_workbook(workbook_path, read_only = True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+def parse_sheet(workbook_path: str, sheet_name: str) -> tuple:
+    """ 读取并清洗一个工作表，返回 (清洗后的净值数据表, 清洗报告)。该函数会在子进程中运行 """
+    return nc.clean_panel(xr.read_netval(workbook_path, sheet_name = sheet_name))
+
+def read_workbook(workbook_path: str, manifest = None, sheets: list = None, workers: int = 1) -> list:
+    """
+    并行解析工作簿中的多个工作表，并检查不同工作表之间没有重名的基金
+
+    Args:
+        - workbook_path (str): 工作簿路径(.xlsx)
+        - manifest (_type_, optional): 工作表清单，见 load_manifest. Defaults to None.
+        - sheets (list, optional): 需要处理的工作表，None 时处理清单中列出的工作表，没有清单时处理全部工作表. Defaults to None.
+        - workers (int, optional): 解析工作表的进程数，大于 1 时使用进程池. Defaults to 1.
+
+    Returns:
+        list[dict]: 每个工作表一项，顺序与 sheets 一致，包括
+                    sheet(工作表名称), netval_data(清洗后的净值数据表), calendar(该工作表共用的交易日历),
+                    options(清单中除 funds 以外的选项), funds(清单中各基金的单独设置)
+    """
+    manifest = load_manifest(manifest)
+    all_sheets = sheet_names(workbook_path)
+    if sheets is None:
+        sheets = list(manifest) if manifest else all_sheets
+    unknown_sheets = [name for name in dict.fromkeys(list(sheets) + list(manifest)) if name not in all_sheets]
+    if unknown_sheets:
+        raise ValueError(unknown_sheets, "这些工作表没有出现在工作簿中：", workbook_path)
+    if workers > 1 and len(sheets) > 1:
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            parsed = list(executor.map(parse_sheet, [workbook_path] * len(sheets), sheets))
+    else:
+        parsed = [parse_sheet(workbook_path, sheet_name) for sheet_name in sheets]
+    result, owners = [], {}
+    for sheet_name, (netval_data, clean_report) in zip(sheets, parsed):
+        duplicated = [fund_name for fund_name in netval_data.columns if fund_name in owners]
+        if duplicated:
+            raise ValueError(duplicated, "这些基金同时出现在多个工作表中：", [owners[name] for name in duplicated], sheet_name)
+        owners.update({fund_name : sheet_name for fund_name in netval_data.columns})
+        options = dict(manifest.get(sheet_name, {}))
+        fund_settings: dict = options.pop("funds", {})
+        unknown_funds = set(fund_settings) - set(netval_data.columns)
+        if unknown_funds:
+            raise ValueError(unknown_funds, "这些基金没有出现在工作表中：", sheet_name)
+        nc.print_clean_report(clean_report)
+        result.append({"sheet" : sheet_name, "netval_data" : netval_data, "calendar" : tc.batch_calendar(netval_data.index),
+                       "options" : options, "funds" : fund_settings})
+    return result